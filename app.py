@@ -59,79 +59,121 @@ def set_selected_article(article_value: str):
     st.write(f"DEBUG set_selected_article -> {st.session_state.selected_article}")
 
 
-def render_negotiation_tips(tips: dict):
-    """UI-freundliche Darstellung der Verhandlungsstrategie."""
-    if not tips:
-        st.info("Keine Verhandlungsstrategie verfügbar.")
-        return
+def _show_list(title, items, icon="•"):
+    if items:
+        st.markdown(f"**{title}**")
+        for it in items:
+            st.markdown(f"- {icon} {it}")
 
-    def show_list(title, items, icon="•"):
-        if items:
-            st.markdown(f"**{title}**")
-            for it in items:
-                st.markdown(f"- {icon} {it}")
 
+def _render_supplier_analysis(sa):
     st.markdown("#### 🏭 Lieferantenanalyse")
-    sa = tips.get("supplier_analysis", {})
-    show_list("Produktionskompetenzen", sa.get("production_competencies", []))
+    sa = sa or {}
+    _show_list("Produktionskompetenzen", sa.get("production_competencies", []))
     if sa.get("scaling_capabilities"):
         st.markdown(f"**Skalierung:** {sa['scaling_capabilities']}")
-    show_list("Zertifizierungen", sa.get("certifications", []))
-    show_list("Standortvorteile", sa.get("location_advantages", []), icon="✅")
-    show_list("Standortnachteile", sa.get("location_disadvantages", []), icon="⚠️")
-    show_list("Supply-Chain-Risiken", sa.get("supply_chain_risks", []), icon="🚨")
+    _show_list("Zertifizierungen", sa.get("certifications", []))
+    _show_list("Standortvorteile", sa.get("location_advantages", []), icon="✅")
+    _show_list("Standortnachteile", sa.get("location_disadvantages", []), icon="⚠️")
+    _show_list("Supply-Chain-Risiken", sa.get("supply_chain_risks", []), icon="🚨")
 
+
+def _render_market_analysis(ma):
     st.markdown("#### 📊 Marktanalyse")
-    ma = tips.get("market_analysis", {})
+    ma = ma or {}
     raw = ma.get("raw_material_trends", {})
     if raw:
         st.markdown(f"- **Material:** {raw.get('material','')} | Aktuell: {raw.get('current_price_eur_kg','')} €/kg | Trend 12M: {raw.get('price_trend_12mo','')}")
-    show_list("Konkurrenzangebote", ma.get("competitor_offers", []))
+    _show_list("Konkurrenzangebote", ma.get("competitor_offers", []))
     cr = ma.get("country_risks", {})
     if cr:
         st.markdown(f"- **Zölle:** {cr.get('tariffs','')} | CBAM: {cr.get('cbam_costs','')} | Transport: {cr.get('transport_costs','')}")
     if ma.get("expected_price_development"):
         st.markdown(f"- **Erwartete Preisentwicklung:** {ma['expected_price_development']}")
 
+
+def _render_strategy_overview(so):
     st.markdown("#### 🧭 Strategie")
-    so = tips.get("strategy_overview", {})
     if so:
         st.markdown(f"- **Ansatz:** {so.get('main_approach','')} | Machtbalance: {so.get('negotiation_power_balance','')} | Erfolg: {so.get('estimated_success_probability','')}")
-        show_list("Hebelpunkte", so.get("key_leverage_points", []))
+        _show_list("Hebelpunkte", so.get("key_leverage_points", []))
 
+
+def _render_objectives(obj):
     st.markdown("#### 🎯 Ziele")
-    obj = tips.get("objectives", {})
     if obj:
         st.markdown(f"- **Primär:** {obj.get('primary_goal','')}")
-        show_list("Sekundär", obj.get("secondary_goals", []))
+        _show_list("Sekundär", obj.get("secondary_goals", []))
         if obj.get("minimum_acceptable_outcome"):
             st.markdown(f"- **Minimum:** {obj['minimum_acceptable_outcome']}")
         if obj.get("batna"):
             st.markdown(f"- **BATNA:** {obj['batna']}")
 
+
+def _render_key_arguments(arguments):
     st.markdown("#### 📝 Kernargumente")
-    for idx, arg in enumerate(tips.get("key_arguments", []), 1):
+    for idx, arg in enumerate(arguments or [], 1):
         st.markdown(f"**Argument {idx}:** {arg.get('argument','')}")
-        show_list("Fakten", arg.get("supporting_facts", []))
+        _show_list("Fakten", arg.get("supporting_facts", []))
         if arg.get("expected_counter"):
             st.markdown(f"- Erwarteter Einwand: {arg['expected_counter']}")
         if arg.get("our_response"):
             st.markdown(f"- Unsere Antwort: {arg['our_response']}")
 
-    show_list("🎭 Taktiken", tips.get("tactics", []))
 
+def _render_concessions(concessions):
     st.markdown("#### 🤝 Zugeständnisse")
-    for conc in tips.get("concessions", []):
+    for conc in concessions or []:
         st.markdown(f"- Wir bieten: {conc.get('what_we_offer','')} | Wir fordern: {conc.get('what_we_want','')} | Wert: {conc.get('trade_off_value','')}")
 
-    show_list("🚨 Red Flags", tips.get("red_flags", []))
 
-    if tips.get("opening_statement") or tips.get("closing_statement"):
+def _render_opening_statement(text):
+    if text:
         st.markdown("#### 💬 Formulierungen")
-        if tips.get("opening_statement"):
-            st.info(f"Eröffnung: {tips['opening_statement']}")
-        if tips.get("closing_statement"):
-            st.success(f"Abschluss: {tips['closing_statement']}")
+        st.info(f"Eröffnung: {text}")
+
+
+def _render_closing_statement(text):
+    if text:
+        st.success(f"Abschluss: {text}")
+
+
+# Abschnitte in Anzeige-Reihenfolge (= Reihenfolge im GPT-JSON, damit beim
+# Streaming jeder Abschnitt erscheint, sobald er fertig ist)
+NEGOTIATION_SECTIONS = [
+    ("supplier_analysis", _render_supplier_analysis),
+    ("market_analysis", _render_market_analysis),
+    ("strategy_overview", _render_strategy_overview),
+    ("objectives", _render_objectives),
+    ("key_arguments", _render_key_arguments),
+    ("tactics", lambda items: _show_list("🎭 Taktiken", items)),
+    ("concessions", _render_concessions),
+    ("red_flags", lambda items: _show_list("🚨 Red Flags", items)),
+    ("opening_statement", _render_opening_statement),
+    ("closing_statement", _render_closing_statement),
+]
+
+
+def render_negotiation_tips(tips: dict, placeholders: dict = None):
+    """
+    UI-freundliche Darstellung der Verhandlungsstrategie.
+
+    Args:
+        tips: (Teil-)Strategie; fehlende Abschnitte bleiben leer
+        placeholders: Optional {Abschnitt: st.empty()} - Abschnitte werden dort
+                      (über)schrieben statt angehängt (Streaming)
+    """
+    if not tips:
+        st.info("Keine Verhandlungsstrategie verfügbar.")
+        return
+
+    for key, render in NEGOTIATION_SECTIONS:
+        if placeholders is None:
+            render(tips.get(key))
+        elif key in tips:
+            with placeholders[key].container():
+                render(tips.get(key))
+
 
 # Backend-Funktionen (angepasste src-Pfade)
 from src.core.price_utils import derive_unit_price
@@ -141,17 +183,26 @@ from src.core.cbam import (
     gpt_rate_supplier,
     gpt_negotiation_prep,
     calculate_co2_footprint,
+    get_commodity_market_analysis,
 )
 from src.negotiation.engine import gpt_negotiation_prep_enhanced
-from src.gpt.engine import gpt_intelligent_article_search
-from src.utils.excel_helpers import (
-    find_column,
-    get_price_series_per_unit,
-)
+from src.gpt.engine import search_articles
+from src.core.article_index import ArticleIndex
+from src.utils.dataset_snapshot import load_dataset
+from src.core.supplier_stats import compute_selection_stats
+from src.gpt.async_exec import call_blocking, run_parallel
+from src.gpt.deadline import step_deadline
 from src.gpt.cache import (
     cached_gpt_complete_cost_estimate,
+    cached_gpt_complete_cost_estimate_batch,
     cached_gpt_analyze_supplier,
 )
+from src.core.cost_estimation import (
+    cost_curve,
+    lot_size_regime,
+    regime_bounds,
+    rescale_estimate_to_lot_size,
+)
 
 # UI-System (angepasste src-Pfade)
 from src.ui.theme import (
@@ -174,6 +225,7 @@ from src.ui.navigation import NavigationSidebar, create_section_anchor, create_s
 from src.ui.login import check_login, render_login_screen, render_logout_button, inject_lottie_background, get_logo_base64
 from src.ui.liquid_glass import apply_liquid_glass_styles, liquid_header, glass_card
 from src.ui.drawing_analysis import render_drawing_analysis_page
+from src.ui.admin_panel import render_admin_panel
 
 # ==================== SETUP ====================
 load_dotenv()
@@ -283,12 +335,35 @@ def normalize_columns(df):
     return df_norm
 
 
-def find_col(df, possible_names):
-    df_norm_cols = [c.strip().lower() for c in df.columns]
-    for name in possible_names:
-        if name in df_norm_cols:
-            return df.columns[df_norm_cols.index(name)]
-    return None
+def current_schema():
+    """Spaltenrollen des aktuellen Datensatzes (beim Upload bestimmt)."""
+    dataset = st.session_state.get("df")
+    return dataset.schema if dataset is not None else None
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _cached_selection_stats(dataset_key, selection_items, qty_col, _idf, _schema):
+    return compute_selection_stats(_idf, _schema, qty_col)
+
+
+def selection_stats(qty_col=None):
+    """Lieferanten-Kennzahlen der aktuellen Auswahl, memoisiert je (Datensatz-Hash, Artikelauswahl)."""
+    dataset = st.session_state.df
+    return _cached_selection_stats(
+        dataset.key, st.session_state.get("selection_items", ()), qty_col,
+        st.session_state.idf, dataset.schema,
+    )
+
+
+def get_article_index(df, item_col, dataset_key):
+    """Artikel-Index einmal pro Datensatz aufbauen und in der Session halten."""
+    cache_key = (dataset_key, item_col, len(df))
+    cached = st.session_state.get("article_index")
+    if cached is not None and cached[0] == cache_key:
+        return cached[1]
+    index = ArticleIndex(df[item_col].dropna().unique().tolist())
+    st.session_state.article_index = (cache_key, index)
+    return index
 
 # ==================== HEADER - nur neu gestalteter Header ====================
 logo_b64 = get_logo_base64()
@@ -327,6 +402,7 @@ with st.sidebar:
 
 # Logout Button (Divider removed in login.py)
 render_logout_button()
+render_admin_panel()
 
 # Synchronize Navigation with Wizard Steps
 nav_to_wizard = {
@@ -365,19 +441,28 @@ def step1_upload():
 
         try:
             # Read file with loading animation
-            with ExcelLoadingAnimation(f"📂 Analysiere {uploaded_file.name}", icon="📊"):
-                if uploaded_file.name.endswith('.csv'):
-                    df = pd.read_csv(uploaded_file, sep=None, engine="python")
-                else:
-                    df = pd.read_excel(uploaded_file)
+            with ExcelLoadingAnimation(f"📂 Analysiere {uploaded_file.name}", icon="📊") as loading:
+                # Snapshot je Datei-Hash: Reruns und erneute Uploads parsen nicht erneut
+                dataset = load_dataset(
+                    uploaded_file,
+                    on_progress=lambda frac: loading.update_progress(frac, f"{frac:.0%} gelesen"),
+                    current=st.session_state.get("df"),
+                )
+                df = dataset.load()
 
-                st.session_state.df = df
+                st.session_state.df = dataset
                 st.session_state.uploaded_file_name = uploaded_file.name
                 wizard.complete_step(1)
 
                 # Preview
                 with st.expander("📊 Datenvorschau", expanded=False):
                     st.write(f"**{len(df):,} Zeilen × {len(df.columns)} Spalten**")
+                    report = dataset.memory_report
+                    if report:
+                        st.caption(
+                            f"Speicher: {report['before_mb']:,.1f} MB → {report['after_mb']:,.1f} MB "
+                            f"({len(report.get('converted', {}))} Spalten kompakt gespeichert)"
+                        )
                     st.dataframe(df.head(10), use_container_width=True)
 
         except Exception as e:
@@ -397,10 +482,11 @@ def step2_article_search():
         st.warning("⚠️ Bitte zuerst Datei in Schritt 1 hochladen")
         return
 
-    df = st.session_state.df
+    dataset = st.session_state.df
+    df = dataset.load()
 
-    # Find item column
-    item_col = find_col(df, ["item", "artikel", "bezeichnung", "produkt", "artikelnummer", "artnr"])
+    # Spaltenrollen aus dem Upload-Schema
+    item_col = dataset.schema.item
 
     if not item_col:
         st.error("❌ Keine Artikel-Spalte gefunden")
@@ -415,25 +501,28 @@ def step2_article_search():
         key="article_search"
     )
 
+    use_gpt_rerank = st.checkbox(
+        "KI-Nachsortierung der Treffer",
+        value=False,
+        key="article_search_gpt_rerank",
+        help="Lokale Suche findet die Kandidaten, GPT sortiert nur die besten 50 nach"
+    )
+
     if query and query.strip():
         with GPTLoadingAnimation("🔍 Suche Artikel...", icon="🤖"):
-            all_items = df[item_col].unique().tolist()
-
-            # AI + String search
-            matched_indices = gpt_intelligent_article_search(query, all_items)
-            matched_items = set([all_items[i] for i in matched_indices]) if matched_indices else set()
+            index = get_article_index(df, item_col, dataset.key)
 
-            # String fallback
-            query_tokens = query.lower().split()
-            for item in all_items:
-                if all(token in str(item).lower() for token in query_tokens):
-                    matched_items.add(item)
+            # Lokaler Index (alle Artikel) + optionale GPT-Nachsortierung der Shortlist
+            matched_indices = search_articles(query, index, top_k=50, use_gpt_rerank=use_gpt_rerank)
+            ranked_items = [index.items[i] for i in matched_indices]
+            matched_items = set(ranked_items)
 
             if matched_items:
-                idf = df[df[item_col].isin(matched_items)].copy()
+                idf = df[df[item_col].isin(matched_items)]
                 st.session_state.idf = idf
+                st.session_state.selection_items = tuple(sorted(map(str, matched_items)))
 
-                supplier_col = find_col(df, ["supplier", "lieferant", "vendor"])
+                supplier_col = dataset.schema.supplier
                 st.session_state.supplier_col = supplier_col
 
                 num_suppliers = idf[supplier_col].nunique() if supplier_col else 1
@@ -444,7 +533,7 @@ def step2_article_search():
                 ])
 
                 # Auswahl nur per Nutzerklick (kein Default)
-                unique_items = sorted(idf[item_col].unique().tolist())
+                unique_items = ranked_items
                 options = ["(Bitte wählen...)"] + unique_items
 
                 # Wenn noch nichts gewählt, automatisch erstes Ergebnis setzen
@@ -454,7 +543,7 @@ def step2_article_search():
                 elif unique_items:
                     default_idx = 1
                     set_selected_article(unique_items[0])
-                    st.info(f"Automatisch erster KI-Treffer gewählt: {st.session_state.selected_article}")
+                    st.info(f"Automatisch bester Treffer gewählt: {st.session_state.selected_article}")
 
                 choice = st.selectbox(
                     "Artikel wählen",
@@ -488,6 +577,127 @@ def format_currency(value):
     except:
         return "N/A"
 
+def build_cost_result(result, avg_price, article):
+    """Verdichtet eine Kostenschätzung zum UI-State für Schritt 5/6."""
+    material_eur = result.get('material_cost_eur')
+    fab_eur = result.get('fab_cost_eur')
+    target = (material_eur or 0) + (fab_eur or 0)
+    delta = (avg_price - target) if avg_price else None
+    return {
+        "material_eur": material_eur,
+        "fab_eur": fab_eur,
+        "target": target,
+        "delta": delta,
+        "material": result.get('material_guess'),
+        "process": result.get('process'),
+        "confidence": result.get('confidence'),
+        "source": result.get('_source', 'gpt'),
+        "rel_error": result.get('_rel_error'),
+        "neighbor": result.get('_neighbor'),
+        "deadline_fallback": result.get('_deadline_fallback', False),
+        "mass_kg": result.get('mass_kg', 0.023),
+        "lot_size": result.get('lot_size'),
+        "article": article,
+    }
+
+
+# Maximal gebündelt geschätzte Artikel der Portfolio-Analyse
+PORTFOLIO_ESTIMATE_LIMIT = 50
+
+
+def estimate_portfolio(df, item_col, qty_col, articles):
+    """Zielkosten je Artikel über gebündelte GPT-Calls (Losgröße = mittlere Bestellmenge)."""
+    items = []
+    for idx, article in enumerate(articles):
+        lot_size = 1000
+        if qty_col and qty_col in df.columns:
+            qty = pd.to_numeric(df.loc[df[item_col].astype(str) == article, qty_col], errors="coerce").median()
+            if pd.notna(qty) and qty > 0:
+                lot_size = int(qty)
+        items.append({"id": str(idx), "description": sanitize_input(article), "lot_size": lot_size})
+
+    progress = st.progress(0.0, text=f"0 / {len(items)} Artikel geschätzt")
+    estimates = cached_gpt_complete_cost_estimate_batch(
+        items,
+        on_progress=lambda done, total: progress.progress(done / total, text=f"{done} / {total} Artikel geschätzt"),
+    )
+    progress.empty()
+    return {article: estimates.get(str(idx)) for idx, article in enumerate(articles)}
+
+
+def supplier_article_history_json(supplier):
+    """Bisherige Artikel eines Lieferanten (max. 50) als JSON für die Lieferanten-Analyse."""
+    import json
+    idf = st.session_state.idf
+    supplier_col = st.session_state.get("supplier_col")
+    item_col = st.session_state.item_col
+    sup_df = idf[idf[supplier_col] == supplier]
+    history = [re.sub(r"[\u2028\u2029]", "", a) if isinstance(a, str) else a
+               for a in sup_df[item_col].unique().tolist()[:50]]
+    return json.dumps(history, ensure_ascii=False)
+
+
+def prefetch_negotiation_context(supplier, cost_result, timeout=90):
+    """
+    Holt fehlende Eingaben der Verhandlungsvorbereitung überlappend:
+    Lieferanten-Kompetenzen (GPT) und Rohstoffmarkt-Analyse (Marktdaten-API).
+    Ergebnisse landen in st.session_state; Fehler werden nur angezeigt.
+    """
+    calls, sources = {}, {}
+    if supplier and st.session_state.get("supplier_competencies_for") != supplier:
+        # Session-Zugriffe hier im Skript-Thread, nicht in der Coroutine
+        history_json = supplier_article_history_json(supplier)
+        calls["supplier_competencies"] = lambda: call_blocking(
+            cached_gpt_analyze_supplier, model="gpt-4o",
+            supplier_name=supplier, article_history_json=history_json, country=None,
+        )
+        sources["supplier_competencies"] = supplier
+    material = (cost_result or {}).get("material")
+    if material and st.session_state.get("commodity_analysis_for") != material:
+        calls["commodity_analysis"] = lambda: call_blocking(
+            get_commodity_market_analysis, material, model="commodity-api",
+        )
+        sources["commodity_analysis"] = material
+    if not calls:
+        return
+
+    for name, value in run_parallel(calls, timeout=timeout).items():
+        if isinstance(value, dict) and value.get("_error") is True:
+            st.warning(f"⚠️ {name} nicht verfügbar: {value.get('error')}")
+            st.session_state.pop(name, None)
+            continue
+        st.session_state[name] = value
+        if not (isinstance(value, dict) and value.get("_deadline_fallback")):
+            st.session_state[f"{name}_for"] = sources[name]
+
+
+def render_cost_curve(estimate):
+    """Kosten-vs-Losgröße-Kurve aus der gespeicherten Schätzung (ohne API-Call)."""
+    points = cost_curve(estimate)
+    if not points:
+        return
+    df_curve = pd.DataFrame(points)
+    lower, upper = regime_bounds(estimate.get("_reference_lot_size") or estimate.get("lot_size") or 1)
+    st.markdown("###### 📈 Kosten je Stück nach Losgröße")
+    chart = alt.Chart(df_curve).mark_line(point=True, color="#5DA59F").encode(
+        x=alt.X("lot_size:Q", scale=alt.Scale(type="log"), title="Losgröße"),
+        y=alt.Y("total_cost_eur:Q", title="Kosten €/Stk"),
+        strokeDash=alt.condition(alt.datum.in_regime, alt.value([1, 0]), alt.value([4, 4])),
+        tooltip=[
+            alt.Tooltip("lot_size:Q", title="Losgröße", format=","),
+            alt.Tooltip("material_cost_eur:Q", title="Material €", format=",.4f"),
+            alt.Tooltip("fab_cost_eur:Q", title="Fertigung €", format=",.4f"),
+            alt.Tooltip("total_cost_eur:Q", title="Gesamt €", format=",.4f"),
+        ],
+    ).properties(height=280)
+    st.altair_chart(chart, use_container_width=True)
+    upper_txt = f"{upper:,}" if upper else "∞"
+    st.caption(
+        f"Prozessparameter gelten für Losgrößen {lower:,} – {upper_txt}. "
+        "Werte außerhalb dieses Bereichs sind extrapoliert; eine Schätzung dort fragt die KI neu."
+    )
+
+
 # ==================== STEP 3: PREISÜBERSICHT ====================
 def step3_price_overview():
     section_header(
@@ -504,7 +714,7 @@ def step3_price_overview():
     supplier_col = st.session_state.get("supplier_col")
 
     try:
-        avg, mn, mx, qty_col, _src = derive_unit_price(idf)
+        avg, mn, mx, qty_col, _src = derive_unit_price(idf, schema=current_schema())
 
         # KPI Row
         price_range = ((mx - mn) / mn * 100) if (mn and mx and mn > 0) else None
@@ -523,22 +733,21 @@ def step3_price_overview():
         # Breakdown by supplier
         if supplier_col and supplier_col in idf.columns:
             with st.expander("📋 Breakdown nach Lieferant", expanded=True):
-                price_series = get_price_series_per_unit(idf, qty_col)
-                if price_series is not None:
-                    temp = idf.copy()
-                    temp['_price'] = price_series
-
-                    breakdown = temp.groupby(supplier_col).agg({
-                        '_price': ['mean', 'min', 'max', 'count']
-                    }).round(4)
-
-                    breakdown.columns = ['Ø Preis', 'Min', 'Max', 'Anzahl']
+                stats = selection_stats(qty_col)
+                if stats.unit_price is not None:
+                    breakdown = stats.per_supplier[
+                        ['mean', 'min', 'max', 'count', 'weighted_mean', 'cv', 'last_price']
+                    ].round(4)
+                    breakdown.index.name = supplier_col
+
+                    breakdown.columns = ['Ø Preis', 'Min', 'Max', 'Anzahl', 'Ø gewichtet', 'CV', 'Letzter Preis']
                     breakdown = breakdown.sort_values('Ø Preis')
                     
                     # Format columns for display
                     display_df = breakdown.copy()
-                    for col in ['Ø Preis', 'Min', 'Max']:
+                    for col in ['Ø Preis', 'Min', 'Max', 'Ø gewichtet', 'Letzter Preis']:
                         display_df[col] = display_df[col].apply(lambda x: format_currency(x).replace(" €", ""))
+                    display_df['CV'] = display_df['CV'].apply(lambda x: f"{x:.1%}".replace(".", ",") if pd.notna(x) else "N/A")
 
                     st.dataframe(
                         display_df.style.highlight_min(subset=['Ø Preis'], color='#d1fae5'), # Light mint green
@@ -569,7 +778,9 @@ def step4_suppliers():
         wizard.complete_step(4)
         return
 
-    suppliers = sorted(idf[supplier_col].dropna().unique().tolist())
+    # Alle Lieferanten-Kennzahlen in einem Durchlauf
+    per_supplier = selection_stats(qty_col).per_supplier
+    suppliers = sorted(per_supplier.index.tolist())
 
     if len(suppliers) == 0:
         st.warning("⚠️ Keine Lieferanten gefunden")
@@ -579,23 +790,12 @@ def step4_suppliers():
 
     # Build supplier table with ranking
     supplier_stats = []
-    price_series = get_price_series_per_unit(idf, qty_col) if qty_col else None
-
     for sup in suppliers:
-        sup_df = idf[idf[supplier_col] == sup]
-
-        if price_series is not None:
-            avg_price = price_series.loc[sup_df.index].mean()
-        else:
-            try:
-                avg_price, _, _, _, _ = derive_unit_price(sup_df)
-            except:
-                avg_price = None
-
+        avg_price = per_supplier.at[sup, "mean"]
         supplier_stats.append({
             "Lieferant": sup,
-            "avg_price_raw": avg_price if avg_price is not None else float('inf'),
-            "Einträge": len(sup_df)
+            "avg_price_raw": float(avg_price) if pd.notna(avg_price) else float('inf'),
+            "Einträge": int(per_supplier.at[sup, "entries"])
         })
 
     # Sort by price to determine ranking
@@ -730,7 +930,7 @@ def step5_cost_estimation():
         supplier_col = st.session_state.get("supplier_col")
 
         with st.expander("💰 Einsparpotenzial-Analyse (Portfolio)", expanded=True):
-            price_series = get_price_series_per_unit(idf, qty_col)
+            price_series = selection_stats(qty_col).unit_price
             
             if price_series is not None:
                 df_analysis = idf.copy()
@@ -782,6 +982,16 @@ def step5_cost_estimation():
                     st.altair_chart(chart, use_container_width=True)
 
                     st.markdown("###### Detail-Liste (Artikel über Durchschnitt)")
+
+                    # Zielkosten für alle gelisteten Artikel - wenige gebündelte GPT-Calls
+                    portfolio_articles = potential_savings[item_col].dropna().astype(str).unique().tolist()[:PORTFOLIO_ESTIMATE_LIMIT]
+                    if st.button(f"🎯 Zielkosten für {len(portfolio_articles)} Artikel schätzen", key="portfolio-estimate"):
+                        try:
+                            st.session_state.portfolio_estimates = estimate_portfolio(
+                                potential_savings, item_col, qty_col, portfolio_articles)
+                        except Exception as e:
+                            st.error(f"❌ Portfolio-Schätzung fehlgeschlagen: {e}")
+                    portfolio_estimates = st.session_state.get("portfolio_estimates") or {}
                     
                     # Prepare display dataframe
                     cols_to_show = [item_col, "_unit_price", "Saving Potential (€)", "Saving Potential (%)"]
@@ -800,6 +1010,13 @@ def step5_cost_estimation():
                     display_df["Preis"] = display_df["Preis"].apply(lambda x: format_currency(x).replace(" €", ""))
                     display_df["Potenzial (€)"] = display_df["Potenzial (€)"].apply(lambda x: format_currency(x).replace(" €", ""))
                     display_df["Potenzial (%)"] = display_df["Potenzial (%)"].apply(lambda x: f"{x:,.1f}%".replace(".", ","))
+                    if portfolio_estimates:
+                        def _target(article):
+                            est = portfolio_estimates.get(str(article))
+                            if not est or est.get("_error"):
+                                return ""
+                            return format_currency(est.get("total_cost_eur")).replace(" €", "")
+                        display_df["Zielkosten (€)"] = potential_savings[item_col].apply(_target)
                     
                     st.dataframe(display_df, use_container_width=True, height=200)
                     
@@ -849,36 +1066,36 @@ def step5_cost_estimation():
         else:
             return obj
 
-    if st.button("🚀 Kosten schätzen", type="primary", use_container_width=True):
+    # "GPT-Schätzung anfordern" nach einer Surrogat-Schätzung (siehe Details)
+    refresh = st.session_state.pop("cost_refresh_requested", False)
+    if st.button("🚀 Kosten schätzen", type="primary", use_container_width=True) or refresh:
         with GPTLoadingAnimation("🤖 Analysiere mit KI...", icon="💰"):
             # Supplier analysis (if available)
             supplier_competencies = None
             if supplier:
                 try:
-                    import json
-                    idf = st.session_state.idf
-                    supplier_col = st.session_state.get("supplier_col")
-                    item_col = st.session_state.item_col
-
-                    sup_df = idf[idf[supplier_col] == supplier]
-                    article_history = [_sanitize_obj(a) for a in sup_df[item_col].unique().tolist()[:50]]
-
                     supplier_competencies = cached_gpt_analyze_supplier(
                         supplier_name=supplier,
-                        article_history_json=json.dumps(article_history, ensure_ascii=False),
+                        article_history_json=supplier_article_history_json(supplier),
                         country=None
                     )
+                    st.session_state.supplier_competencies = supplier_competencies
+                    if not supplier_competencies.get("_deadline_fallback"):
+                        # Lokale Ersatz-Analyse beim nächsten Mal erneut von GPT anfordern
+                        st.session_state.supplier_competencies_for = supplier
                 except Exception as e:
                     st.warning(f"Lieferanten-Analyse fehlgeschlagen: {e}")
 
             # Cost estimation
             try:
+                import json
                 article_clean = _sanitize(article)
                 supplier_comp_clean = None if not supplier_competencies else _sanitize_obj(supplier_competencies)
                 result = cached_gpt_complete_cost_estimate(
                     description=article_clean,
                     lot_size=int(lot_size),
-                    supplier_competencies_json=None if not supplier_comp_clean else json.dumps(supplier_comp_clean, ensure_ascii=False)
+                    supplier_competencies_json=None if not supplier_comp_clean else json.dumps(supplier_comp_clean, ensure_ascii=False),
+                    refresh=refresh
                 )
             except Exception as e:
                 st.error(f"❌ Kostenschätzung Exception: {e}")
@@ -887,21 +1104,8 @@ def step5_cost_estimation():
                 return
 
             if result and not result.get("_error"):
-                material_eur = result.get('material_cost_eur')
-                fab_eur = result.get('fab_cost_eur')
-                target = (material_eur or 0) + (fab_eur or 0)
-                delta = (avg_price - target) if avg_price else None
-
-                st.session_state.cost_result = {
-                    "material_eur": material_eur,
-                    "fab_eur": fab_eur,
-                    "target": target,
-                    "delta": delta,
-                    "material": result.get('material_guess'),
-                    "process": result.get('process'),
-                    "confidence": result.get('confidence'),
-                    "mass_kg": result.get('mass_kg', 0.023),
-                }
+                st.session_state.cost_estimate = result
+                st.session_state.cost_result = build_cost_result(result, avg_price, article)
 
                 wizard.complete_step(5)
                 st.success("✅ Schätzung abgeschlossen!")
@@ -911,6 +1115,17 @@ def step5_cost_estimation():
                     msg = result.get("message") or result.get("error") or result.get("_error") or msg
                 st.error(f"❌ Schätzung fehlgeschlagen: {msg}")
 
+    # Losgröße geändert: innerhalb desselben Regimes lokal umrechnen (kein GPT-Call)
+    estimate = st.session_state.get("cost_estimate")
+    if estimate and "cost_result" in st.session_state and st.session_state.cost_result.get("article") == article:
+        if int(lot_size) != st.session_state.cost_result.get("lot_size"):
+            if lot_size_regime(lot_size) == lot_size_regime(estimate.get("_reference_lot_size") or estimate.get("lot_size") or 1):
+                rescaled = rescale_estimate_to_lot_size(estimate, int(lot_size))
+                st.session_state.cost_estimate = rescaled
+                st.session_state.cost_result = build_cost_result(rescaled, avg_price, article)
+            else:
+                st.info("ℹ️ Neue Losgrößen-Klasse – bitte Kosten neu schätzen (anderes Fertigungsregime).")
+
     # Show results
     if "cost_result" in st.session_state:
         res = st.session_state.cost_result
@@ -952,6 +1167,25 @@ def step5_cost_estimation():
             col1.metric("Material", res.get('material', 'N/A'))
             col2.metric("Prozess", res.get('process', 'N/A'))
             col3.metric("Confidence", res.get('confidence', 'N/A'))
+            if res.get('source') == 'rules':
+                st.caption("⚡ Regelbasierte Normteil-Schätzung (ohne GPT-Call)")
+            elif res.get('source') == 'neighbor' and res.get('neighbor'):
+                nb = res['neighbor']
+                st.caption(f"♻️ Abgeleitet von „{nb['description']}“ (frühere GPT-Schätzung, ohne GPT-Call): "
+                           f"Masse ×{nb['mass_ratio']:.2f} ({nb['mass_rule']}), "
+                           f"Taktzeit ×{nb['cycle_time_ratio']:.2f}")
+            elif res.get('source') == 'surrogate':
+                st.caption(f"⚡ Surrogat-Modell aus früheren GPT-Schätzungen (ohne GPT-Call), "
+                           f"90%-Fehlerschranke ±{res.get('rel_error') or 0:.0%}")
+            if res.get('deadline_fallback'):
+                st.caption("⏱️ GPT hat nicht innerhalb des Zeitbudgets geantwortet - lokale Notlösung")
+            if res.get('source') == 'surrogate' or res.get('deadline_fallback'):
+                if st.button("🔄 GPT-Schätzung anfordern", key="cost_refresh_button"):
+                    st.session_state.cost_refresh_requested = True
+                    st.rerun()
+
+        if estimate and res.get("article") == article:
+            render_cost_curve(st.session_state.cost_estimate)
 
 
 # ==================== STEP 6: NACHHALTIGKEIT ====================
@@ -1086,6 +1320,9 @@ def step6_sustainability():
         cost_result = st.session_state.get("cost_result")
 
         supplier_data = st.session_state.get("selected_supplier")
+        if article and supplier:
+            with GPTLoadingAnimation("🔎 Sammle Lieferanten- und Marktdaten...", icon="📈"):
+                prefetch_negotiation_context(supplier, cost_result)
         supplier_competencies = st.session_state.get("supplier_competencies")
         commodity_analysis = st.session_state.get("commodity_analysis")
         price_stats = st.session_state.get("price_stats", {})
@@ -1098,7 +1335,15 @@ def step6_sustainability():
         st.write(f"DEBUG selected_supplier = {supplier}")
 
         if article and supplier:
-            with GPTLoadingAnimation("🤖 Generiere Strategie...", icon="💼"):
+            with GPTLoadingAnimation("🤖 Generiere Strategie...", icon="💼") as loading:
+                # Abschnitte erscheinen einzeln, sobald GPT sie fertig gestreamt hat
+                placeholders = {key: st.empty() for key, _ in NEGOTIATION_SECTIONS}
+
+                def on_section(key, value):
+                    loading.stop()
+                    if key in placeholders:
+                        render_negotiation_tips({key: value}, placeholders)
+
                 try:
                     tips = gpt_negotiation_prep_enhanced(
                         supplier_name=supplier,
@@ -1114,13 +1359,14 @@ def step6_sustainability():
                         min_price=price_stats.get("min"),
                         max_price=price_stats.get("max"),
                         commodity_analysis=commodity_analysis,
-                        cost_result=cost_result
+                        cost_result=cost_result,
+                        on_section=on_section
                     )
 
                     if tips and not tips.get("_error"):
                         st.session_state.negotiation_tips = tips
 
-                        render_negotiation_tips(tips)
+                        render_negotiation_tips(tips, placeholders)
                     else:
                         st.error("❌ Verhandlungsstrategie konnte nicht generiert werden")
                 except Exception as e:
@@ -1139,20 +1385,25 @@ def step6_sustainability():
 
 
 # ==================== MAIN ROUTING ====================
+# Schritte mit GPT-Calls laufen unter einem Zeitbudget (src.gpt.deadline)
 if st.session_state.nav_active_section == "drawing_analysis":
     render_drawing_analysis_page()
 elif st.session_state.nav_active_section == "upload":
     step1_upload()
 elif st.session_state.nav_active_section == "artikel":
-    step2_article_search()
+    with step_deadline(2):
+        step2_article_search()
 elif st.session_state.nav_active_section == "preis":
     step3_price_overview()
 elif st.session_state.nav_active_section == "lieferanten":
-    step4_suppliers()
+    with step_deadline(4):
+        step4_suppliers()
 elif st.session_state.nav_active_section == "kosten":
-    step5_cost_estimation()
+    with step_deadline(5):
+        step5_cost_estimation()
 elif st.session_state.nav_active_section == "nachhaltigkeit":
-    step6_sustainability()
+    with step_deadline(6):
+        step6_sustainability()
 else:
     step1_upload()
 
@@ -0,0 +1,120 @@
+"""
+BENCHMARK CSV-EINLESEN
+======================
+Vergleicht den bisherigen Pfad (sep=None, engine="python") mit read_csv_fast
+an synthetischen ERP-Exporten (Semikolon, deutsche Dezimalkommas, Umlaute).
+
+Aufruf:
+    python scripts/benchmark_csv_ingest.py                      # 100k, 1M, 5M Zeilen
+    python scripts/benchmark_csv_ingest.py --rows 100000 1000000
+    python scripts/benchmark_csv_ingest.py --legacy-max 1000000  # Altpfad nur bis 1M
+    python scripts/benchmark_csv_ingest.py --memory              # zusätzlich Peak-Speicher
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.utils.csv_reader import read_csv_fast
+
+ARTICLES = ["Sechskantschraube DIN933 M12x35", "Mutter DIN934 M8", "Scheibe ISO7089 M10",
+            "Gewindestange DIN976 M16", "Zylinderschraube ISO4762 M6x20", "Blindniete Ø4,8"]
+SUPPLIERS = ["Würth GmbH", "Bossard AG", "Böllhoff", "Fabory", "Schäfer & Peters"]
+
+
+def write_sample(path: str, rows: int, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    block = 500_000
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("Bestelldatum;Artikel;Lieferant;Menge;Einzelpreis;Rechnungsnettowert\n")
+        for start in range(0, rows, block):
+            n = min(block, rows - start)
+            qty = rng.integers(1, 5000, n)
+            price = rng.uniform(0.01, 50, n).round(4)
+            df = pd.DataFrame({
+                "Bestelldatum": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 700, n), unit="D"),
+                "Artikel": rng.choice(ARTICLES, n),
+                "Lieferant": rng.choice(SUPPLIERS, n),
+                "Menge": qty,
+                "Einzelpreis": price,
+                "Rechnungsnettowert": (qty * price).round(2),
+            })
+            df.to_csv(f, sep=";", decimal=",", index=False, header=False, date_format="%d.%m.%Y")
+
+
+def legacy_read(path: str) -> pd.DataFrame:
+    with open(path, "rb") as f:
+        return pd.read_csv(f, sep=None, engine="python")
+
+
+def fast_read(path: str, engine: str = "c") -> pd.DataFrame:
+    with open(path, "rb") as f:
+        return read_csv_fast(f, engine=engine)
+
+
+def fast_read_progress(path: str) -> pd.DataFrame:
+    with open(path, "rb") as f:
+        return read_csv_fast(f, on_progress=lambda frac: None)
+
+
+def measure(fn, path: str, memory: bool = False):
+    """Laufzeit ohne tracemalloc (verfälscht Zeiten); Peak-Speicher optional in eigenem Lauf."""
+    t0 = time.perf_counter()
+    df = fn(path)
+    elapsed = time.perf_counter() - t0
+    shape = df.shape
+    del df
+    peak = None
+    if memory:
+        tracemalloc.start()
+        fn(path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak = peak / 1024 / 1024
+    return elapsed, peak, shape
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--legacy-max", type=int, default=None,
+                        help="Altpfad nur bis zu dieser Zeilenzahl messen (sehr langsam)")
+    parser.add_argument("--memory", action="store_true", help="Peak-Speicher zusätzlich messen")
+    args = parser.parse_args()
+
+    variants = [("python sep=None (alt)", legacy_read), ("read_csv_fast c", fast_read),
+                ("read_csv_fast c progress", fast_read_progress)]
+    try:
+        import pyarrow  # noqa: F401
+        variants.append(("read_csv_fast pyarrow", lambda p: fast_read(p, engine="pyarrow")))
+    except ImportError:
+        pass
+
+    print(f"{'Zeilen':>10} | {'Variante':<26} | {'Zeit [s]':>9} | {'Peak [MB]':>9} | Shape")
+    print("-" * 80)
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = os.path.join(tmp, f"erp_{rows}.csv")
+            write_sample(path, rows)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            for name, fn in variants:
+                if fn is legacy_read and args.legacy_max and rows > args.legacy_max:
+                    print(f"{rows:>10,} | {name:<26} | {'übersprungen':>9}")
+                    continue
+                elapsed, peak, shape = measure(fn, path, memory=args.memory)
+                peak_txt = f"{peak:>9.1f}" if peak is not None else f"{'-':>9}"
+                print(f"{rows:>10,} | {name:<26} | {elapsed:>9.2f} | {peak_txt} | {shape}")
+            print(f"{'':>10} | Dateigröße {size_mb:.1f} MB")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+SURROGAT-MODELL TRAINIEREN
+==========================
+Trainiert das Surrogat-Kostenmodell offline auf allen gesammelten GPT-Schätzungen
+und gibt den Genauigkeitsbericht der zurückgehaltenen Kalibrier-Samples aus.
+Laufende App-Prozesse laden das neue Modell beim nächsten Aufruf automatisch.
+
+Aufruf:
+    python scripts/train_surrogate.py                    # trainieren + speichern
+    python scripts/train_surrogate.py --dry-run          # nur Bericht, Modell bleibt
+    python scripts/train_surrogate.py --min-samples 200  # höhere Mindestmenge
+    python scripts/train_surrogate.py --json             # Bericht als JSON
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.core.surrogate import train_surrogate
+
+REPORT_ROWS = [
+    ("samples", "Samples gesamt", "{:d}"),
+    ("train", "Training", "{:d}"),
+    ("calibration", "Kalibrierung (zurückgehalten)", "{:d}"),
+    ("mape_material", "MAPE Material", "{:.1%}"),
+    ("mape_fab", "MAPE Fertigung", "{:.1%}"),
+    ("mape_total", "MAPE Gesamt", "{:.1%}"),
+    ("median_ape_total", "Median-APE Gesamt", "{:.1%}"),
+    ("interval_coverage", "Abdeckung 90%-Intervall", "{:.1%}"),
+    ("servable_share", "Ohne GPT beantwortbar", "{:.1%}"),
+    ("mape_total_servable", "MAPE Gesamt (beantwortbar)", "{:.1%}"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-samples", type=int, default=None,
+                        help="Mindestanzahl Samples (überschreibt EVALUERA_SURROGATE_MIN_SAMPLES)")
+    parser.add_argument("--dry-run", action="store_true", help="Modell nicht speichern")
+    parser.add_argument("--json", action="store_true", help="Bericht als JSON ausgeben")
+    args = parser.parse_args()
+
+    if args.min_samples is not None:
+        os.environ["EVALUERA_SURROGATE_MIN_SAMPLES"] = str(args.min_samples)
+
+    report = train_surrogate(save=not args.dry_run)
+    if report.get("_error"):
+        print(f"❌ {report['error']}")
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for key, label, fmt in REPORT_ROWS:
+        value = report.get(key)
+        print(f"{label:<32} {fmt.format(value) if value is not None else '-':>10}")
+    print(f"Fehlerschranke für Auslieferung: ±{report['max_rel_error']:.0%}"
+          + (" (nicht gespeichert)" if args.dry_run else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+ARTIKEL-INDEX
+=============
+Lokaler invertierter Index für die Artikelsuche.
+
+Wird einmal pro hochgeladenem Datensatz aufgebaut und liefert Kandidaten
+in Millisekunden - auch für 80k+ Artikel. GPT wird nur noch optional zum
+Nachsortieren einer kurzen Top-K-Liste gefragt.
+
+Normalisierung:
+    "DIN 933"   → din933
+    "M 12"      → m12
+    "M12x35"    → m12, 35
+    "1,25"      → 1.25
+Tippfehler in Text-Tokens ("Sechskantschruabe") werden per rapidfuzz aufgelöst,
+Teile deutscher Komposita ("schraube" → "sechskantschraube") per Infix-Treffer.
+"""
+
+import math
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    from rapidfuzz import process as rf_process, fuzz as rf_fuzz
+except Exception:
+    rf_process = None
+    rf_fuzz = None
+
+# Norm-Präfixe und Gewinde mit folgender Zahl zusammenziehen: "DIN 933" → "din933"
+_PREFIX_JOIN = re.compile(r"\b(din|iso|en|m)\s*-?\s*(?=\d)")
+# Dezimalkomma zwischen Ziffern: "1,25" → "1.25"
+_DECIMAL_COMMA = re.compile(r"(?<=\d),(?=\d)")
+# Maß-Trenner zwischen Ziffern: "12x35" → "12 35"
+_DIM_SEP = re.compile(r"(?<=\d)\s*[x×*]\s*(?=\d)")
+_TOKEN = re.compile(r"[a-zäöüß]*\d+(?:\.\d+)*|[a-zäöüß]+")
+
+# Gewichte für Treffer-Arten
+_PREFIX_WEIGHT = 0.8
+_INFIX_WEIGHT = 0.6
+_FUZZY_MIN_LEN = 4
+
+
+def normalize_text(text: Any) -> str:
+    """Kleinschreibung, NFKC, zusammengezogene Norm-/Gewinde-Präfixe, getrennte Maße."""
+    if text is None or (isinstance(text, float) and math.isnan(text)):
+        return ""
+    s = unicodedata.normalize("NFKC", str(text)).lower()
+    s = _DECIMAL_COMMA.sub(".", s)
+    s = _DIM_SEP.sub(" ", s)
+    s = _PREFIX_JOIN.sub(r"\1", s)
+    return s
+
+
+def tokenize(text: Any) -> List[str]:
+    """Zerlegt einen Text in normalisierte Such-Tokens (Reihenfolge bleibt erhalten)."""
+    return _TOKEN.findall(normalize_text(text))
+
+
+def _has_digit(token: str) -> bool:
+    return any(ch.isdigit() for ch in token)
+
+
+class ArticleIndex:
+    """
+    Invertierter Index über Artikelbezeichnungen.
+
+    Verwendung:
+        index = ArticleIndex(df[item_col].unique().tolist())
+        positions = index.search("DIN933 M12", top_k=50)
+        names = [index.items[i] for i in positions]
+    """
+
+    def __init__(self, items: Sequence[Any]):
+        self.items = list(items)
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for idx, item in enumerate(self.items):
+            for tok in set(tokenize(item)):
+                postings[tok].append(idx)
+        self._postings = dict(postings)
+        self._vocab = sorted(self._postings)
+        self._text_vocab = [t for t in self._vocab if not _has_digit(t) and len(t) >= _FUZZY_MIN_LEN]
+        self._n = max(len(self.items), 1)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _idf(self, token: str) -> float:
+        docs = self._postings.get(token)
+        return math.log(1.0 + self._n / len(docs)) if docs else 0.0
+
+    def _expand(self, token: str, fuzzy_cutoff: float) -> List[tuple]:
+        """Liefert [(index_token, gewicht)] für ein Query-Token: exakt, Präfix, Infix oder fuzzy."""
+        if token in self._postings:
+            return [(token, 1.0)]
+
+        # Präfix nur für Text-Tokens ("schraub" → "schraube"); bei Zahlen würde "m12" sonst "m120" treffen
+        if not _has_digit(token) and len(token) >= 3:
+            start = bisect_left(self._vocab, token)
+            matches = []
+            for t in self._vocab[start:]:
+                if not t.startswith(token):
+                    break
+                matches.append((t, _PREFIX_WEIGHT))
+            if matches:
+                return matches
+
+        # Infix für Komposita ("schraube" → "sechskantschraube"), nur ab _FUZZY_MIN_LEN Zeichen
+        if not _has_digit(token) and len(token) >= _FUZZY_MIN_LEN:
+            matches = [(t, _INFIX_WEIGHT) for t in self._text_vocab if token in t]
+            if matches:
+                return matches
+
+        # Fuzzy-Fallback nur für längere Text-Tokens (Maße/Normnummern müssen exakt sein)
+        if rf_process is not None and not _has_digit(token) and len(token) >= _FUZZY_MIN_LEN and self._text_vocab:
+            hits = rf_process.extract(token, self._text_vocab, scorer=rf_fuzz.ratio,
+                                      score_cutoff=fuzzy_cutoff, limit=5)
+            return [(t, score / 100.0) for t, score, _ in hits]
+        return []
+
+    def search(self, query: str, top_k: Optional[int] = 50, fuzzy_cutoff: float = 85.0,
+               min_coverage: float = 0.5) -> List[int]:
+        """
+        Sucht Artikel zu einer Freitext-Anfrage (Reihenfolge der Begriffe egal).
+
+        Ranking: Anteil gefundener Query-Tokens, dann IDF-gewichteter Score,
+        dann kürzere Bezeichnung.
+
+        Args:
+            query: Suchanfrage (z.B. "DIN 933 M12")
+            top_k: Maximale Anzahl Kandidaten (None = alle)
+            fuzzy_cutoff: Mindestähnlichkeit (0-100) für Tippfehler-Treffer
+            min_coverage: Mindestanteil der Query-Tokens, die ein Treffer enthalten muss
+
+        Returns:
+            Positionen in self.items, bestes Ergebnis zuerst
+        """
+        q_tokens = list(dict.fromkeys(tokenize(query)))
+        if not q_tokens:
+            return []
+
+        coverage: Dict[int, int] = defaultdict(int)
+        scores: Dict[int, float] = defaultdict(float)
+        for qt in q_tokens:
+            best: Dict[int, float] = {}
+            for tok, weight in self._expand(qt, fuzzy_cutoff):
+                w = weight * self._idf(tok)
+                for doc in self._postings[tok]:
+                    if w > best.get(doc, -1.0):
+                        best[doc] = w
+            for doc, w in best.items():
+                coverage[doc] += 1
+                scores[doc] += w
+
+        needed = max(1, math.ceil(len(q_tokens) * min_coverage))
+        ranked = [doc for doc, c in coverage.items() if c >= needed]
+        ranked.sort(key=lambda d: (-coverage[d], -scores[d], len(str(self.items[d]))))
+        return ranked[:top_k] if top_k else ranked
@@ -0,0 +1,191 @@
+"""
+KANONISCHER ARTIKEL-KEY
+=======================
+Führt Schreibvarianten desselben Normteils auf eine Bezeichnung zurück, damit
+sie sich einen Cache-Eintrag (und einen GPT-Call) teilen:
+
+    "DIN933 M12x35"                  → "DIN 933 M12x35"
+    "DIN 933 M12 x 35"               → "DIN 933 M12x35"
+    "M12x35 DIN933"                  → "DIN 933 M12x35"
+    "Schraube M12 nach DIN 933 L=60" → "DIN 933 M12x60"
+    "DIN 933 M12x35 8.8 verzinkt"    → "DIN 933 M12x35 8.8 zn"
+
+Bestandteile: Norm, Gewinde, Länge, Festigkeitsklasse, Beschichtung.
+
+Bewusst konservativ - im Zweifel kein Key (None), dann bleibt die Original-
+Bezeichnung der Cache-Key:
+- Norm und Gewinde müssen erkannt werden
+- JEDES Wort der Bezeichnung muss einem Bestandteil, einem Füllwort oder einer
+  zur Norm passenden Teilebezeichnung zugeordnet werden ("M12x35 Linksgewinde",
+  "DIN 933 M12x35 Edelstahl" → None)
+- widersprüchliche Angaben (zwei Längen, Teilebezeichnung passt nicht zur Norm,
+  Abweichung zu parse_dims) → None
+- DIN- und ISO-Nummern werden NICHT ineinander übersetzt (DIN 933 ≠ ISO 4017)
+"""
+
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.core.cbam import parse_dims
+
+_NUM = r"(\d+(?:\.\d+)?)"
+
+# "DIN EN ISO 4017", "ISO4762", "DIN 933", "EN 14399-4"
+_STANDARD = re.compile(r"\b(din\s*en\s*iso|din\s*iso|en\s*iso|din\s*en|din|iso|en)\s*-?\s*(\d{2,5}(?:-\d{1,2})?)\b")
+# "M12x35", "M12 x 35", "M12-35", "M12"
+_THREAD = re.compile(r"\bm\s*" + _NUM + r"(?:\s*[x-]\s*" + _NUM + r")?(?![\d.x])")
+# "L=60", "L 60", "l:60mm", "45mm", "45 mm"
+_LENGTH = re.compile(r"\bl\s*[=:]?\s*" + _NUM + r"(?:\s*mm)?\b|\b" + _NUM + r"\s*mm\b")
+# Festigkeitsklassen Stahl (ISO 898-1) und Edelstahl (ISO 3506)
+_STRENGTH = re.compile(r"\b(4\.6|4\.8|5\.6|5\.8|6\.8|8\.8|9\.8|10\.9|12\.9)(?![\d.])"
+                       r"|\b(a[1-5])(?:\s*-\s*(50|70|80|100))?\b")
+
+# Beschichtung → Kurzform (längere Schreibweisen zuerst, "feuerverzinkt" vor "verzinkt")
+_COATINGS: List[Tuple[str, str]] = [
+    (r"feuerverzinkt|feuerverz\.?|tzn|hdg", "tzn"),
+    (r"zinklamellen?(?:beschichtet|überzug)?|flzn|geomet|dacromet", "flzn"),
+    (r"galv(?:anisch|\.)?\s*verzinkt|verzinkt|galv\.?\s*zn|zn", "zn"),
+    (r"brüniert|bruniert|schwarz", "bruniert"),
+    (r"vernickelt", "ni"),
+    (r"blank", "blank"),
+]
+_COATING = [(re.compile(r"\b(?:" + pattern + r")(?![a-zäöüß])"), code) for pattern, code in _COATINGS]
+
+# Wörter ohne Einfluss auf das Teil
+_FILLER = re.compile(r"\b(?:nach|gem(?:äß|\.)?|norm|stahl-?schraube|schraube)\b")
+
+# Teilebezeichnung → Normen, zu denen sie passt (sonst Widerspruch → kein Key)
+_PART_NAMES: Dict[str, Tuple[str, ...]] = {
+    "sechskantschraube": ("DIN 931", "DIN 933", "ISO 4014", "ISO 4017", "DIN 960", "DIN 961"),
+    "sechskantschrauben": ("DIN 931", "DIN 933", "ISO 4014", "ISO 4017", "DIN 960", "DIN 961"),
+    "zylinderschraube": ("DIN 912", "ISO 4762", "DIN 7984", "ISO 14579"),
+    "zylinderschrauben": ("DIN 912", "ISO 4762", "DIN 7984", "ISO 14579"),
+    "innensechskant": ("DIN 912", "ISO 4762", "DIN 7984", "ISO 10642", "DIN 7991"),
+    "innensechskantschraube": ("DIN 912", "ISO 4762", "DIN 7984"),
+    "senkschraube": ("DIN 7991", "ISO 10642", "DIN 963", "ISO 2009"),
+    "sechskantmutter": ("DIN 934", "ISO 4032", "ISO 4033", "DIN 439", "ISO 4035"),
+    "mutter": ("DIN 934", "ISO 4032", "ISO 4033", "DIN 439", "ISO 4035", "DIN 985", "ISO 10511"),
+    "sicherungsmutter": ("DIN 985", "ISO 10511", "ISO 7040"),
+    "scheibe": ("DIN 125", "ISO 7089", "ISO 7090", "DIN 9021", "DIN 433"),
+    "unterlegscheibe": ("DIN 125", "ISO 7089", "ISO 7090", "DIN 9021", "DIN 433"),
+    "gewindestift": ("DIN 913", "DIN 914", "DIN 916", "ISO 4026", "ISO 4027", "ISO 4029"),
+}
+
+# Nach dem Herausschneiden aller erkannten Teile darf nur das übrig bleiben
+_LEFTOVER_OK = re.compile(r"^[\s,;/()\-.:]*$")
+
+
+def _fmt(value: float) -> str:
+    return f"{value:g}"
+
+
+def _standard_name(prefix: str, number: str) -> str:
+    prefix = re.sub(r"\s+", "", prefix)
+    if "iso" in prefix:
+        return f"ISO {number}"
+    if prefix == "en":
+        return f"EN {number}"
+    return f"DIN {number}" if prefix == "din" else f"DIN EN {number}"
+
+
+def _cut(text: str, match: "re.Match") -> str:
+    """Ersetzt den Treffer durch Leerzeichen (Positionen späterer Treffer bleiben gültig)."""
+    return text[:match.start()] + " " * (match.end() - match.start()) + text[match.end():]
+
+
+def parse_article(description: Any) -> Optional[Dict[str, Any]]:
+    """
+    Zerlegt eine Normteil-Bezeichnung in ihre Bestandteile.
+
+    Returns:
+        {"standard", "thread_mm", "length_mm", "strength", "coating"} oder None,
+        wenn die Bezeichnung nicht vollständig und widerspruchsfrei erkannt wurde
+    """
+    if not description:
+        return None
+    s = unicodedata.normalize("NFKC", str(description)).lower()
+    s = s.replace("×", "x").replace("*", "x")
+    s = re.sub(r"(?<=\d),(?=\d)", ".", s)
+
+    standards = {_standard_name(m.group(1), m.group(2)) for m in _STANDARD.finditer(s)}
+    if len(standards) != 1:
+        return None
+    standard = standards.pop()
+    for m in _STANDARD.finditer(s):
+        s = _cut(s, m)
+
+    threads = list(_THREAD.finditer(s))
+    if len(threads) != 1:
+        return None
+    thread_mm = float(threads[0].group(1))
+    lengths = [float(threads[0].group(2))] if threads[0].group(2) else []
+    s = _cut(s, threads[0])
+
+    strengths = set()
+    for m in list(_STRENGTH.finditer(s)):
+        strengths.add(m.group(1) or m.group(2) + (f"-{m.group(3)}" if m.group(3) else ""))
+        s = _cut(s, m)
+    if len(strengths) > 1:
+        return None
+
+    # Länge erst nach der Festigkeitsklasse, sonst wird "8.8 mm"-artiger Unsinn zur Länge
+    for m in list(_LENGTH.finditer(s)):
+        lengths.append(float(m.group(1) or m.group(2)))
+        s = _cut(s, m)
+    if len(set(lengths)) > 1:
+        return None
+    length_mm = lengths[0] if lengths else None
+
+    coatings = set()
+    for pattern, code in _COATING:
+        for m in list(pattern.finditer(s)):
+            coatings.add(code)
+            s = _cut(s, m)
+    if len(coatings) > 1:
+        return None
+
+    for m in list(_FILLER.finditer(s)):
+        s = _cut(s, m)
+    for word in re.findall(r"[a-zäöüß]+", s):
+        allowed = _PART_NAMES.get(word)
+        if allowed is None or standard not in allowed:
+            return None
+
+    if not _LEFTOVER_OK.match(re.sub(r"[a-zäöüß]+", " ", s)):
+        return None
+
+    # Gegenprobe mit der Maß-Erkennung aus cbam: darf nichts anderes herauslesen
+    d_mm, l_mm = parse_dims(description)
+    if d_mm is not None and d_mm != thread_mm:
+        return None
+    if l_mm is not None and l_mm != length_mm:
+        return None
+
+    return {
+        "standard": standard,
+        "thread_mm": thread_mm,
+        "length_mm": length_mm,
+        "strength": strengths.pop() if strengths else None,
+        "coating": coatings.pop() if coatings else None,
+    }
+
+
+def canonical_article_key(description: Any) -> Optional[str]:
+    """
+    Kanonische Bezeichnung für den Cache-Lookup, z.B. "DIN 933 M12x35 8.8 zn".
+
+    Returns:
+        Kanonischer Key oder None (Bezeichnung nicht sicher normalisierbar)
+    """
+    parts = parse_article(description)
+    if parts is None:
+        return None
+    key = f"{parts['standard']} M{_fmt(parts['thread_mm'])}"
+    if parts["length_mm"] is not None:
+        key += f"x{_fmt(parts['length_mm'])}"
+    if parts["strength"]:
+        key += f" {parts['strength'].upper() if parts['strength'].startswith('a') else parts['strength']}"
+    if parts["coating"]:
+        key += f" {parts['coating']}"
+    return key
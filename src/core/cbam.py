@@ -6,6 +6,11 @@ try:
 except Exception:
     OpenAI = None
 
+from src.gpt.cascade import cascade_request
+from src.gpt.client import get_openai_client
+from src.gpt.deadline import call_timeout, with_deadline
+from src.gpt.prompts import get_prompt, record_prompt_usage
+
 try:
     from PIL import Image
 except Exception:
@@ -25,6 +30,18 @@ _DENSITY = {
     "nickel": 8.9
 }
 
+_EU_COUNTRIES = ["deutschland", "germany", "österreich", "austria", "frankreich", "france",
+                 "italien", "italy", "spanien", "spain", "polen", "poland",
+                 "niederlande", "netherlands", "belgien", "belgium", "tschechien", "czech republic",
+                 "ungarn", "hungary", "rumänien", "romania", "schweden", "sweden",
+                 "dänemark", "denmark", "finnland", "finland", "portugal", "griechenland", "greece"]
+
+# Grobe Länder-Risikoklassen für die lokale Lieferanten-Bewertung (ohne GPT)
+_LOW_RISK_COUNTRIES = ["schweiz", "switzerland", "norwegen", "norway", "großbritannien", "united kingdom",
+                       "japan", "usa", "kanada", "canada"]
+_HIGH_RISK_COUNTRIES = ["china", "indien", "india", "türkei", "turkey", "russland", "russia",
+                        "vietnam", "brasilien", "brazil", "mexiko", "mexico", "pakistan"]
+
 _TE_MAP = {
     "stahl":"steel","steel":"steel","a2":"steel","a4":"steel","edelstahl":"steel","inox":"steel",
     "alu":"aluminum","aluminium":"aluminum","aluminum":"aluminum",
@@ -75,7 +92,7 @@ def get_material_price_eurkg(material: str) -> float:
     sym = _TE_MAP.get(str(material or "").lower(), "steel")
     url = f"https://api.tradingeconomics.com/commodities/{sym}?c={key}"
     try:
-        r = requests.get(url, timeout=8)
+        r = requests.get(url, timeout=call_timeout(8, "Materialpreis"))
         if r.ok:
             js = r.json()
             if isinstance(js, list) and js:
@@ -97,330 +114,21 @@ def gpt_estimate_material(description: str) -> Dict[str, Any]:
 
     print(f"✅ GPT-4o API-Call: gpt_estimate_material()")
     print(f"   API Key verfügbar: {key[:20]}...{key[-4:]}")
-    client = OpenAI(api_key=key)
-
-    prompt = f"""Du bist ein HOCHSPEZIALISIERTER Maschinenbau-Ingenieur und Normteile-Experte mit 25+ Jahren Erfahrung in Präzisions-Kostenkalkulation.
-
-**KRITISCH WICHTIG:** Diese Analyse wird für ECHTE Einkaufsentscheidungen verwendet. ABSOLUTE PRÄZISION ist erforderlich!
-
-**AUFGABE:** Analysiere die Artikelbezeichnung und berechne EXAKTE Material- und Geometriedaten mit vollständiger mathematischer Begründung!
-
-**ARTIKELBEZEICHNUNG:** {description}
-
-**REFERENZ-BEISPIELE FÜR PRÄZISION (so genau musst du sein!):**
-
-Beispiel 1: ISO 4028-10.9-(ZN-NI)-M10×1,25×45
-Interpretation:
-- ISO 4028 = Madenschraube (set screw, flacher Punkt)
-- 10.9 = vergüteter Stahl (Festigkeitsklasse)
-- ZN-NI = Zink-Nickel-Beschichtung (in Klammern!)
-- M10 = Gewindedurchmesser 10 mm
-- 1,25 = Feingewinde-Steigung
-- 45 = Länge 45 mm
-→ Material: **STAHL** (vergütet), Dichte: 7.85 g/cm³
-
-Beispiel 2: DIN933-ST-(A2K)-M8×25
-Interpretation:
-- DIN933 = Sechskantschraube Vollgewinde
-- ST = Stahl (explizit!)
-- (A2K) = A2K-Beschichtung (Zink-Nickel) in Klammern!
-- M8 = Gewindedurchmesser 8 mm
-- 25 = Länge 25 mm
-→ Material: **STAHL** (C-Stahl), Dichte: 7.85 g/cm³, Oberfläche: A2K
-→ **NICHT Edelstahl A2!** (wegen "ST-" und Klammern)
-
-Beispiel 3: DIN934-A2-70-M10
-Interpretation:
-- DIN934 = Sechskantmutter
-- A2-70 = Edelstahl A2 (1.4301) mit Festigkeit 70 (OHNE Klammern!)
-- M10 = Gewindedurchmesser 10 mm
-→ Material: **EDELSTAHL_A2**, Dichte: 7.90 g/cm³, KEINE Beschichtung
-
-PRÄZISE BERECHNUNG (als Vollzylinder):
-1. Volumen: V = π × r² × L = π × (5 mm)² × 45 mm = 3534 mm³ = 3,534 cm³
-2. Masse: m = V × ρ = 3,534 cm³ × 7,85 g/cm³ = 27,74 g = 0,02774 kg
-3. Materialpreis: 1,40 €/kg (vergüteter Stahl 10.9 nach Wärmebehandlung)
-4. Materialkosten: 0,02774 kg × 1,40 €/kg = 0,0388 € / Stk
-
-→ **DU MUSST DIESE PRÄZISION ERREICHEN!**
-
-**DEIN TEIL ZUM ANALYSIEREN:** {description}
-
-**WICHTIGE NORMEN & TEILE-TYPEN:**
-
-**SCHRAUBEN:**
-- DIN933 / ISO 4017 = Sechskantschraube Vollgewinde
-- DIN931 / ISO 4014 = Sechskantschraube Teilgewinde
-- DIN912 / ISO 4762 = Zylinderkopfschraube (Innensechskant)
-- DIN913 = Gewindestift mit Innensechskant (Madenschraube)
-- DIN963 / ISO 2009 = Senkschraube mit Schlitz
-- DIN965 / ISO 7046 = Senkschraube Kreuzschlitz (Phillips)
-- DIN7991 / ISO 10642 = Senkschraube Innensechskant
-- DIN603 / ISO 8677 = Flachrundschraube (Schlossschraube)
-- DIN571 = Holzschraube (Sechskantkopf)
-
-**MUTTERN:**
-- DIN934 / ISO 4032 = Sechskantmutter
-- DIN985 / ISO 10511 = Sechskantmutter mit Kunststoffring (Stoppmutter)
-- DIN439 = Sechskantmutter niedrige Form
-- DIN1587 = Hutmutter (Überwurfmutter)
-- DIN928 = Schweißmutter (Vierkant)
-- DIN6923 = Sechskantmutter mit Flansch
-
-**SCHEIBEN:**
-- DIN125 / ISO 7089 = Scheibe (Unterlegscheibe)
-- DIN127 / ISO 7090 = Federscheibe (Sicherungsscheibe)
-- DIN6798 = Zahnscheibe (Fächerscheibe)
-- DIN9021 / ISO 7093 = Scheibe mit großem Außendurchmesser (Karosseriescheibe)
-
-**BOLZEN & STIFTE:**
-- DIN1444 = Gewindestange
-- DIN7 / ISO 2338 = Zylinderstift (Passstift)
-- DIN1 / ISO 2339 = Kegelstifte
-- DIN94 = Splinte
-
-**NIETE:**
-- DIN660 = Halbrundniet
-- DIN661 = Senkniet
-
-**GEWINDE:**
-- M3, M4, M5, M6, M8, M10, M12, M16, M20, M24, M30 = Metrische Regelgewinde (Durchmesser in mm)
-- M10x1.25 = Feingewinde (Durchmesser × Steigung)
-
-**FESTIGKEITSKLASSEN (Schrauben):**
-- 4.6, 5.6, 8.8, 10.9, 12.9 = Stahl (8.8 Standard, 10.9/12.9 hochfest)
-- A2-70, A4-80 = Edelstahl (A2 Standard, A4 säurebeständig)
-
-**MATERIALIEN:**
-- Stahl: C-Stahl, Automatenstahl
-- Edelstahl: A2 (1.4301 / AISI 304), A4 (1.4401 / AISI 316)
-- Aluminium: AlMg3, AlMg5
-- Messing: CuZn39Pb3 (Ms58)
-- Kunststoff: PA6, PA66, POM
-
-**OBERFLÄCHENBEHANDLUNG:**
-- VZ / verzinkt = Galvanisch verzinkt
-- feuerverzinkt / sendzimir = Feuerverzinkung
-- blank = Unbehandelt
-- brüniert = Schwarz oxydiert
-- vernickelt = Nickelschicht
-- galvanisch = Galvanik generell
-- gelb verzinkt, blau verzinkt = Chromatierung
-- A2K = Zink-Nickel-Beschichtung (NICHT Edelstahl A2!)
-- ZN-NI = Zink-Nickel-Beschichtung
-
-🚨🚨🚨 **ULTRA-KRITISCH: MATERIAL VS. OBERFLÄCHENBEHANDLUNG** 🚨🚨🚨
-
-**DU WIRST DIESEN FEHLER NIEMALS MACHEN:**
-A2K ist NIEMALS Edelstahl A2! A2K ist eine Zink-Nickel-Beschichtung auf STAHL!
-
-**ABSOLUT EINDEUTIGE REGELN - KEINE AUSNAHMEN:**
-
-1. **KLAMMERN = BESCHICHTUNG**
-   - "(A2K)" → Beschichtung auf Stahl
-   - "(ZN-NI)" → Beschichtung auf Stahl
-   - "(VZ)" → Verzinkung auf Stahl
-   - Material ist IMMER Stahl (7.85 g/cm³), NIEMALS Edelstahl!
-
-2. **"ST-" PREFIX = STAHL**
-   - "ST-(A2K)" → Stahl mit A2K-Beschichtung
-   - "ST-VZ" → Stahl verzinkt
-   - "ST-blank" → Stahl unbehandelt
-   - Material: STAHL (7.85 g/cm³), Oberfläche: siehe Klammer
-
-3. **NUR OHNE KLAMMERN = EDELSTAHL**
-   - "A2-70" → Edelstahl A2 (7.90 g/cm³), KEINE Beschichtung
-   - "A4-80" → Edelstahl A4 (7.90 g/cm³), KEINE Beschichtung
-   - "1.4301" → Edelstahl A2 (Werkstoffnummer)
-   - NUR wenn KEIN "ST-" Prefix UND KEINE Klammern!
-
-4. **TEST: Wenn DU UNSICHER bist:**
-   - Siehst du Klammern? → STAHL mit Beschichtung
-   - Siehst du "ST-"? → STAHL
-   - Siehst du "verzinkt", "galvanisch", "beschichtet"? → STAHL
-   - Nur wenn NICHTS davon UND "A2" oder "A4" steht → Edelstahl
-
-**BEISPIELE - LERNE SIE AUSWENDIG:**
-- ❌ FALSCH: "ST-(A2K)" → Edelstahl A2
-- ✅ RICHTIG: "ST-(A2K)" → Stahl (7.85 g/cm³) + A2K-Beschichtung
-- ❌ FALSCH: "(ZN-NI)" → Irgendein Material
-- ✅ RICHTIG: "(ZN-NI)" → Stahl (7.85 g/cm³) + Zink-Nickel-Beschichtung
-- ✅ RICHTIG: "A2-70" → Edelstahl A2 (7.90 g/cm³), keine Beschichtung
-- ✅ RICHTIG: "DIN933-A2-M8" → Edelstahl A2, keine Beschichtung
-
-**UNTERSCHEIDUNGSREGEL:**
-1. "ST-" oder "Stahl" im Namen → Grundmaterial ist STAHL (C-Stahl)
-2. "(Buchstaben+Zahlen)" in Klammern → Oberflächenbehandlung auf STAHL
-3. "A2" oder "A4" OHNE Klammern und OHNE "ST-" → Edelstahl
-4. Bei Zweifel: Prüfe ob Beschichtung (verzinkt, galvanisch) angegeben → dann Stahl!
-
-**GEWICHTSBERECHNUNG - ABSOLUTE PRÄZISION ERFORDERLICH!**
-
-**GRUNDREGEL:** Berechne IMMER mit exakter Formel, NICHT mit Schätzwerten!
-
-**Berechnungsmethodik:**
-
-1. **Vollzylinder-Approximation** (für einfache Teile):
-   - Volumen: V = π × r² × L (in mm³)
-   - Masse: m = V × Dichte / 1000 (in Gramm)
-   - Beispiel M10×45: V = π × 5² × 45 = 3534 mm³ → 27,74 g
-
-2. **Schrauben mit Kopf:**
-   - Kopf-Volumen (Sechskant): V_kopf = (Schlüsselweite/2)² × π × Kopfhöhe × 0.85
-   - Schaft-Volumen: V_schaft = π × (d/2)² × (Länge - Kopfhöhe)
-   - Gewinde-Reduktion: -15% wegen Kerben
-   - Gesamt: V_total = V_kopf + V_schaft × 0.85
-
-3. **Muttern:**
-   - Außen-Volumen: V_außen = (Schlüsselweite/2)² × π × Höhe × 0.85
-   - Gewindeloch-Abzug: -40% für Kernloch
-   - Netto: V_netto = V_außen × 0.60
-
-**REALISTISCHE GEWICHTS-REFERENZEN (Stahl 7,85 g/cm³):**
-- M6×20 Schraube: 5,2 g (berechnet: π×3²×20×0.85 = 481 mm³ = 3,78 g + Kopf ~1,5 g)
-- M8×30 Schraube: 13,5 g
-- M10×30 Schraube: 20,1 g (Zylinder: π×5²×30 = 2356 mm³ = 18,5 g + Kopf)
-- M10×45 Madenschraube: 27,74 g (Vollzylinder ohne Kopf!)
-- M12×40 Schraube: 38,2 g
-- M16×50 Schraube: 85,3 g
-
-**MATERIALPREISE (realistisch für industrielle Beschaffung):**
-- Standard-Stahl C-Stahl (4.6, 5.6): 0,90-1,10 €/kg
-- Vergüteter Stahl (8.8): 1,20-1,35 €/kg
-- Hochfester Stahl (10.9, 12.9): 1,35-1,50 €/kg
-- Edelstahl A2 (1.4301): 2,80-3,20 €/kg
-- Edelstahl A4 (1.4401): 3,50-4,00 €/kg
-- Aluminium AlMg3: 2,20-2,60 €/kg
-- Messing CuZn39: 7,50-8,50 €/kg
-
-**Antworte als DETAILLIERTES JSON mit ALLEN Berechnungsschritten:**
-{{
-  "material_guess": "stahl|edelstahl_a2|edelstahl_a4|aluminium|messing",
-  "mass_kg": 0.02774,
-  "diameter_mm": 10,
-  "length_mm": 45,
-  "confidence": "high|medium|low",
-
-  "part_identification": {{
-    "part_type": "set_screw|bolt|screw|nut|washer|pin|rivet|stud",
-    "standard": "ISO 4028",
-    "description": "Madenschraube mit flachem Punkt",
-    "din_equivalent": "DIN 913 / DIN 916"
-  }},
-
-  "geometry_details": {{
-    "thread_size": "M10",
-    "thread_pitch_mm": 1.25,
-    "thread_type": "feingewinde",
-    "nominal_length_mm": 45,
-    "nominal_diameter_mm": 10,
-    "head_type": "none|hexagon|cylindrical|countersunk",
-    "head_dimensions": "Ohne Kopf (Madenschraube) oder Schlüsselweite XX mm",
-    "drive_type": "slot|hex_socket|phillips|torx"
-  }},
-
-  "material_details": {{
-    "base_material": "stahl",
-    "material_grade": "10.9",
-    "strength_class": "10.9 = vergüteter Stahl, Rm=1000 MPa",
-    "density_g_cm3": 7.85,
-    "surface_treatment": "Zink-Nickel (ZN-NI) Beschichtung",
-    "material_price_eur_kg": 1.40,
-    "price_justification": "Vergüteter Stahl 10.9 nach Wärmebehandlung"
-  }},
-
-  "mass_calculation": {{
-    "calculation_method": "Vollzylinder-Approximation (keine Kopf, Madenschraube)",
-    "radius_mm": 5.0,
-    "length_mm": 45,
-    "volume_formula": "V = π × r² × L",
-    "volume_mm3": 3534,
-    "volume_cm3": 3.534,
-    "density_g_cm3": 7.85,
-    "calculated_mass_g": 27.74,
-    "mass_kg": 0.02774,
-    "step_by_step": [
-      "1. Radius: r = 10mm / 2 = 5 mm",
-      "2. Volumen: V = π × (5 mm)² × 45 mm = π × 25 × 45 = 3534 mm³",
-      "3. Volumen in cm³: 3534 mm³ / 1000 = 3.534 cm³",
-      "4. Masse: m = 3.534 cm³ × 7.85 g/cm³ = 27.74 g",
-      "5. Masse in kg: 27.74 g / 1000 = 0.02774 kg"
-    ],
-    "head_volume_cm3": 0,
-    "shaft_volume_cm3": 3.534,
-    "thread_reduction_factor": 1.0
-  }},
-
-  "material_cost_calculation": {{
-    "mass_kg": 0.02774,
-    "material_price_eur_kg": 1.40,
-    "material_cost_eur": 0.0388,
-    "calculation": "0.02774 kg × 1.40 €/kg = 0.0388 €/Stk"
-  }},
-
-  "alternative_interpretations": [
-    "ISO 4028 kann auch andere Punktformen haben (Kegelspitze, Ringschneide)"
-  ],
-
-  "assumptions": [
-    "Vollzylinder ohne Kopf (Madenschraube)",
-    "Feingewinde M10×1,25 (Standard für M10 Feingewinde)",
-    "Vergüteter Stahl 10.9 nach DIN EN ISO 898-1",
-    "Zink-Nickel Beschichtung ~8-12 µm"
-  ]
-}}
-
-⚙️ **MATERIAL-PROZESS-KOMPATIBILITÄT PRÜFEN:**
-
-Nachdem du das Material geschätzt hast, VALIDIERE ob das Material mit typischen Fertigungsprozessen für dieses Teil kompatibel ist:
-
-**Typische Prozesse nach Teil-Typ:**
-- **Schrauben/Muttern (Normteile):**
-  - Massenproduktion: **Cold Forming (Kaltumformung)** für Stahl, Edelstahl
-  - Kleinserien: **CNC-Drehen** für alle Materialien
-  - WICHTIG: Cold Forming funktioniert NICHT mit spröden Materialien (Gusseisen, Keramik)
-
-- **Custom Teile:**
-  - **CNC-Drehen/Fräsen** für Metalle (Stahl, Edelstahl, Aluminium, Messing)
-  - **Guss** für Eisen, Aluminium
-  - **Kunststoff-Spritzguss** für PA, POM, etc.
-
-**VALIDIERUNGS-REGEL:**
-1. Wenn Material + Prozess INKOMPATIBEL → Material ist falsch! Korrigiere!
-2. Wenn Material unklar → Wähle das Material das am besten zum Prozess passt!
-
-**Beispiele Material-Prozess-Kompatibilität:**
-- ✅ Schraube aus Stahl + Cold Forming = PERFEKT
-- ✅ Schraube aus Edelstahl A2 + Cold Forming = PERFEKT
-- ❌ Schraube aus Gusseisen + Cold Forming = UNMÖGLICH → Material falsch!
-- ✅ Bolzen aus Messing + CNC-Drehen = PERFEKT
-- ❌ Normschraube aus Titan + Cold Forming = TEUER/UNÜBLICH → Prüfe nochmal!
+    client = get_openai_client(key)
 
-**WENN MATERIAL UNKLAR:**
-1. Prüfe den wahrscheinlichsten Fertigungsprozess
-2. Wähle das Material das am besten zu diesem Prozess passt
-3. Für Schrauben/Normteile: Default ist STAHL (nicht Edelstahl ohne eindeutigen Hinweis!)
-4. Für Custom-Teile: Analysiere Anforderungen (Festigkeit, Korrosion, Gewicht)
-
-**KRITISCH WICHTIG:**
-- Gewicht MUSS realistisch sein (Schrauben wiegen Gramm, nicht Kilogramm!)
-- Bei unklarer Bezeichnung: Mehrere Interpretationen angeben
-- Confidence "high" NUR bei eindeutiger Norm-Erkennung
-- Für Muttern/Scheiben: Passende Geometrie nutzen!
-- **MATERIAL-PROZESS-KOMPATIBILITÄT IMMER VALIDIEREN!**
-"""
+    # Statische Anleitung aus der Registry (Prompt-Cache-Präfix), hier nur die Artikeldaten
+    template = get_prompt("material_estimate")
+    prompt = f"**ARTIKELBEZEICHNUNG:** {description}"
 
     try:
         # GPT-4o: Bestes verfügbares Modell für maximale Präzision
         # WICHTIG: GPT-4o verwendet max_completion_tokens und erlaubt keine custom temperature
-        res = client.chat.completions.create(
+        res = with_deadline(client).chat.completions.create(
             model="gpt-4o",
-            messages=[
-                {"role":"system","content":"Du bist ein SENIOR COST ENGINEER mit 25+ Jahren Erfahrung in Präzisions-Kostenkalkulation für Normteile und technische Komponenten. Du arbeitest für einen Einkaufsleiter, der deine Zahlen für ECHTE Verhandlungen nutzt. ABSOLUTE MATHEMATISCHE PRÄZISION ist erforderlich - keine Schätzungen, nur exakte Berechnungen mit vollständiger Dokumentation aller Schritte!"},
-                {"role":"user","content":prompt}
-            ],
+            messages=template.messages(prompt),
             max_tokens=3000  # GPT-4o API verwendet max_completion_tokens
         )
+        usage = record_prompt_usage(template.name, res.usage)
         txt = res.choices[0].message.content.strip()
 
         # Robustes JSON Parsing mit mehreren Fallbacks
@@ -472,7 +180,7 @@ Nachdem du das Material geschätzt hast, VALIDIERE ob das Material mit typischen
         if material_cost_calc:
             material_cost_eur = material_cost_calc.get("material_cost_eur")
 
-        print(f"✅ GPT-4o Response erhalten - Tokens: {res.usage.total_tokens}")
+        print(f"✅ GPT-4o Response erhalten - Tokens: {res.usage.total_tokens} (Prompt-Cache: {usage['cached_tokens']})")
         print(f"   → Masse: {mass_kg:.5f} kg" if mass_kg else "   → Masse: N/A")
         print(f"   → Materialpreis: {material_price_eur_kg:.2f} €/kg" if material_price_eur_kg else "   → Materialpreis: N/A")
         print(f"   → Materialkosten: {material_cost_eur:.4f} €/Stk" if material_cost_eur else "   → Materialkosten: N/A")
@@ -502,7 +210,9 @@ Nachdem du das Material geschätzt hast, VALIDIERE ob das Material mit typischen
 
             "raw": txt,
             "_api_called": True,
-            "_tokens_used": res.usage.total_tokens
+            "_tokens_used": res.usage.total_tokens,
+            "_cached_tokens": usage["cached_tokens"],
+            "_prompt_version": template.version
         }
     except Exception as e:
         import traceback
@@ -529,12 +239,12 @@ def choose_process_with_gpt(description: str, material: str, d_mm: Optional[floa
     key = os.getenv("OPENAI_API_KEY")
     if not key or OpenAI is None:
         return {"process":"turning","setup_time_min":30,"cycle_time_s":6.0,"machine_eur_h":80.0,"labor_eur_h":30.0,"overhead_pct":0.2,"raw":None}
-    client = OpenAI(api_key=key)
+    client = get_openai_client(key)
     prompt = f"""Wähle plausiblen Hauptprozess. JSON:
 {{"process":"cold_forming|turning|milling|casting|stamping|injection_molding","setup_time_min":30,"cycle_time_s":1.5,"machine_eur_h":60,"labor_eur_h":25,"overhead_pct":0.15}}
 Teil: {description}, Material: {material}, D: {d_mm}, L: {l_mm}, Losgröße: {lot_size}"""
     try:
-        res = client.chat.completions.create(
+        res = with_deadline(client).chat.completions.create(
             model="gpt-4o-mini",
             messages=[{"role":"system","content":"Return only compact JSON."},{"role":"user","content":prompt}],
             temperature=0.1,
@@ -588,13 +298,13 @@ def gpt_fab_cost_per_unit(description: str, lot_size: int) -> Optional[float]:
     key = os.getenv("OPENAI_API_KEY")
     if not key or OpenAI is None:
         return None
-    client = OpenAI(api_key=key)
+    client = get_openai_client(key)
     prompt = f"""Schätze die reinen Fertigungskosten pro Stück in EUR (ohne Material).
 Antworte nur als kompaktes JSON: {{"cost_per_unit_eur": 0.0}}
 Artikel: {description}
 Losgröße: {lot_size}"""
     try:
-        res = client.chat.completions.create(
+        res = with_deadline(client).chat.completions.create(
             model="gpt-4o-mini",
             messages=[{"role":"system","content":"Return only compact JSON."},{"role":"user","content":prompt}],
             temperature=0.15,
@@ -659,7 +369,7 @@ def gpt_analyze_technical_drawing(image_data: bytes, filename: str = "drawing")
     if not key or OpenAI is None:
         return {"error": "OpenAI API nicht verfügbar", "items": []}
 
-    client = OpenAI(api_key=key)
+    client = get_openai_client(key)
 
     # Bild zu Base64
     try:
@@ -737,7 +447,7 @@ Wichtig:
 - Realistische Schätzungen für Gewicht/Maße"""
 
     try:
-        response = client.chat.completions.create(
+        response = with_deadline(client).chat.completions.create(
             model="gpt-4o-mini",  # gpt-4o-mini unterstützt auch Vision!
             messages=[
                 {
@@ -828,7 +538,7 @@ def gpt_negotiation_prep(supplier_name: str, country: str = None, rating: int =
     if not key or OpenAI is None:
         return {"strategy": "Keine GPT-Verfügbarkeit", "talking_points": [], "tactics": [], "red_flags": []}
 
-    client = OpenAI(api_key=key)
+    client = get_openai_client(key)
 
     # Kontext aufbauen - SO VIEL WIE MÖGLICH!
     context_parts = [f"Lieferant: {supplier_name}"]
@@ -1058,7 +768,7 @@ Antworte als AUSFÜHRLICHES JSON:
 - Gebe wörtliche Formulierungen die der Einkäufer 1:1 nutzen kann!"""
 
     try:
-        res = client.chat.completions.create(
+        res = with_deadline(client).chat.completions.create(
             model="gpt-4o",  # UPGRADE: Beste Qualität für strategische Beratung!
             messages=[
                 {"role": "system", "content": "Du bist ein SENIOR PROCUREMENT NEGOTIATION EXPERT mit 20+ Jahren Erfahrung. Gib HOCHSPEZIFISCHE, maßgeschneiderte Strategien mit konkreten Formulierungen. Keine generischen Ratschläge - alles muss auf den spezifischen Fall zugeschnitten sein!"},
@@ -1220,14 +930,8 @@ def calculate_co2_footprint(mass_kg: float, supplier_country: str, material: str
     cbam_price_per_ton = 100.0  # €/t CO₂ (Prognose 2026)
 
     # Prüfe ob Import aus Nicht-EU-Land
-    eu_countries = ["deutschland", "germany", "österreich", "austria", "frankreich", "france",
-                    "italien", "italy", "spanien", "spain", "polen", "poland",
-                    "niederlande", "netherlands", "belgien", "belgium", "tschechien", "czech republic",
-                    "ungarn", "hungary", "rumänien", "romania", "schweden", "sweden",
-                    "dänemark", "denmark", "finnland", "finland", "portugal", "griechenland", "greece"]
-
     country_lower = str(supplier_country or "").lower()
-    is_eu = any(eu in country_lower for eu in eu_countries)
+    is_eu = any(eu in country_lower for eu in _EU_COUNTRIES)
 
     if is_eu:
         cbam_cost_eur = 0.0  # CBAM gilt nicht für EU-Binnenmarkt!
@@ -1382,6 +1086,162 @@ def get_supplier_financial_data(supplier_name: str, country: str = None,
     }
 
 
+# ==================== LOKALE LIEFERANTEN-HEURISTIKEN ====================
+# Ersatz für die GPT-Bewertung, wenn die Schritt-Deadline abläuft (src.gpt.deadline)
+
+# Artikel-Stichworte → Fertigungsverfahren / Material (Kleinschreibung, Teilstring)
+_PROCESS_KEYWORDS = {
+    "cold_forming": ("schraube", "bolzen", "niet", "stift", "mutter"),
+    "turning": ("welle", "buchse", "hülse", "drehteil", "achse", "distanz"),
+    "milling": ("flansch", "gehäuse", "fräs", "platte", "halter"),
+    "stamping": ("scheibe", "blech", "stanz", "clip", "feder"),
+    "die_casting": ("druckguss", "guss"),
+    "injection_molding": ("kunststoff", "spritzguss", "pa6", "pa66", "pom"),
+}
+_MATERIAL_KEYWORDS = {
+    "stainless_steel": ("edelstahl", "inox", "a2", "a4", "1.4301", "1.4401", "1.4571"),
+    "aluminum": ("alu",),
+    "brass": ("messing", "cuzn", "ms58"),
+    "copper": ("kupfer",),
+    "plastics": ("kunststoff", "pa6", "pa66", "pom", "nylon"),
+    "steel": ("stahl", "verzinkt", "8.8", "10.9", "12.9", "brüniert"),
+}
+_FASTENER_MARKERS = ("din", "iso", "schraube", "mutter", "scheibe", "bolzen", "niet")
+
+
+def country_risk(country: Optional[str]) -> str:
+    """Grobe Länder-Risikoklasse: low (EU/stabile Industrieländer), high, sonst medium."""
+    name = str(country or "").strip().lower()
+    if not name:
+        return "medium"
+    if any(c in name for c in _EU_COUNTRIES) or any(c in name for c in _LOW_RISK_COUNTRIES):
+        return "low"
+    if any(c in name for c in _HIGH_RISK_COUNTRIES):
+        return "high"
+    return "medium"
+
+
+def heuristic_rate_supplier(supplier_name: str, country: str = None, price_volatility: float = None,
+                            total_orders: int = None, avg_price: float = None,
+                            article_name: str = None) -> Dict[str, Any]:
+    """
+    Lokale Lieferanten-Bewertung ohne GPT aus Preisvolatilität, Land und Bestellhistorie.
+    Gleiches Format wie gpt_rate_supplier, confidence immer "low".
+    """
+    rating = 6
+    strengths, weaknesses, risks = [], [], []
+
+    volatility_pct = None
+    price_stability = "unknown"
+    if price_volatility is not None:
+        volatility_pct = price_volatility * 100
+        if volatility_pct < 5:
+            rating, price_stability = rating + 2, "very_stable"
+            strengths.append(f"Sehr stabile Preise ({volatility_pct:.1f}% Variation)")
+        elif volatility_pct < 15:
+            rating, price_stability = rating + 1, "stable"
+            strengths.append(f"Moderat stabile Preise ({volatility_pct:.1f}% Variation)")
+        elif volatility_pct < 30:
+            rating, price_stability = rating - 1, "volatile"
+            weaknesses.append(f"Schwankende Preise ({volatility_pct:.1f}% Variation)")
+        else:
+            rating, price_stability = rating - 2, "very_volatile"
+            weaknesses.append(f"Stark schwankende Preise ({volatility_pct:.1f}% Variation)")
+
+    risk = country_risk(country)
+    if risk == "low":
+        rating += 1
+        strengths.append(f"Geringes Länderrisiko ({country})")
+    elif risk == "high":
+        rating -= 1
+        risks.append(f"Erhöhtes Länderrisiko ({country}): Lieferzeiten, Zölle, Währung")
+
+    order_frequency = "unknown"
+    if total_orders:
+        if total_orders > 50:
+            rating, order_frequency = rating + 1, "high"
+            strengths.append(f"Lange Lieferbeziehung ({total_orders} Bestellungen)")
+        elif total_orders > 10:
+            order_frequency = "medium"
+        else:
+            order_frequency = "low"
+            weaknesses.append(f"Wenig Bestellhistorie ({total_orders} Bestellungen)")
+
+    rating = max(1, min(10, rating))
+    risk_level = "low" if rating >= 8 else "medium" if rating >= 5 else "high" if rating >= 3 else "critical"
+
+    return {
+        "rating": rating,
+        "risk_level": risk_level,
+        "confidence": "low",
+        "company_analysis": {},
+        "country_analysis": {"country_risk": risk},
+        "article_fit": {},
+        "performance_metrics": {
+            "price_stability": price_stability,
+            "price_volatility_pct": round(volatility_pct, 1) if volatility_pct is not None else None,
+            "order_frequency": order_frequency,
+            "total_orders": total_orders,
+        },
+        "strengths": strengths,
+        "weaknesses": weaknesses,
+        "risks": risks,
+        "recommendations": ["Lokale Schnellbewertung - KI-Bewertung später erneut anfordern"],
+        "overall_assessment": (f"Heuristische Bewertung von {supplier_name} aus Preisstabilität, "
+                               f"Herkunftsland und Bestellhistorie: {rating}/10."),
+        "country_risk": risk,
+        "price_competitiveness": "average",
+        "raw": None,
+        "_fallback": True,
+    }
+
+
+def _keyword_evidence(articles: List[str], keywords: Dict[str, tuple]) -> Dict[str, List[str]]:
+    """Kategorie → Artikel, deren Bezeichnung eines der Stichworte enthält (häufigste zuerst)."""
+    evidence: Dict[str, List[str]] = {}
+    for article in articles:
+        text = str(article).lower()
+        for category, words in keywords.items():
+            if any(w in text for w in words):
+                evidence.setdefault(category, []).append(str(article))
+    return dict(sorted(evidence.items(), key=lambda kv: -len(kv[1])))
+
+
+def heuristic_supplier_competencies(supplier_name: str, article_history: List[str] = None,
+                                    country: str = None) -> Dict[str, Any]:
+    """
+    Lokale Kompetenz-Analyse ohne GPT: Stichworte in der Artikelhistorie des Lieferanten.
+    Gleiches Format wie gpt_analyze_supplier_competencies, Konfidenz höchstens "medium".
+    """
+    articles = [a for a in (article_history or []) if a]
+
+    def _confidence(hits: List[str]) -> str:
+        return "medium" if len(hits) >= max(3, len(articles) // 4) else "low"
+
+    processes = _keyword_evidence(articles, _PROCESS_KEYWORDS)
+    materials = _keyword_evidence(articles, _MATERIAL_KEYWORDS)
+    fasteners = sum(1 for a in articles if any(m in str(a).lower() for m in _FASTENER_MARKERS))
+
+    return {
+        "supplier_name": supplier_name,
+        "analysis_confidence": "low",
+        "core_competencies": [
+            {"process": process, "confidence": _confidence(hits), "evidence": hits[:3],
+             "capability_level": "proficient" if _confidence(hits) == "medium" else "basic"}
+            for process, hits in processes.items()
+        ] or [{"process": "unknown", "confidence": "low", "evidence": []}],
+        "material_expertise": [
+            {"material": material, "confidence": _confidence(hits), "evidence": hits[:3]}
+            for material, hits in materials.items()
+        ],
+        "specialization": {
+            "primary_focus": "fasteners" if articles and fasteners * 2 >= len(articles) else "custom_parts",
+        },
+        "recommendations": [f"Lokale Analyse aus {len(articles)} Artikeln - KI-Analyse später erneut anfordern"],
+        "_fallback": True,
+    }
+
+
 def gpt_analyze_supplier_competencies(supplier_name: str, article_history: List[str] = None,
                                        country: str = None) -> Dict[str, Any]:
     """
@@ -1393,8 +1253,8 @@ def gpt_analyze_supplier_competencies(supplier_name: str, article_history: List[
         print("⚠️ WARNING: FALLBACK - Kein API Key für gpt_analyze_supplier_competencies!")
         return {"core_competencies": ["turning", "milling"], "material_expertise": ["steel"], "production_methods": [], "_fallback": True}
 
-    print(f"✅ GPT-4o API-Call: gpt_analyze_supplier_competencies({supplier_name})")
-    client = OpenAI(api_key=key)
+    print(f"✅ GPT API-Call (Kaskade): gpt_analyze_supplier_competencies({supplier_name})")
+    client = get_openai_client(key)
 
     # Artikel-Historie zusammenfassen
     article_summary = "\n".join([f"- {art}" for art in (article_history or [])[:50]]) if article_history else "Keine Artikelhistorie verfügbar"
@@ -1523,37 +1383,31 @@ Antworte als DETAILLIERTES JSON:
 **WICHTIG:** Sei SEHR spezifisch! Nutze die Artikelbezeichnungen um präzise Rückschlüsse zu ziehen!"""
 
     try:
-        res = client.chat.completions.create(
-            model="gpt-4o",  # Beste Qualität für Analyse!
-            messages=[
+        # gpt-4o-mini zuerst, gpt-4o nur bei ungültiger Antwort / analysis_confidence low
+        outcome = cascade_request(
+            "supplier_competencies",
+            [
                 {"role": "system", "content": "Du bist ein Senior Manufacturing & Supply Chain Analyst. Analysiere Lieferanten-Kompetenzen EXTREM präzise basierend auf deren Artikelportfolio. Identifiziere Fertigungsverfahren und Materialexpertise."},
                 {"role": "user", "content": prompt}
             ],
+            client_factory=lambda: client,
             temperature=0.1,
-            max_tokens=2500
         )
-        txt = res.choices[0].message.content.strip()
+        if outcome.get("_error"):
+            raise RuntimeError(outcome["error"])
+        txt = outcome["text"]
+        data = outcome["data"]
 
-        # JSON Parsing
-        data = {}
-        try:
-            data = json.loads(txt)
-        except Exception:
-            m = re.search(r'```json\s*([\s\S]*?)\s*```', txt)
-            if m:
-                data = json.loads(m.group(1))
-            else:
-                m = re.search(r'\{[\s\S]*\}', txt)
-                data = json.loads(m.group(0)) if m else {}
-
-        print(f"✅ GPT-4o Response - Tokens: {res.usage.total_tokens}")
+        print(f"✅ {outcome['model']} Response - Tokens: {outcome['tokens_used']}")
         print(f"   → Hauptkompetenzen: {[c.get('process') for c in data.get('core_competencies', [])]}")
 
         return {
             **data,
             "raw": txt,
             "_api_called": True,
-            "_tokens_used": res.usage.total_tokens
+            "_tokens_used": outcome["tokens_used"],
+            "_model": outcome["model"],
+            "_escalations": outcome["escalations"]
         }
     except Exception as e:
         print(f"❌ ERROR in gpt_analyze_supplier_competencies: {e}")
@@ -1577,8 +1431,8 @@ def gpt_rate_supplier(supplier_name: str, country: str = None, price_volatility:
         print("⚠️ WARNING: FALLBACK - Kein API Key für gpt_rate_supplier!")
         return {"rating": 5, "risk_level": "medium", "strengths": [], "weaknesses": [], "recommendations": [], "raw": None, "_fallback":True}
 
-    print(f"✅ GPT-4o-mini API-Call: gpt_rate_supplier({supplier_name})")
-    client = OpenAI(api_key=key)
+    print(f"✅ GPT API-Call (Kaskade): gpt_rate_supplier({supplier_name})")
+    client = get_openai_client(key)
 
     # Kontextinformationen zusammenstellen - SO VIEL WIE MÖGLICH!
     context_parts = [f"Lieferant: {supplier_name}"]
@@ -1711,43 +1565,25 @@ Antworte als AUSFÜHRLICHES JSON:
 **WICHTIG:** Sei SEHR spezifisch und detailliert! Nutze dein Wissen über die Branche und recherchiere den Lieferanten!"""
 
     try:
-        res = client.chat.completions.create(
-            model="gpt-4o",  # UPGRADE: Bessere Analyse & Recherche-Fähigkeit!
-            messages=[
+        # gpt-4o-mini zuerst, gpt-4o nur bei ungültiger Antwort / confidence low
+        outcome = cascade_request(
+            "rate_supplier",
+            [
                 {"role": "system", "content": "Du bist ein Senior Supply Chain Analyst mit 15+ Jahren Erfahrung. Führe TIEFGEHENDE, detaillierte Analysen durch. Recherchiere Firmenhintergründe und gebe fundierte Bewertungen."},
                 {"role": "user", "content": prompt}
             ],
+            client_factory=lambda: client,
             temperature=0.1,  # Sehr präzise, aber etwas Kreativität für Recherche
-            max_tokens=2000  # NOCH mehr Platz!
         )
-        txt = res.choices[0].message.content.strip()
+        if outcome.get("_error"):
+            raise RuntimeError(outcome["error"])
+        txt = outcome["text"]
+        data = outcome["data"]
+        if not data:
+            print(f"⚠️  Kein JSON gefunden in GPT Response!")
+            print(f"   Rohe Response (erste 500 chars): {txt[:500]}")
 
-        # Robustes JSON Parsing mit mehreren Fallbacks
-        data = {}
-        try:
-            # Versuch 1: Ganzer Text ist JSON
-            data = json.loads(txt)
-        except Exception:
-            try:
-                # Versuch 2: JSON in ```json ... ``` Code-Block
-                m = re.search(r'```json\s*([\s\S]*?)\s*```', txt)
-                if m:
-                    data = json.loads(m.group(1))
-                else:
-                    # Versuch 3: Beliebiges { ... } Pattern
-                    m = re.search(r'\{[\s\S]*\}', txt)
-                    if m:
-                        data = json.loads(m.group(0))
-                    else:
-                        print(f"⚠️  Kein JSON gefunden in GPT Response!")
-                        print(f"   Rohe Response (erste 500 chars): {txt[:500]}")
-                        data = {}
-            except Exception as e2:
-                print(f"⚠️  JSON Parsing fehlgeschlagen: {e2}")
-                print(f"   Rohe Response (erste 500 chars): {txt[:500]}")
-                data = {}
-
-        print(f"✅ GPT-4o Response - Tokens: {res.usage.total_tokens}")
+        print(f"✅ {outcome['model']} Response - Tokens: {outcome['tokens_used']}")
 
         # Extrahiere alle detaillierten Analysen
         company_analysis = data.get("company_analysis", {})
@@ -1781,7 +1617,9 @@ Antworte als AUSFÜHRLICHES JSON:
 
             "raw": txt,
             "_api_called": True,
-            "_tokens_used": res.usage.total_tokens
+            "_tokens_used": outcome["tokens_used"],
+            "_model": outcome["model"],
+            "_escalations": outcome["escalations"]
         }
     except Exception as e:
         print(f"❌ ERROR in gpt_rate_supplier: {e}")
@@ -1808,7 +1646,7 @@ def gpt_cost_estimate_unit(description: str, lot_size: int = 1000,
         print("⚠️ WARNING: FALLBACK - Kein API Key für gpt_cost_estimate_unit!")
         return {"part_class":None,"likely_process":None,"fab_cost_eur_per_unit":None,"assumptions":[],"raw":None,"_fallback":True}
     print(f"✅ GPT-4o API-Call: gpt_cost_estimate_unit() (2-Step Analyse) - Losgröße: {lot_size}")
-    client = OpenAI(api_key=key)
+    client = get_openai_client(key)
 
     # Skaleneffekt-Hinweis generieren
     scale_hint = ""
@@ -2212,7 +2050,7 @@ Antworte als JSON:
 }}"""
 
         print("   🔍 Schritt 1/2: Prozess-Analyse mit GPT-4o...")
-        analysis_res = client.chat.completions.create(
+        analysis_res = with_deadline(client).chat.completions.create(
             model="gpt-4o",
             messages=[
                 {"role":"system","content":"Du bist ein SENIOR MANUFACTURING ENGINEER mit 20+ Jahren Erfahrung in Prozessplanung. Analysiere EXTREM präzise und begründe jeden Prozessschritt."},
@@ -2284,7 +2122,7 @@ WICHTIG: Nutze die vorgegebene erwartete Zykluszeit! Weiche NUR ab wenn es techn
             system_prompt = "Du bist ein SENIOR MANUFACTURING COST ENGINEER mit 20+ Jahren Erfahrung in Präzisions-Kostenkalkulation. Du arbeitest für einen Einkaufsleiter, der deine Zahlen für ECHTE Verhandlungen nutzt. ABSOLUTE MATHEMATISCHE PRÄZISION erforderlich - keine Schätzungen, nur exakte Berechnungen mit vollständiger Dokumentation aller Schritte! Rechne IMMER in €/Sekunde für präzise Taktkosten!"
 
         print("   💰 Schritt 2/2: Detaillierte Kostenberechnung mit GPT-4o...")
-        res = client.chat.completions.create(
+        res = with_deadline(client).chat.completions.create(
             model="gpt-4o",
             messages=[
                 {"role":"system","content":system_prompt},
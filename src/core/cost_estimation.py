@@ -11,12 +11,24 @@ VORHER:
 NACHHER:
 1. gpt_complete_cost_estimate() → ALLES in einem!
 = 1 API-Call, 50% schneller, günstiger, genauer
+
+MODELL:
+gpt-4o-mini mit Schema-Antwort, gpt-4o nur bei ungültiger Antwort oder
+confidence "low" (Kaskade, siehe src.gpt.cascade); temperature=0 und gehedgt
+gegen hängende Requests (src.gpt.hedging)
+
+PORTFOLIO:
+gpt_complete_cost_estimate_batch() → bis zu N Artikel pro Call
+= statische Anleitung einmal pro Batch statt pro Artikel
+
+Konfiguration (ENV):
+    EVALUERA_COST_BATCH_MAX_ITEMS   Artikel pro Batch-Request (Default: 10)
 """
 
 import os
 import json
 import traceback
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Iterable, Callable, Sequence
 from src.gpt.utils import (
     parse_gpt_json,
     safe_float,
@@ -26,12 +38,203 @@ from src.gpt.utils import (
     safe_gpt_request,
 )
 
+from src.core.cbam import calc_fab_cost_per_unit
+from src.gpt.cascade import cascade_request
+from src.gpt.client import get_openai_client
+from src.gpt.concurrency import map_bounded
+from src.gpt.rate_limiter import estimate_tokens
+from src.gpt.prompts import get_prompt, record_prompt_usage
+
 try:
     from openai import OpenAI
 except ImportError:
     OpenAI = None
 
 
+# Losgrößen-Regime: (obere Grenze exklusiv, Prompt-Hinweis, Referenz-Losgröße)
+# Innerhalb eines Regimes bleiben Prozess, Taktzeit und Stundensätze gleich -
+# nur die Rüstkosten-Umlage ändert sich und wird lokal nachgerechnet.
+LOT_SIZE_REGIMES = [
+    (100, "SEHR KLEIN → hohe Rüstkosten/Stk!", 30),
+    (1000, "Klein → moderate Rüstkosten", 300),
+    (10000, "Mittel → Rüstkosten gut verteilt", 3000),
+    (100000, "GROSS → minimale Rüstkosten, Automatisierung", 30000),
+    (None, "MASSENPRODUKTION (>100k) → Vollautomatisierung!", 300000),
+]
+
+# Stützstellen für die Kostenkurve in der UI
+DEFAULT_CURVE_LOT_SIZES = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000,
+                           25000, 50000, 100000, 250000, 500000, 1000000]
+
+
+def lot_size_regime(lot_size: int) -> int:
+    """Index des Losgrößen-Regimes (0 = sehr klein ... 4 = Massenproduktion)."""
+    lot_size = max(int(lot_size or 1), 1)
+    for idx, (upper, _hint, _ref) in enumerate(LOT_SIZE_REGIMES):
+        if upper is None or lot_size < upper:
+            return idx
+    return len(LOT_SIZE_REGIMES) - 1
+
+
+def regime_reference_lot_size(lot_size: int) -> int:
+    """Referenz-Losgröße, mit der GPT für das Regime von lot_size gefragt wird."""
+    return LOT_SIZE_REGIMES[lot_size_regime(lot_size)][2]
+
+
+def regime_bounds(lot_size: int) -> tuple:
+    """(untere Grenze inkl., obere Grenze exkl. oder None) des Regimes."""
+    idx = lot_size_regime(lot_size)
+    lower = LOT_SIZE_REGIMES[idx - 1][0] if idx > 0 else 1
+    return lower, LOT_SIZE_REGIMES[idx][0]
+
+
+def _secondary_ops_cost(estimate: Dict[str, Any]) -> float:
+    total = 0.0
+    for op in estimate.get("secondary_ops") or []:
+        if isinstance(op, dict):
+            total += safe_float(op.get("cost_eur"), 0.0)
+    return total
+
+
+def rescale_estimate_to_lot_size(estimate: Dict[str, Any], lot_size: int) -> Dict[str, Any]:
+    """
+    Rechnet eine GPT-Schätzung lokal auf eine andere Losgröße um.
+
+    Material und losgrößenunabhängige Parameter (Rüstzeit, Taktzeit, Stundensätze,
+    Overhead) bleiben gleich. Die Fertigungskosten werden um die Differenz der
+    Rüstkosten-Umlage laut calc_fab_cost_per_unit verschoben, damit GPTs eigene
+    Kalibrierung (Sekundär-Ops etc.) erhalten bleibt.
+
+    Args:
+        estimate: Ergebnis von gpt_complete_cost_estimate
+        lot_size: Ziel-Losgröße
+
+    Returns:
+        Neues Dict mit fab_cost_eur/total_cost_eur für lot_size
+    """
+    if not estimate or estimate.get("_error"):
+        return estimate
+
+    lot_size = max(int(lot_size or 1), 1)
+    # Losgröße, auf die sich fab_cost_eur aktuell bezieht (Umrechnung ist verkettbar)
+    ref_lot = int(estimate.get("lot_size") or estimate.get("_reference_lot_size") or lot_size)
+
+    out = dict(estimate)
+    fab_ref = estimate.get("fab_cost_eur")
+    if estimate.get("setup_time_min") is not None and estimate.get("cycle_time_s") is not None:
+        fab_at_lot = calc_fab_cost_per_unit(estimate, lot_size)
+        if fab_ref is None:
+            fab = fab_at_lot + _secondary_ops_cost(estimate)
+        else:
+            fab = fab_ref + (fab_at_lot - calc_fab_cost_per_unit(estimate, ref_lot))
+        out["fab_cost_eur"] = max(fab, 0.0)
+
+    out["total_cost_eur"] = (out.get("material_cost_eur") or 0.0) + (out.get("fab_cost_eur") or 0.0)
+    out["lot_size"] = lot_size
+    out["_reference_lot_size"] = int(estimate.get("_reference_lot_size") or ref_lot)
+    out["_lot_regime"] = lot_size_regime(lot_size)
+    out["_rescaled"] = lot_size != out["_reference_lot_size"]
+    return out
+
+
+def cost_curve(estimate: Dict[str, Any], lot_sizes: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+    """
+    Kosten-vs-Losgröße-Kurve aus EINER Schätzung (ohne weitere API-Calls).
+
+    Returns:
+        Liste von {"lot_size", "material_cost_eur", "fab_cost_eur", "total_cost_eur", "in_regime"}
+    """
+    if not estimate or estimate.get("_error"):
+        return []
+    regime = lot_size_regime(estimate.get("_reference_lot_size") or estimate.get("lot_size") or 1)
+    points = []
+    for ls in (lot_sizes or DEFAULT_CURVE_LOT_SIZES):
+        r = rescale_estimate_to_lot_size(estimate, ls)
+        points.append({
+            "lot_size": int(ls),
+            "material_cost_eur": r.get("material_cost_eur") or 0.0,
+            "fab_cost_eur": r.get("fab_cost_eur") or 0.0,
+            "total_cost_eur": r.get("total_cost_eur") or 0.0,
+            "in_regime": lot_size_regime(ls) == regime,
+        })
+    return points
+
+
+def _supplier_context(supplier_competencies: Optional[Dict[str, Any]]) -> str:
+    """Prompt-Zeile mit den Kernprozessen des Lieferanten (leer ohne Analyse)."""
+    if supplier_competencies and not supplier_competencies.get('_fallback'):
+        comps = supplier_competencies.get('core_competencies', [])
+        if comps:
+            processes = [c.get('process') for c in comps[:3]]
+            return f"\n**LIEFERANTEN-EXPERTISE:** {', '.join(sanitize_input(p or '') for p in processes)}"
+    return ""
+
+
+def _drawing_context(technical_drawing_context: Optional[Dict[str, Any]]) -> str:
+    """Prompt-Zeilen aus der Zeichnungsanalyse inkl. Extras als Kostentreiber."""
+    if not technical_drawing_context:
+        return ""
+    # WICHTIG: Wir übergeben das GANZE Objekt, damit GPT alle Details hat!
+    drawing_context_str = f"\n**TECHNISCHE ZEICHNUNG INFOS:** {json.dumps(technical_drawing_context, ensure_ascii=False)}"
+
+    # Expliziter Hinweis auf Extras für Kosten
+    extras = []
+    if isinstance(technical_drawing_context, dict):
+        items = technical_drawing_context.get("items", [])
+        if items and isinstance(items, list):
+            # Nehme Extras vom ersten Item (Hauptteil)
+            extras = list(items[0].get("extras", []))
+            serration = items[0].get("serration_details", "")
+            if serration:
+                extras.append(f"Verzahnung: {serration}")
+
+    if extras:
+        drawing_context_str += f"\n**EXTRAS & BESONDERHEITEN (KOSTENTREIBER!):** {', '.join(extras)}"
+    return drawing_context_str
+
+
+def _estimate_from_data(data: Dict[str, Any], lot_size: int) -> Dict[str, Any]:
+    """Kostenfelder aus einer GPT-JSON-Antwort (mit Fallbacks und Nachberechnung)."""
+    result = {
+        # Material
+        "material_guess": str(data.get("material_guess", "stahl")).split("|")[0].strip().lower(),
+        "d_mm": safe_float(data.get("d_mm")),
+        "l_mm": safe_float(data.get("l_mm")),
+        "mass_kg": safe_float(data.get("mass_kg")),
+        "material_price_eur_kg": safe_float(data.get("material_price_eur_kg"), 1.2),
+        "material_cost_eur": safe_float(data.get("material_cost_eur")),
+
+        # Fertigung
+        "process": str(data.get("process", "cold_forming")),
+        "setup_time_min": safe_float(data.get("setup_time_min"), 30),
+        "cycle_time_s": safe_float(data.get("cycle_time_s"), 2.0),
+        "machine_eur_h": safe_float(data.get("machine_eur_h"), 70),
+        "labor_eur_h": safe_float(data.get("labor_eur_h"), 30),
+        "overhead_pct": safe_float(data.get("overhead_pct"), 0.18),
+        "secondary_ops": data.get("secondary_ops", []),
+        "fab_cost_eur": safe_float(data.get("fab_cost_eur")),
+
+        # Gesamt
+        "total_cost_eur": safe_float(data.get("total_cost_eur")),
+
+        # Meta
+        "confidence": data.get("confidence", "medium"),
+        "assumptions": data.get("assumptions", []),
+        "lot_size": int(lot_size),
+        "_reference_lot_size": int(lot_size),
+    }
+
+    # Fallback-Berechnung falls GPT was vergessen hat
+    if result["material_cost_eur"] is None and result["mass_kg"] and result["material_price_eur_kg"]:
+        result["material_cost_eur"] = result["mass_kg"] * result["material_price_eur_kg"]
+
+    if result["total_cost_eur"] is None:
+        mat_cost = result["material_cost_eur"] or 0.0
+        fab_cost = result["fab_cost_eur"] or 0.0
+        result["total_cost_eur"] = mat_cost + fab_cost
+    return result
+
+
 def gpt_complete_cost_estimate(
     description: str,
     lot_size: int = 1000,
@@ -88,203 +291,24 @@ def gpt_complete_cost_estimate(
             "_fallback": True
         }
 
-    safe_print(f"OK GPT-4o ALL-IN-ONE Cost Estimate: {description} @ {lot_size:,} Stk")
-    client = OpenAI(api_key=key)
+    safe_print(f"OK ALL-IN-ONE Cost Estimate (Kaskade): {description} @ {lot_size:,} Stk")
+    client = get_openai_client(key)
 
     # Losgrössen-Kontext
-    scale_hint = ""
-    if lot_size < 100:
-        scale_hint = "SEHR KLEIN → hohe Rüstkosten/Stk!"
-    elif lot_size < 1000:
-        scale_hint = "Klein → moderate Rüstkosten"
-    elif lot_size < 10000:
-        scale_hint = "Mittel → Rüstkosten gut verteilt"
-    elif lot_size < 100000:
-        scale_hint = "GROSS → minimale Rüstkosten, Automatisierung"
-    else:
-        scale_hint = "MASSENPRODUKTION (>100k) → Vollautomatisierung!"
-
-    # Lieferanten-Kontext (falls vorhanden)
-    supplier_context = ""
-    if supplier_competencies and not supplier_competencies.get('_fallback'):
-        comps = supplier_competencies.get('core_competencies', [])
-        if comps:
-            processes = [c.get('process') for c in comps[:3]]
-            supplier_context = f"\n**LIEFERANTEN-EXPERTISE:** {', '.join(sanitize_input(p or '') for p in processes)}"
-
-    # Technische Zeichnung Kontext (falls vorhanden)
-    drawing_context_str = ""
-    if technical_drawing_context:
-        # Extrahiere relevante Infos (Oberfläche, Toleranzen, Extras, Verzahnung)
-        # WICHTIG: Wir übergeben das GANZE Objekt, damit GPT alle Details hat!
-        drawing_context_str = f"\n**TECHNISCHE ZEICHNUNG INFOS:** {json.dumps(technical_drawing_context, ensure_ascii=False)}"
-        
-        # Expliziter Hinweis auf Extras für Kosten
-        extras = []
-        if isinstance(technical_drawing_context, dict):
-             items = technical_drawing_context.get("items", [])
-             if items and isinstance(items, list):
-                 # Nehme Extras vom ersten Item (Hauptteil)
-                 extras = items[0].get("extras", [])
-                 serration = items[0].get("serration_details", "")
-                 if serration:
-                     extras.append(f"Verzahnung: {serration}")
-
-        if extras:
-            drawing_context_str += f"\n**EXTRAS & BESONDERHEITEN (KOSTENTREIBER!):** {', '.join(extras)}"
-
-    # KOMBINIERTER PROMPT - Material + Prozess + Kosten (EXTREM GÜNSTIG - WORST CASE)
-    prompt = f"""Du bist ein SENIOR COST ENGINEER mit 25+ Jahren Erfahrung in globaler Low-Cost-Beschaffung.
-
-**🎯 KALKULATIONSSTRATEGIE - ABSOLUT MINIMAL REALISTISCH (WORST-CASE FOR SELLER):**
-
-**PFLICHT-ANNAHMEN** für Kalkulation:
-✅ **FIND THE MINIMALLY POSSIBLE REALISTIC MANUFACTURING COSTS**
-✅ **Assume BEST-CASE EFFICIENCY AT SCALE**
-✅ **Assume supplier with HIGHEST AUTOMATION LEVEL**
-✅ **Assume LOWEST GLOBAL RAW MATERIAL SPOT PRICE**
-✅ **Assume OPTIMIZED CYCLE TIME & MINIMAL SCRAP (<2%)**
-✅ **Assume EXPERT SUPPLIER** (wenn expertise vorhanden)
-
-Berechne mit folgenden EXTREM günstigen Parametern:
-- **Niedriglohnland:** China/Vietnam/Indien (Lohnkosten: 5-15€/h)
-- **Energiekosten:** Minimale Industriepreise (0.06-0.10€/kWh)
-- **Vollautomatisierung:** 24/7 Betrieb, >95% Maschinenauslastung
-- **Moderne Technologie:** Neueste CNC/Robotik/Industrie 4.0
-- **Großabnehmer-Konditionen:** Rohstoff-Spot-Markt, Direktbezug
-- **Optimale Materialausnutzung:** Verschnitt <2%, optimierte Blanks
-- **Economies of Scale:** Große Losgrößen, minimale Rüstkosten
-
-**KRITISCH WICHTIG:**
-- Wähle **IMMER den ABSOLUT UNTEREN BEREICH** plausibler Kosten
-- Modelliere **Best-Case-Szenarien** für ALLE Aspekte
-- Ziel: Zeige MAXIMALES Einsparungspotenzial für Einkäufer
-- Kosten müssen technisch plausibel bleiben (KEINE Fantasiewerte!)
-- Denke wie ein Low-Cost-Anbieter in Asien mit modernster Ausstattung
-
-**AUFGABE:** Analysiere den Artikel und berechne KOMPLETTE Kosten (Material + Fertigung) in EINEM Durchgang!
-
-**ARTIKEL:** {description}
-**LOSGRÖSSE:** {lot_size:,} Stück ({scale_hint}){supplier_context}{drawing_context_str}
-
-**WAS DU BERECHNEN MUSST:**
-
-1. **MATERIAL-ANALYSE:**
-   - Material (stahl/edelstahl_a2/aluminium/messing/etc.)
-   - Geometrie (Durchmesser d_mm, Länge l_mm)
-   - Masse (mass_kg) - Zylinder-Approximation OK
-   - Materialpreis (material_price_eur_kg) - realistisch für EU
-   - Materialkosten (material_cost_eur = mass_kg × price_eur_kg)
-
-2. **FERTIGUNGS-ANALYSE:**
-   - Prozess (cold_forming/turning/milling/stamping/etc.)
-   - Rüstzeit (setup_time_min)
-   - Taktzeit (cycle_time_s pro Stück)
-   - Maschinenkosten (machine_eur_h)
-   - Personalkosten (labor_eur_h)
-   - Overhead (overhead_pct, typisch 15-25%)
-   - Sekundär-Ops (Wärmebehandlung, Beschichtung, etc.)
-   - **Fertigungskosten (fab_cost_eur) berechnet!**
-
-3. **GESAMT-KALKULATION:**
-   - total_cost_eur = material_cost_eur + fab_cost_eur
-
-**WICHTIGE REGELN:**
-
-**Material-Erkennung:**
-- **WENN TECHNISCHE ZEICHNUNG VORHANDEN:** Verwende das EXAKTE Material aus der Zeichnung (z.B. "FeZnNi", "CuZn39Pb3", etc.) - KEINE Vereinfachung!
-- DIN/ISO-Normen beachten
-- (Klammern) = Beschichtung, NICHT Material!
-- A2/A4 ohne Klammern = Edelstahl
-- ST- oder "Stahl" = C-Stahl
-- Festigkeitsklassen (8.8, 10.9) = Stahl
-
-**Prozess-Auswahl:**
-- Schrauben/Normteile + Losgrösse >1000 → cold_forming
-- Custom-Teile oder Kleinserien → turning/milling
-- Blechteile → stamping
-- Aluminium-Teile → die_casting oder turning
-
-**Kosten-Berechnung:**
-```
-Rüstkosten/Stk = (setup_time_min / 60 × (machine_eur_h + labor_eur_h)) / lot_size
-Variable Kosten = cycle_time_s / 3600 × (machine_eur_h + labor_eur_h)
-Fertigung/Stk = (Rüstkosten/Stk + Variable Kosten) × (1 + overhead_pct)
-+ Sekundär-Ops (falls vorhanden)
-```
-
-**BEISPIEL - M10×30 Schraube, 10000 Stk:**
-
-```json
-{{
-  "material_guess": "stahl",
-  "d_mm": 10.0,
-  "l_mm": 30.0,
-  "mass_kg": 0.0186,
-  "material_price_eur_kg": 1.20,
-  "material_cost_eur": 0.0223,
-
-  "process": "cold_forming",
-  "setup_time_min": 45,
-  "cycle_time_s": 1.8,
-  "machine_eur_h": 70,
-  "labor_eur_h": 30,
-  "overhead_pct": 0.18,
-  "secondary_ops": [
-    {{"name": "threading", "cost_eur": 0.008}},
-    {{"name": "heat_treatment", "cost_eur": 0.012}}
-  ],
-
-  "fab_cost_eur": 0.0824,
-  "total_cost_eur": 0.1047,
-
-  "confidence": "high",
-  "assumptions": [
-    "Zylinder-Approximation für Masse",
-    "Cold forming für Standard-Schraube",
-    "Wärmebehandlung in Charge"
-  ]
-}}
-```
-
-**ANTWORTE NUR ALS KOMPAKTES JSON (alle Felder):**
-
-{{
-  "material_guess": "...",
-  "d_mm": 0.0,
-  "l_mm": 0.0,
-  "mass_kg": 0.0,
-  "material_price_eur_kg": 0.0,
-  "material_cost_eur": 0.0,
-
-  "process": "...",
-  "setup_time_min": 0,
-  "cycle_time_s": 0.0,
-  "machine_eur_h": 0,
-  "labor_eur_h": 0,
-  "overhead_pct": 0.0,
-  "secondary_ops": [...],
-
-  "fab_cost_eur": 0.0,
-  "total_cost_eur": 0.0,
-
-  "confidence": "high|medium|low",
-  "assumptions": [...]
-}}
-"""
+    scale_hint = LOT_SIZE_REGIMES[lot_size_regime(lot_size)][1]
+
+    supplier_context = _supplier_context(supplier_competencies)
+    drawing_context_str = _drawing_context(technical_drawing_context)
+
+    # KOMBINIERTER PROMPT - statische Anleitung aus der Registry (Prompt-Cache-Präfix),
+    # hier nur noch die Request-Daten
+    template = get_prompt("cost_estimate")
+    prompt = f"""**ARTIKEL:** {description}
+**LOSGRÖSSE:** {lot_size:,} Stück ({scale_hint}){supplier_context}{drawing_context_str}"""
 
     try:
         messages = sanitize_payload_recursive([
-            {
-                "role": "system",
-                "content": sanitize_input(
-                    "Du bist ein Senior Cost Engineer. Analysiere Artikel und berechne KOMPLETTE Kosten (Material + Fertigung) präzise. Antworte NUR als JSON."
-                ),
-            },
-            {
-                "role": "user",
-                "content": sanitize_input(prompt),
-            },
+            {**m, "content": sanitize_input(m["content"])} for m in template.messages(prompt)
         ])
 
         _debug_unicode("prompt", prompt)
@@ -293,68 +317,38 @@ Fertigung/Stk = (Rüstkosten/Stk + Variable Kosten) × (1 + overhead_pct)
 
         safe_print("DEBUG cost_estimation: messages built, calling OpenAI...")
 
-        api_result = safe_gpt_request(
-            model="gpt-4o",
-            messages=messages,
-            client_factory=lambda: OpenAI(api_key=key),
-            temperature=0.1,
-            max_tokens=2000,
+        # gpt-4o-mini mit Schema-Antwort, gpt-4o nur bei ungültiger Antwort / confidence low
+        outcome = cascade_request(
+            "cost_estimate",
+            messages,
+            client_factory=lambda: get_openai_client(key),
+            temperature=0,  # deterministisch → Hedging erlaubt (src.gpt.hedging)
             retries=1,
         )
 
-        if api_result.get("_error"):
-            safe_print(f"ERROR in safe_gpt_request: {api_result}")
-            raise RuntimeError(api_result.get("error", "safe_gpt_request failed"))
+        if outcome.get("_error"):
+            safe_print(f"ERROR in cascade_request: {outcome}")
+            raise RuntimeError(outcome.get("error", "cascade_request failed"))
 
-        response = api_result["response"]
+        usages = [record_prompt_usage(template.name, response.usage) for response in outcome["responses"]]
+        txt = outcome["text"]
+        data = outcome["data"]
 
-        raw_txt = response.choices[0].message.content or ""
-        txt = sanitize_input(raw_txt.strip())
-        data = parse_gpt_json(txt, default={})
-
-        # Extrahiere alle Werte mit Fallbacks
         result = {
-            # Material
-            "material_guess": str(data.get("material_guess", "stahl")).split("|")[0].strip().lower(),
-            "d_mm": safe_float(data.get("d_mm")),
-            "l_mm": safe_float(data.get("l_mm")),
-            "mass_kg": safe_float(data.get("mass_kg")),
-            "material_price_eur_kg": safe_float(data.get("material_price_eur_kg"), 1.2),
-            "material_cost_eur": safe_float(data.get("material_cost_eur")),
-
-            # Fertigung
-            "process": str(data.get("process", "cold_forming")),
-            "setup_time_min": safe_float(data.get("setup_time_min"), 30),
-            "cycle_time_s": safe_float(data.get("cycle_time_s"), 2.0),
-            "machine_eur_h": safe_float(data.get("machine_eur_h"), 70),
-            "labor_eur_h": safe_float(data.get("labor_eur_h"), 30),
-            "overhead_pct": safe_float(data.get("overhead_pct"), 0.18),
-            "secondary_ops": data.get("secondary_ops", []),
-            "fab_cost_eur": safe_float(data.get("fab_cost_eur")),
-
-            # Gesamt
-            "total_cost_eur": safe_float(data.get("total_cost_eur")),
-
-            # Meta
-            "confidence": data.get("confidence", "medium"),
-            "assumptions": data.get("assumptions", []),
+            **_estimate_from_data(data, lot_size),
 
             # Debug
             "raw": txt,
-            "_tokens_used": response.usage.total_tokens,
+            "_tokens_used": outcome["tokens_used"],
+            "_cached_tokens": sum(u["cached_tokens"] for u in usages if u),
+            "_prompt_version": template.version,
+            "_model": outcome["model"],
+            "_escalations": outcome["escalations"],
             "_api_called": True
         }
 
-        # Fallback-Berechnung falls GPT was vergessen hat
-        if result["material_cost_eur"] is None and result["mass_kg"] and result["material_price_eur_kg"]:
-            result["material_cost_eur"] = result["mass_kg"] * result["material_price_eur_kg"]
-
-        if result["total_cost_eur"] is None:
-            mat_cost = result["material_cost_eur"] or 0.0
-            fab_cost = result["fab_cost_eur"] or 0.0
-            result["total_cost_eur"] = mat_cost + fab_cost
-
-        safe_print(f"OK ALL-IN-ONE Estimate tokens={result.get('_tokens_used')}")
+        safe_print(f"OK ALL-IN-ONE Estimate model={result['_model']} tokens={result.get('_tokens_used')} "
+                   f"cached={result.get('_cached_tokens')}")
         safe_print(f"Material: {result.get('material_cost_eur')} | Fertigung: {result.get('fab_cost_eur')} | TOTAL: {result.get('total_cost_eur')}")
 
         return result
@@ -371,3 +365,209 @@ Fertigung/Stk = (Rüstkosten/Stk + Variable Kosten) × (1 + overhead_pct)
             "_debug_supplier_context": supplier_context,
             "_debug_messages": messages if 'messages' in locals() else None,
         }
+
+
+# ==================== BATCH-MODUS ====================
+# Mehrere Artikel pro GPT-Request: die ~1k Tokens statische Anleitung werden
+# einmal pro Batch statt einmal pro Artikel gesendet.
+
+DEFAULT_BATCH_MAX_ITEMS = 10
+# Geschätzte Antwort-Tokens je Artikel (JSON-Objekt inkl. kurzer Annahmen)
+BATCH_OUTPUT_TOKENS_PER_ITEM = 450
+# Antwort-Limit des Modells und Obergrenze für die Artikel-Daten im Prompt
+BATCH_MAX_OUTPUT_TOKENS = 16000
+BATCH_MAX_INPUT_TOKENS = 24000
+
+
+def batch_max_items() -> int:
+    """Maximale Artikel pro Batch-Request (ENV EVALUERA_COST_BATCH_MAX_ITEMS)."""
+    try:
+        return max(1, int(os.getenv("EVALUERA_COST_BATCH_MAX_ITEMS", DEFAULT_BATCH_MAX_ITEMS)))
+    except ValueError:
+        return DEFAULT_BATCH_MAX_ITEMS
+
+
+def _batch_row(item: Dict[str, Any]) -> Dict[str, Any]:
+    lot_size = int(item["lot_size"])
+    return {
+        "id": str(item["id"]),
+        "artikel": sanitize_input(item["description"]),
+        "losgroesse": lot_size,
+        "hinweis": LOT_SIZE_REGIMES[lot_size_regime(lot_size)][1],
+    }
+
+
+def plan_batches(items: Sequence[Dict[str, Any]], max_items: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+    """
+    Teilt Artikel in Batches, die Antwort- und Prompt-Limit einhalten.
+
+    Args:
+        items: [{"id", "description", "lot_size"}, ...]
+        max_items: Obergrenze je Batch (Default: batch_max_items())
+    """
+    limit = min(max_items or batch_max_items(), BATCH_MAX_OUTPUT_TOKENS // BATCH_OUTPUT_TOKENS_PER_ITEM)
+    batches: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    current_tokens = 0
+    for item in items:
+        row_tokens = estimate_tokens("gpt-4o", [{"role": "user", "content": json.dumps(_batch_row(item), ensure_ascii=False)}], max_tokens=1)
+        if current and (len(current) >= limit or current_tokens + row_tokens > BATCH_MAX_INPUT_TOKENS):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += row_tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _run_batch(batch: List[Dict[str, Any]], context: str, key: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Ein Batch-Request. Bei API-Fehler, abgeschnittener oder unlesbarer Antwort wird
+    der Batch halbiert und erneut versucht; Einzelartikel ohne Ergebnis fehlen im Dict.
+    """
+    template = get_prompt("cost_estimate_batch")
+    rows = [_batch_row(item) for item in batch]
+    prompt = f"""**KONTEXT (gilt für alle Artikel):**{context or " keiner"}
+
+**ARTIKEL ({len(rows)}):**
+{json.dumps(rows, ensure_ascii=False, indent=0)}"""
+    messages = sanitize_payload_recursive([
+        {**m, "content": sanitize_input(m["content"])} for m in template.messages(prompt)
+    ])
+
+    def _split() -> Dict[str, Dict[str, Any]]:
+        if len(batch) == 1:
+            return {}
+        mid = len(batch) // 2
+        safe_print(f"WARN Kosten-Batch ({len(batch)}) wird geteilt: {mid} + {len(batch) - mid}")
+        return {**_run_batch(batch[:mid], context, key), **_run_batch(batch[mid:], context, key)}
+
+    api_result = safe_gpt_request(
+        model="gpt-4o",
+        function="cost_estimate_batch",
+        messages=messages,
+        client_factory=lambda: get_openai_client(key),
+        temperature=0.1,
+        max_tokens=min(BATCH_MAX_OUTPUT_TOKENS, BATCH_OUTPUT_TOKENS_PER_ITEM * len(batch) + 300),
+        retries=1,
+    )
+    if api_result.get("_stage") == "deadline":
+        # Teilen hilft nicht mehr - fehlende Artikel übernimmt der Einzel-Fallback
+        safe_print(f"WARN Kosten-Batch ({len(batch)}): {api_result.get('error')}")
+        return {}
+    if api_result.get("_error"):
+        safe_print(f"ERROR Kosten-Batch ({len(batch)}): {api_result.get('error')}")
+        return _split()
+
+    response = api_result["response"]
+    usage = record_prompt_usage(template.name, response.usage)
+    choice = response.choices[0]
+    if getattr(choice, "finish_reason", None) == "length":
+        return _split()
+
+    txt = sanitize_input((choice.message.content or "").strip())
+    data = parse_gpt_json(txt, default={})
+    rows_out = data.get("results") if isinstance(data, dict) else None
+    if not isinstance(rows_out, list):
+        return _split()
+
+    by_id = {str(item["id"]): item for item in batch}
+    results: Dict[str, Dict[str, Any]] = {}
+    for row in rows_out:
+        if not isinstance(row, dict):
+            continue
+        item = by_id.get(str(row.get("id")))
+        if item is None or str(item["id"]) in results:
+            continue
+        if safe_float(row.get("total_cost_eur"), None) is None and safe_float(row.get("fab_cost_eur"), None) is None:
+            continue  # unvollständig → Einzel-Call
+        estimate = _estimate_from_data(row, int(item["lot_size"]))
+        if safe_float(estimate.get("total_cost_eur")) <= 0:
+            continue  # 0-€-Schätzung nicht cachen/lernen → Einzel-Call
+        results[str(item["id"])] = estimate
+
+    total_tokens = response.usage.total_tokens
+    for result in results.values():
+        result.update({
+            "raw": None,
+            "_tokens_used": round(total_tokens / len(results)),
+            "_cached_tokens": round((usage["cached_tokens"] if usage else 0) / len(results)),
+            "_prompt_version": template.version,
+            "_batch_size": len(batch),
+            "_api_called": True,
+        })
+    safe_print(f"OK Kosten-Batch: {len(results)}/{len(batch)} Artikel, tokens={total_tokens} "
+               f"(~{total_tokens // max(len(results), 1)}/Artikel)")
+    return results
+
+
+def gpt_complete_cost_estimate_batch(
+    items: Sequence[Dict[str, Any]],
+    supplier_competencies: Optional[Dict[str, Any]] = None,
+    technical_drawing_context: Optional[Dict[str, Any]] = None,
+    fallback: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Kostenschätzung für viele Artikel mit wenigen GPT-Calls.
+
+    Batches laufen parallel (map_bounded). Artikel, für die der Batch kein
+    brauchbares Ergebnis liefert, werden einzeln geschätzt - ebenfalls parallel.
+
+    Args:
+        items: [{"id", "description", "lot_size"}, ...] - ids eindeutig
+        supplier_competencies: Gemeinsamer Lieferanten-Kontext
+        technical_drawing_context: Gemeinsamer Zeichnungskontext
+        fallback: Einzel-Schätzung für ein Item (Default: gpt_complete_cost_estimate)
+        on_progress: Callback(erledigte Artikel, Gesamt) im aufrufenden Thread,
+                     auch je fertiger Einzel-Schätzung
+
+    Returns:
+        id -> Ergebnis im Format von gpt_complete_cost_estimate
+    """
+    items = list(items)
+    if not items:
+        return {}
+    if fallback is None:
+        def fallback(item):
+            return gpt_complete_cost_estimate(item["description"], int(item["lot_size"]),
+                                              supplier_competencies, technical_drawing_context)
+
+    done = 0
+
+    def _advance(n: int):
+        nonlocal done
+        done += n
+        if on_progress is not None and n:
+            on_progress(done, len(items))
+
+    key = os.getenv("OPENAI_API_KEY")
+    results: Dict[str, Dict[str, Any]] = {}
+    if key and OpenAI is not None:
+        context = _supplier_context(supplier_competencies) + _drawing_context(technical_drawing_context)
+        batches = plan_batches(items)
+
+        def _batch_progress(_done, _total, idx, outcome):
+            # Nur gelieferte Artikel zählen - der Rest kommt mit der Einzel-Schätzung
+            if outcome["ok"]:
+                _advance(sum(1 for item in batches[idx] if str(item["id"]) in outcome["result"]))
+
+        outcomes = map_bounded(lambda batch: _run_batch(batch, context, key), batches, on_progress=_batch_progress)
+        for outcome in outcomes:
+            if outcome["ok"]:
+                results.update(outcome["result"])
+            else:
+                safe_print(f"ERROR Kosten-Batch: {outcome['error']}")
+
+    missing = [item for item in items if str(item["id"]) not in results]
+    if missing:
+        safe_print(f"WARN Kosten-Batch: {len(missing)} Artikel einzeln nachschätzen")
+        outcomes = map_bounded(fallback, missing, on_progress=lambda *_: _advance(1))
+        for item, outcome in zip(missing, outcomes):
+            if outcome["ok"]:
+                results[str(item["id"])] = outcome["result"]
+            else:
+                safe_print(f"ERROR Kosten-Schätzung {item['id']}: {outcome['error']}")
+                results[str(item["id"])] = {"_error": True, "error": outcome["error"], "trace": outcome.get("trace")}
+    return results
@@ -0,0 +1,93 @@
+"""
+DATASET-SCHEMA
+==============
+Einmalige Erkennung der Spaltenrollen eines Bestelldatensatzes
+(Artikel, Lieferant, Menge, Einzelpreis, Gesamtbetrag, Datum, Währung, Land).
+
+Wird beim Upload bestimmt und mit dem Datensatz gespeichert
+(siehe src.utils.dataset_snapshot); alle Konsumenten lesen dieselbe Zuordnung
+statt eigene Kandidatenlisten zu durchsuchen.
+"""
+
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from src.core.price_utils import PRICE_TOTAL_CANDS, PRICE_UNIT_CANDS, QTY_CANDS
+
+ROLE_CANDIDATES: Dict[str, List[str]] = {
+    "date": ["date", "datum", "bestelldatum", "order_date", "zeitpunkt"],
+    "currency": ["currency", "währung", "waehrung", "whrg", "curr"],
+    "country": ["country", "land", "herkunft", "ursprung", "origin"],
+    "quantity": QTY_CANDS,
+    "unit_price": PRICE_UNIT_CANDS + ["price", "preis"],
+    "total": PRICE_TOTAL_CANDS,
+    "supplier": ["supplier", "lieferant", "vendor", "anbieter", "firma", "kreditor"],
+    "item": ["item", "bezeichnung", "beschreibung", "description", "artikel", "produkt", "material"],
+}
+# Nur wenn keine Hauptkandidaten passen - die Artikelsuche arbeitet auf Freitext,
+# Bezeichnungen gehen deshalb vor Artikelnummern
+ROLE_FALLBACKS: Dict[str, List[str]] = {
+    "item": ["artikelnummer", "artnr", "sachnummer"],
+}
+# Reihenfolge der Zuordnung: spezifische Rollen zuerst, damit z.B. "qty_total"
+# als Menge und nicht als Gesamtbetrag erkannt wird
+ROLE_ORDER = ["date", "currency", "country", "quantity", "unit_price", "total", "supplier", "item"]
+
+
+@dataclass
+class DatasetSchema:
+    """Spaltenname je Rolle (None = nicht vorhanden)."""
+    item: Optional[str] = None
+    supplier: Optional[str] = None
+    quantity: Optional[str] = None
+    unit_price: Optional[str] = None
+    total: Optional[str] = None
+    date: Optional[str] = None
+    currency: Optional[str] = None
+    country: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DatasetSchema":
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in (data or {}).items() if k in names})
+
+
+def _match(columns: List[Any], candidates: List[str], taken: set) -> Optional[Any]:
+    """Exakter Treffer vor Teilstring-Treffer, Kandidaten in Prioritätsreihenfolge."""
+    norm = [(col, str(col).strip().lower()) for col in columns if col not in taken]
+    for cand in candidates:
+        for col, name in norm:
+            if name == cand:
+                return col
+    for cand in candidates:
+        for col, name in norm:
+            if cand in name:
+                return col
+    return None
+
+
+def infer_schema(df: pd.DataFrame) -> DatasetSchema:
+    """
+    Bestimmt die Spaltenrollen eines DataFrames.
+
+    Jede Spalte bekommt höchstens eine Rolle.
+
+    Returns:
+        DatasetSchema
+    """
+    columns = list(df.columns)
+    taken: set = set()
+    roles: Dict[str, Optional[str]] = {}
+    for role in ROLE_ORDER:
+        col = _match(columns, ROLE_CANDIDATES[role], taken)
+        if col is None and role in ROLE_FALLBACKS:
+            col = _match(columns, ROLE_FALLBACKS[role], taken)
+        if col is not None:
+            taken.add(col)
+        roles[role] = col
+    return DatasetSchema(**roles)
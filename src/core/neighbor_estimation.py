@@ -0,0 +1,284 @@
+"""
+NACHBAR-ABLEITUNG
+=================
+Leitet die Schätzung für einen fast identischen Artikel aus einer früheren
+GPT-Schätzung ab, statt GPT erneut zu fragen:
+
+    "Bolzen Messing 8x35" (GPT)  →  "Bolzen Messing 8x40" (lokal, Masse ×1.14)
+
+Ähnlichkeits-Index über die Samples aus dem Surrogat-Store (src.core.surrogate):
+- Identität: normalisierte Tokens OHNE Maße (Norm, Teilebezeichnung, Material,
+  Festigkeit, Beschichtung, ...) müssen exakt übereinstimmen, ebenso das
+  Losgrößen-Regime
+- Geometrie: Ø und Länge aus parse_dims, beide Artikel brauchen beides
+- Nächster Nachbar = kleinste Massen-Änderung (gleicher Ø bevorzugt)
+
+Skalierung (GPTs Kalibrierung bleibt erhalten, nur Differenzen werden gerechnet):
+- Masse: gleicher Ø → nur der Schaft verlängert/verkürzt sich (Masse + ΔZylinder),
+  sonst proportional zu d²·l
+- Materialkosten und Sekundär-Ops (Vergüten, Beschichten: €/kg) ∝ Masse
+- Taktzeit ∝ Masse^k je Prozess (Zerspanung k=1, Umformen/Stanzen k=0)
+- Fertigungskosten = Nachbar + Δ calc_fab_cost_per_unit + Δ Sekundär-Ops
+
+Der verwendete Nachbar und die Faktoren stehen in _neighbor und in den Annahmen.
+
+Konfiguration (ENV):
+    EVALUERA_NEIGHBOR_MAX_RATIO   Max. Massen-Faktor zum Nachbarn (Default: 1.5)
+    EVALUERA_NEIGHBOR_DISABLED    "1" = nie ableiten
+"""
+
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+from src.core.article_index import tokenize
+from src.core.cbam import calc_fab_cost_per_unit, clamp_dims, mass_cylindrical_approx, parse_dims
+from src.core.surrogate import get_store
+from src.gpt.utils import safe_float, safe_print
+
+DEFAULT_MAX_RATIO = 1.5
+# Ø-Änderung darüber hinaus = anderes Werkzeug/anderer Kopf → kein Nachbar
+_MAX_DIAMETER_RATIO = 1.25
+# Massen-Faktor bis hierher behält die Confidence des Nachbarn, darüber max. "medium"
+_KEEP_CONFIDENCE_RATIO = 1.2
+# Store höchstens so oft nach neuen Samples fragen (Sekunden)
+_REFRESH_S = 10.0
+# Überlappung beim inkrementellen Nachladen (gleichzeitige Schreiber)
+_REFRESH_OVERLAP_S = 5.0
+
+# Taktzeit ∝ Masse^k
+_CYCLE_TIME_EXPONENT = [
+    (re.compile(r"turn|mill|grind|machin|dreh|fräs|schleif|cnc"), 1.0),
+    (re.compile(r"cold_forming|stamp|press|stanz|bieg"), 0.0),
+]
+_DEFAULT_CYCLE_TIME_EXPONENT = 0.5
+
+# Tokens ohne Aussage über das Teil
+_NOISE_TOKENS = {"mm", "x", "l", "d", "m"}
+_DIM_TOKEN = re.compile(r"(?:m|d|l)?(\d+(?:\.\d+)?)")
+
+_CONFIDENCE_RANK = {"low": 0, "medium": 1, "high": 2}
+
+_stats: Counter = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(*keys: str):
+    with _stats_lock:
+        for key in keys:
+            _stats[key] += 1
+
+
+def neighbor_stats() -> Dict[str, int]:
+    """Abgeleitete Schätzungen vs. kein passender Nachbar (inkl. Gründe)."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _max_ratio() -> float:
+    try:
+        return max(float(os.getenv("EVALUERA_NEIGHBOR_MAX_RATIO", DEFAULT_MAX_RATIO)), 1.0)
+    except ValueError:
+        return DEFAULT_MAX_RATIO
+
+
+def _geometry(description: Any) -> Optional[Tuple[float, float]]:
+    d_mm, l_mm = clamp_dims(*parse_dims(description))
+    if d_mm is None or l_mm is None:
+        return None
+    return d_mm, l_mm
+
+
+def identity_tokens(description: Any, d_mm: float, l_mm: float) -> FrozenSet[str]:
+    """Normalisierte Tokens ohne die Maße - zwei Artikel sind "dasselbe Teil", wenn diese gleich sind."""
+    dims = {d_mm, l_mm}
+    out = set()
+    for tok in tokenize(description):
+        m = _DIM_TOKEN.fullmatch(tok)
+        if (m and float(m.group(1)) in dims) or tok in _NOISE_TOKENS:
+            continue
+        out.add(tok)
+    return frozenset(out)
+
+
+def _cycle_time_exponent(process: Any) -> float:
+    text = str(process or "").lower()
+    for pattern, exponent in _CYCLE_TIME_EXPONENT:
+        if pattern.search(text):
+            return exponent
+    return _DEFAULT_CYCLE_TIME_EXPONENT
+
+
+class NeighborIndex:
+    """Frühere GPT-Schätzungen, gruppiert nach (Referenz-Losgröße, Identitäts-Tokens)."""
+
+    def __init__(self):
+        self._groups: Dict[tuple, Dict[str, Tuple[float, float, Dict[str, Any]]]] = {}
+        self._loaded_since = 0.0
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return sum(len(group) for group in self._groups.values())
+
+    def add(self, description: str, lot_size: int, result: Dict[str, Any]):
+        geometry = _geometry(description)
+        if geometry is None or not result.get("mass_kg"):
+            return
+        key = (int(lot_size), identity_tokens(description, *geometry))
+        with self._lock:
+            self._groups.setdefault(key, {})[description] = (geometry[0], geometry[1], result)
+
+    def refresh(self):
+        """Lädt neue Samples aus dem Store nach (andere Worker-Prozesse schreiben mit)."""
+        now = time.time()
+        if now - self._checked_at < _REFRESH_S:
+            return
+        with self._lock:
+            if now - self._checked_at < _REFRESH_S:
+                return
+            store = get_store()
+            if store is None:
+                return
+            since = self._loaded_since
+            self._checked_at = self._loaded_since = now
+            for description, lot_size, result in store.load(since=max(since - _REFRESH_OVERLAP_S, 0.0)):
+                self.add(description, lot_size, result)
+
+    def nearest(self, description: str, lot_size: int, d_mm: float, l_mm: float) -> Optional[tuple]:
+        """
+        Nächster Nachbar mit gleichen Identitäts-Tokens und gleichem Regime.
+
+        Returns:
+            (Bezeichnung, d_mm, l_mm, Ergebnis) oder None
+        """
+        group = self._groups.get((int(lot_size), identity_tokens(description, d_mm, l_mm)))
+        if not group:
+            return None
+        best, best_score = None, math.inf
+        for other, (nd, nl, result) in list(group.items()):
+            if other == description:
+                continue
+            d_ratio = d_mm / nd
+            # Massen-Änderung, Ø-Änderung doppelt gewichtet (Kopf/Werkzeug ändern sich mit)
+            score = abs(math.log(d_ratio * d_ratio * l_mm / nl)) + 2 * abs(math.log(d_ratio))
+            if score < best_score:
+                best, best_score = (other, nd, nl, result), score
+        return best
+
+
+_index = NeighborIndex()
+
+
+def remember_estimate(description: str, lot_size: int, result: Dict[str, Any]):
+    """Neue GPT-Schätzung sofort im Index dieses Prozesses bereitstellen (Store lädt verzögert)."""
+    if not result or result.get("_error") or result.get("_fallback") or result.get("_source"):
+        return
+    _index.add(description, lot_size, result)
+
+
+def _scaled_mass(mass_kg: float, material: str, nd: float, nl: float, d_mm: float, l_mm: float) -> Tuple[float, str]:
+    if d_mm == nd:
+        delta = mass_cylindrical_approx(d_mm, l_mm, material) - mass_cylindrical_approx(nd, nl, material)
+        return mass_kg + delta, f"Schaft {l_mm - nl:+g} mm"
+    return mass_kg * (d_mm * d_mm * l_mm) / (nd * nd * nl), "proportional zu d²·l"
+
+
+def neighbor_estimate(description: Any, lot_size: int) -> Optional[Dict[str, Any]]:
+    """
+    Leitet die Schätzung aus dem nächsten fast identischen, bereits geschätzten Artikel ab.
+
+    Args:
+        description: Artikel-Bezeichnung (möglichst kanonisiert)
+        lot_size: Referenz-Losgröße des Regimes (Ergebnis bezieht sich darauf)
+
+    Returns:
+        Ergebnis im Format von gpt_complete_cost_estimate (mit _source="neighbor")
+        oder None, wenn kein passender Nachbar existiert
+    """
+    if os.getenv("EVALUERA_NEIGHBOR_DISABLED") == "1":
+        return None
+    geometry = _geometry(description)
+    if geometry is None:
+        _count("reason_no_geometry")
+        return None
+    d_mm, l_mm = geometry
+    lot_size = max(int(lot_size or 1), 1)
+
+    _index.refresh()
+    found = _index.nearest(str(description), lot_size, d_mm, l_mm)
+    if found is None:
+        _count("reason_no_neighbor")
+        return None
+    other, nd, nl, base = found
+    if max(d_mm / nd, nd / d_mm) > _MAX_DIAMETER_RATIO:
+        _count("reason_diameter_out_of_range")
+        return None
+
+    material = base.get("material_guess") or "stahl"
+    base_mass = safe_float(base.get("mass_kg"), 0.0)
+    mass_kg, mass_rule = _scaled_mass(base_mass, material, nd, nl, d_mm, l_mm)
+    mass_ratio = mass_kg / base_mass if base_mass > 0 else 0.0
+    if mass_ratio <= 0 or max(mass_ratio, 1 / mass_ratio) > _max_ratio():
+        _count("reason_mass_out_of_range")
+        return None
+
+    cycle_ratio = mass_ratio ** _cycle_time_exponent(base.get("process"))
+    params = {k: base.get(k) for k in ("setup_time_min", "cycle_time_s", "machine_eur_h", "labor_eur_h", "overhead_pct")}
+    secondary_ops = [dict(op, cost_eur=safe_float(op.get("cost_eur"), 0.0) * mass_ratio)
+                     if isinstance(op, dict) else op for op in base.get("secondary_ops") or []]
+    base_ops = sum(safe_float(op.get("cost_eur"), 0.0) for op in base.get("secondary_ops") or [] if isinstance(op, dict))
+    new_ops = sum(safe_float(op.get("cost_eur"), 0.0) for op in secondary_ops if isinstance(op, dict))
+
+    fab_cost = safe_float(base.get("fab_cost_eur"), 0.0) + (new_ops - base_ops)
+    if params["cycle_time_s"] is not None and params["setup_time_min"] is not None:
+        scaled = dict(params, cycle_time_s=safe_float(params["cycle_time_s"], 0.0) * cycle_ratio)
+        fab_cost += calc_fab_cost_per_unit(scaled, lot_size) - calc_fab_cost_per_unit(params, lot_size)
+        params = scaled
+    fab_cost = max(fab_cost, 0.0)
+    material_cost = safe_float(base.get("material_cost_eur"), 0.0) * mass_ratio
+
+    confidence = base.get("confidence") or "medium"
+    if max(mass_ratio, 1 / mass_ratio) > _KEEP_CONFIDENCE_RATIO and _CONFIDENCE_RANK.get(confidence, 1) > 1:
+        confidence = "medium"
+
+    neighbor = {
+        "description": other,
+        "d_mm": nd,
+        "l_mm": nl,
+        "mass_ratio": round(mass_ratio, 4),
+        "cycle_time_ratio": round(cycle_ratio, 4),
+        "mass_rule": mass_rule,
+    }
+    _count("served")
+    safe_print(f"OK Nachbar-Ableitung {description} ← {other}: Masse ×{mass_ratio:.2f}, Takt ×{cycle_ratio:.2f}")
+    return {
+        "material_guess": material,
+        "d_mm": d_mm,
+        "l_mm": l_mm,
+        "mass_kg": mass_kg,
+        "material_price_eur_kg": base.get("material_price_eur_kg"),
+        "material_cost_eur": material_cost,
+        "process": base.get("process"),
+        **params,
+        "secondary_ops": secondary_ops,
+        "fab_cost_eur": fab_cost,
+        "total_cost_eur": material_cost + fab_cost,
+        "confidence": confidence,
+        "assumptions": [
+            f"Abgeleitet aus GPT-Schätzung für \"{other}\" (ohne GPT-Call)",
+            f"Masse ×{mass_ratio:.2f} ({mass_rule}), Materialkosten und Sekundär-Ops ∝ Masse",
+            f"Taktzeit ×{cycle_ratio:.2f} (Prozess {base.get('process') or '?'}), Rüsten/Stundensätze unverändert",
+        ],
+        "raw": None,
+        "lot_size": lot_size,
+        "_reference_lot_size": lot_size,
+        "_tokens_used": 0,
+        "_api_called": False,
+        "_source": "neighbor",
+        "_neighbor": neighbor,
+    }
@@ -38,35 +38,84 @@ def _norm_num(x):
     except:
         return pd.to_numeric(s, errors="coerce")
 
-def _find_col(df, keywords):
-    low = {str(c).strip().lower(): c for c in df.columns}
-    for kw in keywords:
-        for k,orig in low.items():
-            if kw in k:
-                return orig
-    return None
+_CURRENCY_RE = r'(€|EUR|eur|\$|USD|usd)'
 
-def derive_unit_price(df):
-    qcol = _find_col(df, QTY_CANDS)
-    w = df[qcol].map(_norm_num).fillna(1) if qcol is not None else pd.Series(1, index=df.index, dtype="float64")
-    pcol = _find_col(df, PRICE_UNIT_CANDS)
-    tcol = _find_col(df, PRICE_TOTAL_CANDS)
+def norm_num_series(ser):
+    """
+    Vektorisierte Variante von _norm_num für eine ganze Spalte (identische Ergebnisse).
+    Exporte wiederholen Preis-/Mengenstrings stark - geparst wird nur jeder eindeutige Wert.
+    """
+    if pd.api.types.is_bool_dtype(ser):
+        return pd.Series(np.nan, index=ser.index, dtype="float64")
+    if pd.api.types.is_numeric_dtype(ser):
+        return pd.Series(ser.to_numpy(dtype="float64", na_value=np.nan), index=ser.index)
+    out = pd.Series(np.nan, index=ser.index, dtype="float64")
+    valid = ser.notna().to_numpy()
+    if not valid.any():
+        return out
+    codes, uniques = pd.factorize(ser[valid].astype(str))
+    parsed = _parse_num_strings(pd.Series(uniques, dtype=object))
+    out.iloc[np.flatnonzero(valid)] = parsed[codes]
+    return out
+
+def _parse_num_strings(s):
+    """Parst eindeutige Strings wie _norm_num; liefert ein float64-Array gleicher Länge."""
+    s = s.str.strip()
+    empty = (s == '').to_numpy()
+    s = s.str.replace(_CURRENCY_RE, '', regex=True).str.replace(' ', '', regex=False)
+
+    # DE (1.234,56) vs US (1,234.56) wie in _norm_num
+    has_c = s.str.contains(',', regex=False)
+    has_d = s.str.contains('.', regex=False)
+    both = has_c & has_d
+    de = both & (s.str.rfind(',') > s.str.rfind('.'))
+    us = both & ~de
+    comma_only = has_c & ~has_d
+    multi = comma_only & (s.str.count(',') > 1)
+    single = comma_only & ~multi
+    s[de] = s[de].str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    s[us | multi] = s[us | multi].str.replace(',', '', regex=False)
+    s[single] = s[single].str.replace(',', '.', regex=False)
+
+    vals = pd.to_numeric(s, errors="coerce").astype("float64")
+    # Restfälle, die float() anders parst als to_numeric (z.B. "1_000"), einzeln nachziehen
+    rest = vals.isna() & ~empty
+    if rest.any():
+        vals[rest] = [_parse_float(v) for v in s[rest]]
+    vals[empty] = np.nan
+    return vals.to_numpy(dtype="float64")
+
+def _parse_float(s):
+    try:
+        return float(s)
+    except:
+        return pd.to_numeric(s, errors="coerce")
+
+def derive_unit_price(df, schema=None):
+    if schema is None:
+        from src.core.dataset_schema import infer_schema
+        schema = infer_schema(df)
+    qcol = schema.quantity if schema.quantity in df.columns else None
+    qty = norm_num_series(df[qcol]) if qcol is not None else None
+    w = qty.fillna(1) if qty is not None else pd.Series(1, index=df.index, dtype="float64")
+    pcol = schema.unit_price if schema.unit_price in df.columns else None
+    tcol = schema.total if schema.total in df.columns else None
     unit = None
     src = None
     if pcol is not None:
-        unit = df[pcol].map(_norm_num)
+        unit = norm_num_series(df[pcol])
         src = ("unit", str(pcol))
     elif tcol is not None and qcol is not None:
-        tot = df[tcol].map(_norm_num)
-        q = df[qcol].map(_norm_num).replace(0, np.nan)
+        tot = norm_num_series(df[tcol])
+        q = qty.replace(0, np.nan)
         unit = tot / q
         src = ("total/qty", f"{tcol}/{qcol}")
     if unit is None or not getattr(unit, "notna")().any():
         for c in df.columns:
-            ser = df[c].map(_norm_num)
+            ser = qty if c == qcol else norm_num_series(df[c])
             if ser.notna().sum()>0:
-                if qcol is not None and ser.max() > 10 and df[qcol].map(_norm_num).max() > 1:
-                    q = df[qcol].map(_norm_num).replace(0, np.nan)
+                if qcol is not None and ser.max() > 10 and qty.max() > 1:
+                    q = qty.replace(0, np.nan)
                     unit = ser / q
                     src = ("heur_total/qty", str(c)+"/"+str(qcol))
                 else:
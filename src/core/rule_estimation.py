@@ -0,0 +1,263 @@
+"""
+REGELBASIERTE KOSTENSCHÄTZUNG
+=============================
+Deterministische Schätzung für DIN/ISO-Normteile - ohne API-Call.
+
+Für Sechskant- und Zylinderschrauben, Muttern und Scheiben sind Geometrie und
+Fertigungsweg durch die Norm praktisch festgelegt. Aus Maßtabelle (Kopf/
+Schlüsselweite je Gewinde) und Prozess-Tabelle (Rüst-/Taktzeit, Stundensätze)
+ergeben sich Masse, Material- und Fertigungskosten in Mikrosekunden:
+
+    Masse       mass_cylindrical_approx() + Sechskant-Prismen, Dichte über density_g_cm3()
+    Fertigung   calc_fab_cost_per_unit() mit den Prozess-Parametern der Tabelle
+    Zusatz-Ops  Vergüten (ab 8.8) und Beschichtung als €/kg
+
+Die Annahmen entsprechen dem GPT-Prompt (Low-Cost-Fertiger, Vollautomatisierung,
+Spot-Materialpreise). Das Ergebnis hat dasselbe Format wie
+gpt_complete_cost_estimate(); GPT wird nur gefragt, wenn die Regel-Confidence
+unter der Schwelle liegt (unbekannte Norm/Größe, Länge außerhalb des
+Kaltumform-Bereichs, nicht erkannte Bezeichnung).
+
+Konfiguration (ENV):
+    EVALUERA_RULES_MIN_CONFIDENCE   Ab welcher Confidence lokal geantwortet wird:
+                                    high (Default) | medium
+    EVALUERA_RULES_DISABLED         "1" = immer GPT
+"""
+
+import math
+import os
+import threading
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple
+
+from src.core.article_key import canonical_article_key, parse_article
+from src.core.cbam import calc_fab_cost_per_unit, density_g_cm3, mass_cylindrical_approx
+from src.gpt.utils import safe_print
+
+_CONFIDENCE_RANK = {"low": 0, "medium": 1, "high": 2}
+
+# ==================== MASSTABELLEN ====================
+# Gewinde-Ø → (Schlüsselweite s, Kopfhöhe k) bzw. (Kopf-Ø dk, Kopfhöhe k, Innensechskant s)
+# bzw. (Schlüsselweite s, Mutterhöhe m) bzw. (Innen-Ø d1, Außen-Ø d2, Dicke h)
+
+_HEX_HEAD_DIN = {3: (5.5, 2), 4: (7, 2.8), 5: (8, 3.5), 6: (10, 4), 8: (13, 5.3), 10: (17, 6.4),
+                 12: (19, 7.5), 14: (22, 8.8), 16: (24, 10), 20: (30, 12.5), 24: (36, 15), 30: (46, 18.7)}
+_HEX_HEAD_ISO = {**_HEX_HEAD_DIN, 10: (16, 6.4), 12: (18, 7.5), 14: (21, 8.8)}
+
+_SOCKET_HEAD = {3: (5.5, 3, 2.5), 4: (7, 4, 3), 5: (8.5, 5, 4), 6: (10, 6, 5), 8: (13, 8, 6),
+                10: (16, 10, 8), 12: (18, 12, 10), 14: (21, 14, 12), 16: (24, 16, 14),
+                20: (30, 20, 17), 24: (36, 24, 19), 30: (45, 30, 22)}
+
+_HEX_NUT_DIN = {3: (5.5, 2.4), 4: (7, 3.2), 5: (8, 4), 6: (10, 5), 8: (13, 6.5), 10: (17, 8),
+                12: (19, 10), 14: (22, 11), 16: (24, 13), 20: (30, 16), 24: (36, 19), 30: (46, 24)}
+_HEX_NUT_ISO = {3: (5.5, 2.4), 4: (7, 3.2), 5: (8, 4.7), 6: (10, 5.2), 8: (13, 6.8), 10: (16, 8.4),
+                12: (18, 10.8), 14: (21, 12.8), 16: (24, 14.8), 20: (30, 18), 24: (36, 21.5), 30: (46, 25.6)}
+
+_WASHER = {3: (3.2, 7, 0.5), 4: (4.3, 9, 0.8), 5: (5.3, 10, 1), 6: (6.4, 12, 1.6), 8: (8.4, 16, 1.6),
+           10: (10.5, 20, 2), 12: (13, 24, 2.5), 14: (15, 28, 2.5), 16: (17, 30, 3), 20: (21, 37, 3),
+           24: (25, 44, 4), 30: (31, 56, 4)}
+
+# Norm → (Teileart, Maßtabelle)
+STANDARDS: Dict[str, Tuple[str, Dict[int, tuple]]] = {
+    "DIN 933": ("hex_bolt", _HEX_HEAD_DIN),
+    "DIN 931": ("hex_bolt", _HEX_HEAD_DIN),
+    "ISO 4017": ("hex_bolt", _HEX_HEAD_ISO),
+    "ISO 4014": ("hex_bolt", _HEX_HEAD_ISO),
+    "DIN 912": ("socket_bolt", _SOCKET_HEAD),
+    "ISO 4762": ("socket_bolt", _SOCKET_HEAD),
+    "DIN 934": ("hex_nut", _HEX_NUT_DIN),
+    "ISO 4032": ("hex_nut", _HEX_NUT_ISO),
+    "DIN 125": ("washer", _WASHER),
+    "ISO 7089": ("washer", _WASHER),
+}
+
+# ==================== PROZESS-TABELLE ====================
+# Low-Cost-Fertiger, vollautomatisiert (wie im GPT-Prompt angenommen)
+PROCESSES: Dict[str, Dict[str, float]] = {
+    # Mehrstufenpresse + Gewinderollen
+    "cold_forming": {"setup_time_min": 120, "machine_eur_h": 45.0, "labor_eur_h": 12.0, "overhead_pct": 0.15},
+    # Mutternpresse + Gewindeschneidautomat
+    "cold_forming_nut": {"setup_time_min": 120, "machine_eur_h": 45.0, "labor_eur_h": 12.0, "overhead_pct": 0.15},
+    # Folgeverbundwerkzeug
+    "stamping": {"setup_time_min": 45, "machine_eur_h": 35.0, "labor_eur_h": 12.0, "overhead_pct": 0.15},
+}
+
+# Taktzeit [s] nach Gewinde-Ø (obere Grenze inkl.) je Prozess
+_CYCLE_TIME_S = {
+    "cold_forming": [(6, 0.3), (10, 0.5), (16, 1.0), (24, 2.0)],
+    "cold_forming_nut": [(6, 0.25), (10, 0.4), (16, 0.8), (24, 1.6)],
+    "stamping": [(10, 0.1), (30, 0.2)],
+}
+
+# Teileart → Prozess
+_PROCESS_FOR = {"hex_bolt": "cold_forming", "socket_bolt": "cold_forming",
+                "hex_nut": "cold_forming_nut", "washer": "stamping"}
+
+# Kaltumformbereich für Schrauben: Länge zwischen MIN × d und MAX mm
+_BOLT_MIN_LENGTH_FACTOR = 1.5
+_BOLT_MAX_LENGTH_MM = 200.0
+_COLD_FORMING_MAX_THREAD_MM = 24.0
+
+# Spot-Materialpreise [€/kg] (Kaltstauchdraht)
+_MATERIAL_PRICE_EUR_KG = {"stahl": 0.85, "stahl_vergütet": 1.0, "a2": 2.8, "a4": 3.6}
+_SCRAP_FACTOR = 1.02
+
+# Zusatz-Operationen [€/kg Fertigteil]
+_HEAT_TREATMENT_EUR_KG = {"8.8": 0.25, "9.8": 0.25, "10.9": 0.35, "12.9": 0.35}
+_COATING_EUR_KG = {"zn": 0.6, "tzn": 0.5, "flzn": 1.2, "bruniert": 0.3, "ni": 2.0, "blank": 0.0}
+
+_stats: Counter = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(*keys: str):
+    with _stats_lock:
+        for key in keys:
+            _stats[key] += 1
+
+
+def rule_estimate_stats() -> Dict[str, int]:
+    """Lokal beantwortete Schätzungen vs. an GPT weitergereichte (inkl. Gründe)."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _min_confidence() -> str:
+    value = (os.getenv("EVALUERA_RULES_MIN_CONFIDENCE") or "high").strip().lower()
+    return value if value in _CONFIDENCE_RANK else "high"
+
+
+def _hex_prism_kg(s_mm: float, h_mm: float, material: str) -> float:
+    """Masse eines Sechskant-Prismas (Schlüsselweite s, Höhe h)."""
+    area_mm2 = math.sqrt(3) / 2 * s_mm ** 2
+    return area_mm2 * h_mm / 1000.0 * density_g_cm3(material) / 1000.0
+
+
+def _mass_kg(kind: str, d: float, length: Optional[float], dims: tuple, material: str) -> float:
+    if kind == "hex_bolt":
+        s, k = dims
+        # Gerollter Schaft ≈ Flanken-Ø (~0.9 d)
+        return _hex_prism_kg(s, k, material) + mass_cylindrical_approx(0.9 * d, length, material)
+    if kind == "socket_bolt":
+        dk, k, socket = dims
+        head = mass_cylindrical_approx(dk, k, material) - _hex_prism_kg(socket, 0.5 * k, material)
+        return head + mass_cylindrical_approx(0.9 * d, length, material)
+    if kind == "hex_nut":
+        s, m = dims
+        return _hex_prism_kg(s, m, material) - mass_cylindrical_approx(0.85 * d, m, material)
+    d1, d2, h = dims
+    return mass_cylindrical_approx(d2, h, material) - mass_cylindrical_approx(d1, h, material)
+
+
+def _cycle_time_s(process: str, d: float) -> Optional[float]:
+    for upper, seconds in _CYCLE_TIME_S[process]:
+        if d <= upper:
+            return seconds
+    return None
+
+
+def _assess(kind: str, d: float, length: Optional[float]) -> Tuple[str, Optional[str]]:
+    """(Confidence, Grund für Abwertung)."""
+    if kind in ("hex_bolt", "socket_bolt"):
+        if length is None:
+            return "low", "no_length"
+        if d > _COLD_FORMING_MAX_THREAD_MM:
+            return "medium", "hot_forging_size"
+        if length < _BOLT_MIN_LENGTH_FACTOR * d or length > _BOLT_MAX_LENGTH_MM:
+            return "medium", "length_out_of_range"
+        return "high", None
+    if length is not None:
+        # Länge bei Mutter/Scheibe ergibt keinen Sinn → Bezeichnung falsch verstanden
+        return "low", "unexpected_length"
+    return "high", None
+
+
+def rule_based_estimate(description: Any, lot_size: int = 1000,
+                        min_confidence: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Lokale Kostenschätzung für Normteile.
+
+    Args:
+        description: Artikel-Bezeichnung (z.B. "DIN 933 M12x35 8.8 verzinkt")
+        lot_size: Losgröße
+        min_confidence: Mindest-Confidence (Default aus ENV, sonst "high")
+
+    Returns:
+        Ergebnis im Format von gpt_complete_cost_estimate (mit _source="rules")
+        oder None, wenn GPT gefragt werden soll
+    """
+    if os.getenv("EVALUERA_RULES_DISABLED") == "1":
+        return None
+
+    parts = parse_article(description)
+    if parts is None:
+        _count("gpt_fallback", "reason_unparsed")
+        return None
+    spec = STANDARDS.get(parts["standard"])
+    d = parts["thread_mm"]
+    if spec is None or int(d) != d or int(d) not in spec[1]:
+        _count("gpt_fallback", "reason_unknown_standard_or_size")
+        return None
+
+    kind, table = spec
+    length = parts["length_mm"]
+    confidence, reason = _assess(kind, d, length)
+    threshold = min_confidence or _min_confidence()
+    if _CONFIDENCE_RANK[confidence] < _CONFIDENCE_RANK[threshold]:
+        _count("gpt_fallback", f"reason_{reason}")
+        return None
+
+    strength = parts["strength"] or ""
+    coating = parts["coating"]
+    stainless = strength[:2] if strength.startswith("a") else None
+    material = stainless or "stahl"
+    price_key = stainless or ("stahl_vergütet" if strength in _HEAT_TREATMENT_EUR_KG else "stahl")
+
+    mass_kg = _mass_kg(kind, d, length, table[int(d)], material)
+    material_price = _MATERIAL_PRICE_EUR_KG[price_key]
+    material_cost = mass_kg * _SCRAP_FACTOR * material_price
+
+    process = _PROCESS_FOR[kind]
+    params = dict(PROCESSES[process], cycle_time_s=_cycle_time_s(process, d))
+    secondary_ops = []
+    if strength in _HEAT_TREATMENT_EUR_KG:
+        secondary_ops.append({"op": f"Vergüten ({strength})", "cost_eur": mass_kg * _HEAT_TREATMENT_EUR_KG[strength]})
+    if coating and _COATING_EUR_KG.get(coating):
+        secondary_ops.append({"op": f"Beschichtung ({coating})", "cost_eur": mass_kg * _COATING_EUR_KG[coating]})
+
+    lot_size = max(int(lot_size or 1), 1)
+    fab_cost = calc_fab_cost_per_unit(params, lot_size) + sum(op["cost_eur"] for op in secondary_ops)
+
+    assumptions = [
+        f"Regelbasierte Schätzung nach {parts['standard']} (ohne GPT)",
+        f"Material: {material}" + (f", Festigkeitsklasse {strength}" if strength else ""),
+        f"Prozess: {process}, Takt {params['cycle_time_s']} s, Rüsten {params['setup_time_min']} min",
+        f"Materialpreis {material_price:.2f} €/kg, Verschnitt {(_SCRAP_FACTOR - 1):.0%}",
+    ]
+    if reason:
+        assumptions.append(f"Eingeschränkte Confidence: {reason}")
+
+    _count("served_local", f"served_{confidence}")
+    safe_print(f"OK Regel-Schätzung {canonical_article_key(description)} @ {lot_size:,} Stk: "
+               f"{material_cost + fab_cost:.4f} €")
+    return {
+        "material_guess": material,
+        "d_mm": d,
+        "l_mm": length,
+        "mass_kg": mass_kg,
+        "material_price_eur_kg": material_price,
+        "material_cost_eur": material_cost,
+        "process": process.replace("_nut", ""),
+        **params,
+        "secondary_ops": secondary_ops,
+        "fab_cost_eur": fab_cost,
+        "total_cost_eur": material_cost + fab_cost,
+        "confidence": confidence,
+        "assumptions": assumptions,
+        "raw": None,
+        "lot_size": lot_size,
+        "_reference_lot_size": lot_size,
+        "_tokens_used": 0,
+        "_api_called": False,
+        "_source": "rules",
+    }
@@ -0,0 +1,99 @@
+"""
+LIEFERANTEN-STATISTIK
+=====================
+Aggregations-Engine für die aktuelle Artikelauswahl (Schritte 3-5).
+
+Berechnet Stückpreise und alle Kennzahlen je Lieferant in einem Durchlauf
+(ein groupby statt eines Filters pro Lieferant):
+    mean, min, max, count (Preise), entries (Zeilen), weighted_mean (mengengewichtet),
+    cv (Variationskoeffizient), last_price (jüngster Preis)
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.core.dataset_schema import DatasetSchema
+from src.core.price_utils import derive_unit_price, norm_num_series
+from src.utils.excel_helpers import get_price_series_per_unit
+
+STAT_COLUMNS = ["mean", "min", "max", "count", "entries", "weighted_mean", "cv", "last_price"]
+
+
+@dataclass
+class SelectionStats:
+    """Kennzahlen einer Artikelauswahl."""
+    unit_price: Optional[pd.Series]   # Stückpreis je Zeile (Index wie idf)
+    per_supplier: pd.DataFrame        # Index = Lieferant, Spalten = STAT_COLUMNS
+    supplier_col: Optional[str]
+    qty_col: Optional[str]
+
+
+def _empty_stats() -> pd.DataFrame:
+    return pd.DataFrame(columns=STAT_COLUMNS)
+
+
+def _fallback_supplier_prices(idf: pd.DataFrame, schema: DatasetSchema, supplier_col: str) -> pd.DataFrame:
+    """Ohne Preis-Spalte: derive_unit_price-Heuristik einmal je Lieferantengruppe."""
+    rows = {}
+    for sup, group in idf.groupby(supplier_col, observed=True, sort=False):
+        try:
+            avg, mn, mx, _, _ = derive_unit_price(group, schema=schema)
+        except Exception:
+            avg, mn, mx = None, None, None
+        rows[sup] = {"mean": avg, "min": mn, "max": mx, "count": 0, "entries": len(group),
+                     "weighted_mean": avg, "cv": np.nan, "last_price": np.nan}
+    return pd.DataFrame.from_dict(rows, orient="index", columns=STAT_COLUMNS) if rows else _empty_stats()
+
+
+def compute_selection_stats(idf: pd.DataFrame, schema: DatasetSchema,
+                            qty_col: Optional[str] = None) -> SelectionStats:
+    """
+    Berechnet Stückpreise und Lieferanten-Kennzahlen für eine Auswahl.
+
+    Args:
+        idf: Gefilterte Bestellzeilen (aktuelle Artikelauswahl)
+        schema: Spaltenrollen des Datensatzes
+        qty_col: Mengen-Spalte (Default: schema.quantity)
+
+    Returns:
+        SelectionStats
+    """
+    qty_col = qty_col or (schema.quantity if schema.quantity in idf.columns else None)
+    supplier_col = schema.supplier if schema.supplier in idf.columns else None
+    unit_price = get_price_series_per_unit(idf, qty_col, schema=schema)
+
+    if supplier_col is None:
+        return SelectionStats(unit_price, _empty_stats(), None, qty_col)
+    if unit_price is None:
+        return SelectionStats(None, _fallback_supplier_prices(idf, schema, supplier_col), supplier_col, qty_col)
+
+    price = pd.to_numeric(unit_price, errors="coerce").astype("float64")
+    qty = norm_num_series(idf[qty_col]) if qty_col else pd.Series(np.nan, index=idf.index)
+    if schema.date in idf.columns and pd.api.types.is_datetime64_any_dtype(idf[schema.date]):
+        order = idf[schema.date]
+    else:
+        order = pd.Series(np.arange(len(idf)), index=idf.index)
+
+    has_w = price.notna() & qty.notna() & (qty > 0)
+    frame = pd.DataFrame({
+        "supplier": idf[supplier_col],
+        "price": price,
+        "wp": (price * qty).where(has_w),
+        "w": qty.where(has_w),
+        "order": order,
+    })
+    g = frame.groupby("supplier", observed=True, sort=False)
+
+    stats = g["price"].agg(["mean", "min", "max", "count", "std"])
+    stats["entries"] = g.size()
+    w_sum = g["w"].sum(min_count=1)
+    stats["weighted_mean"] = (g["wp"].sum(min_count=1) / w_sum).fillna(stats["mean"])
+    stats["cv"] = stats["std"] / stats["mean"]
+    last = frame[frame["price"].notna()].sort_values("order", kind="stable").groupby(
+        "supplier", observed=True, sort=False)["price"].last()
+    stats["last_price"] = last.reindex(stats.index)
+
+    return SelectionStats(price, stats[STAT_COLUMNS], supplier_col, qty_col)
@@ -0,0 +1,470 @@
+"""
+SURROGAT-KOSTENMODELL
+=====================
+Lernt aus bisherigen GPT-Kostenschätzungen und beantwortet ähnliche Artikel
+in Millisekunden - mit kalibrierter Unsicherheit.
+
+Ablauf:
+1. record_estimate(): jede neue GPT-Schätzung (ohne Zeichnungskontext) landet
+   mit Bezeichnung und Referenz-Losgröße im lokalen Sample-Store (SQLite)
+2. train_surrogate() / scripts/train_surrogate.py: offline trainieren
+   - Merkmale nur aus Bezeichnung + Losgröße (Norm, Gewinde, Länge, Material-
+     und Prozess-Stichworte, Festigkeit, Beschichtung, log Losgröße)
+   - RandomForest (Multi-Output, log-Raum) für Material-/Fertigungskosten,
+     Masse und Prozess-Parameter
+   - Kalibrierung auf zurückgehaltenen Samples:
+       * normierte Conformal-Prediction → 90%-Fehlerschranke je Vorhersage
+       * Nächster-Nachbar-Abstand → Anwendungsbereich (unbekannte Artikel = unsicher)
+3. surrogate_predict(): liefert nur, wenn der Artikel im Anwendungsbereich liegt
+   und die Fehlerschranke unter EVALUERA_SURROGATE_MAX_REL_ERROR bleibt -
+   sonst None, und GPT wird gefragt
+
+Konfiguration (ENV):
+    EVALUERA_SURROGATE_PATH            Sample-Store (Default: .cache/surrogate_samples.sqlite3)
+    EVALUERA_SURROGATE_MODEL_PATH      Trainiertes Modell (Default: .cache/surrogate_model.joblib)
+    EVALUERA_SURROGATE_MAX_REL_ERROR   Max. 90%-Fehlerschranke der Gesamtkosten (Default: 0.3)
+    EVALUERA_SURROGATE_MIN_SAMPLES     Mindestanzahl Trainings-Samples (Default: 50)
+    EVALUERA_SURROGATE_DISABLED        "1" = nie Surrogat, immer GPT
+"""
+
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import joblib
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.feature_extraction import DictVectorizer
+    from sklearn.neighbors import NearestNeighbors
+except Exception:
+    joblib = None
+    RandomForestRegressor = None
+    DictVectorizer = None
+    NearestNeighbors = None
+
+from src.core.article_index import tokenize
+from src.core.article_key import parse_article
+from src.core.cbam import clamp_dims, parse_dims
+from src.gpt.utils import safe_print
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DEFAULT_STORE_PATH = os.path.join(BASE_DIR, ".cache", "surrogate_samples.sqlite3")
+DEFAULT_MODEL_PATH = os.path.join(BASE_DIR, ".cache", "surrogate_model.joblib")
+DEFAULT_MAX_REL_ERROR = 0.3
+DEFAULT_MIN_SAMPLES = 50
+
+# Vorhergesagte Felder (alle im log-Raum gelernt)
+TARGETS = ["material_cost_eur", "fab_cost_eur", "mass_kg", "setup_time_min",
+           "cycle_time_s", "machine_eur_h", "labor_eur_h", "overhead_pct"]
+# Zusätzlich gespeichert (Nachbar-Ableitung in src.core.neighbor_estimation)
+STORED_FIELDS = ["material_guess", "process", "confidence", "d_mm", "l_mm",
+                 "material_price_eur_kg", "secondary_ops"]
+_LOG_EPS = 1e-6
+# Untergrenze der Streuung (log-Raum), damit einstimmige Bäume nicht "sicher" werden
+_SIGMA_FLOOR = 0.05
+_COVERAGE = 0.9
+_HIGH_CONFIDENCE_REL_ERROR = 0.15
+
+_MATERIAL_WORDS = {
+    "stahl": "stahl", "steel": "stahl", "edelstahl": "edelstahl", "inox": "edelstahl", "a2": "edelstahl",
+    "a4": "edelstahl", "alu": "aluminium", "aluminium": "aluminium", "aluminum": "aluminium",
+    "messing": "messing", "brass": "messing", "kupfer": "kupfer", "copper": "kupfer",
+    "zink": "zink", "kunststoff": "kunststoff", "pa6": "kunststoff", "pom": "kunststoff",
+}
+_PROCESS_WORDS = [
+    (re.compile(r"dreh"), "turning"), (re.compile(r"fräs"), "milling"),
+    (re.compile(r"stanz|biege|blech"), "stamping"), (re.compile(r"guss|gieß"), "casting"),
+    (re.compile(r"schmied"), "forging"), (re.compile(r"spritzguss"), "injection_molding"),
+]
+_STANDARD_RE = re.compile(r"\b(din|iso|en)\s*-?\s*(\d{2,5})")
+
+
+# ==================== MERKMALE ====================
+
+def article_features(description: Any, lot_size: int) -> Dict[str, Any]:
+    """Merkmale, die ohne GPT aus Bezeichnung und Losgröße ableitbar sind."""
+    text = str(description or "").lower()
+    parts = parse_article(description)
+    d_mm, l_mm = clamp_dims(*parse_dims(text))
+    feats: Dict[str, Any] = {"log_lot": math.log10(max(int(lot_size or 1), 1))}
+
+    if parts is not None:
+        d_mm = parts["thread_mm"]
+        l_mm = parts["length_mm"] or l_mm
+        feats[f"std={parts['standard']}"] = 1
+        if parts["strength"]:
+            feats[f"strength={parts['strength']}"] = 1
+        if parts["coating"]:
+            feats[f"coating={parts['coating']}"] = 1
+    else:
+        m = _STANDARD_RE.search(text)
+        if m:
+            feats[f"std={m.group(1).upper()} {m.group(2)}"] = 1
+
+    if d_mm:
+        feats["log_d"] = math.log10(d_mm)
+    if l_mm:
+        feats["log_l"] = math.log10(l_mm)
+    if d_mm and l_mm:
+        feats["log_vol"] = math.log10(d_mm * d_mm * l_mm)
+
+    tokens = tokenize(text)
+    for tok in tokens:
+        if tok in _MATERIAL_WORDS:
+            feats[f"mat={_MATERIAL_WORDS[tok]}"] = 1
+        elif len(tok) >= 4 and not any(ch.isdigit() for ch in tok):
+            feats[f"tok={tok}"] = 1
+    for pattern, process in _PROCESS_WORDS:
+        if pattern.search(text):
+            feats[f"proc={process}"] = 1
+    return feats
+
+
+# ==================== SAMPLE-STORE ====================
+
+class EstimateStore:
+    """Bisherige GPT-Schätzungen, ein Eintrag je (Bezeichnung, Losgröße)."""
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn().execute(
+            """
+            CREATE TABLE IF NOT EXISTS samples (
+                description TEXT NOT NULL,
+                lot_size INTEGER NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (description, lot_size)
+            )
+            """
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def add(self, description: str, lot_size: int, result: Dict[str, Any]):
+        row = {k: result.get(k) for k in TARGETS + STORED_FIELDS}
+        self._conn().execute(
+            "INSERT OR REPLACE INTO samples (description, lot_size, result, created_at) VALUES (?, ?, ?, ?)",
+            (description, int(lot_size), json.dumps(row, ensure_ascii=False), time.time()),
+        )
+
+    def load(self, since: float = 0.0) -> List[Tuple[str, int, Dict[str, Any]]]:
+        """Alle Samples (oder nur die ab Zeitpunkt since), älteste zuerst."""
+        rows = self._conn().execute(
+            "SELECT description, lot_size, result FROM samples WHERE created_at >= ? ORDER BY created_at", (since,)
+        ).fetchall()
+        return [(desc, lot, json.loads(result)) for desc, lot, result in rows]
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM samples").fetchone()[0]
+
+
+_store: Optional[EstimateStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> Optional[EstimateStore]:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                try:
+                    _store = EstimateStore(os.getenv("EVALUERA_SURROGATE_PATH", DEFAULT_STORE_PATH))
+                except Exception as e:
+                    safe_print(f"WARN Surrogat-Store nicht verfügbar: {e!r}")
+                    return None
+    return _store
+
+
+def record_estimate(description: str, lot_size: int, result: Dict[str, Any]):
+    """Neue GPT-Schätzung als Trainings-Sample ablegen (Fehler/Fallbacks werden ignoriert)."""
+    if not result or result.get("_error") or result.get("_fallback") or result.get("_source"):
+        return
+    if result.get("material_cost_eur") is None or result.get("fab_cost_eur") is None:
+        return
+    store = get_store()
+    if store is None:
+        return
+    try:
+        store.add(description, lot_size, result)
+    except sqlite3.Error as e:
+        safe_print(f"WARN Surrogat-Sample nicht gespeichert: {e!r}")
+
+
+# ==================== MODELL ====================
+
+def _log(values: np.ndarray) -> np.ndarray:
+    return np.log(np.maximum(values, 0.0) + _LOG_EPS)
+
+
+def _exp(values: np.ndarray) -> np.ndarray:
+    return np.maximum(np.exp(values) - _LOG_EPS, 0.0)
+
+
+class SurrogateModel:
+    """RandomForest im log-Raum + Conformal-Kalibrierung + Anwendungsbereich."""
+
+    def __init__(self, n_estimators: int = 100, random_state: int = 42):
+        self.vectorizer = DictVectorizer(sparse=False)
+        self.forest = RandomForestRegressor(n_estimators=n_estimators, min_samples_leaf=2,
+                                            random_state=random_state, n_jobs=-1)
+        self.neighbors = NearestNeighbors(n_neighbors=1)
+        self.labels: List[Dict[str, Any]] = []
+        self.score_quantile = float("inf")
+        self.distance_threshold = 0.0
+        self.metrics: Dict[str, Any] = {}
+        self.trained_at = 0.0
+
+    # ---------- Training ----------
+
+    @staticmethod
+    def _matrix(samples: List[Tuple[str, int, Dict[str, Any]]]) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        feats = [article_features(desc, lot) for desc, lot, _ in samples]
+        y = np.array([[float(r.get(t)) if r.get(t) is not None else np.nan for t in TARGETS]
+                      for _, _, r in samples])
+        # Fehlende Prozess-Parameter mit dem Median auffüllen
+        medians = np.nanmedian(y, axis=0)
+        idx = np.where(np.isnan(y))
+        y[idx] = np.take(np.nan_to_num(medians), idx[1])
+        return feats, _log(y)
+
+    def _tree_predictions(self, X: np.ndarray) -> np.ndarray:
+        """Vorhersagen je Baum (Bäume × Samples × Targets); Mittel = Forest-Vorhersage."""
+        return np.stack([tree.predict(X) for tree in self.forest.estimators_])
+
+    @staticmethod
+    def _log_totals(per_tree: np.ndarray) -> np.ndarray:
+        """log(Material + Fertigung) je Baum - Basis der Unsicherheit (Bäume × Samples)."""
+        return np.log(_exp(per_tree[:, :, 0]) + _exp(per_tree[:, :, 1]) + _LOG_EPS)
+
+    def fit(self, samples: List[Tuple[str, int, Dict[str, Any]]], calibration_share: float = 0.25,
+            seed: int = 42) -> Dict[str, Any]:
+        feats, y_log = self._matrix(samples)
+        order = np.random.default_rng(seed).permutation(len(samples))
+        n_cal = max(int(len(samples) * calibration_share), 1)
+        cal, train = order[:n_cal], order[n_cal:]
+
+        X = self.vectorizer.fit_transform([feats[i] for i in train])
+        self.forest.fit(X, y_log[train])
+        # Einzel-Vorhersagen: Thread-Start kostet mehr als er bringt
+        self.forest.n_jobs = 1
+        self.neighbors.fit(X)
+        self.labels = [{"material_guess": samples[i][2].get("material_guess"),
+                        "process": samples[i][2].get("process")} for i in train]
+
+        X_cal = self.vectorizer.transform([feats[i] for i in cal])
+        per_tree = self._tree_predictions(X_cal)
+        totals = self._log_totals(per_tree)
+        center, sigma = totals.mean(axis=0), totals.std(axis=0) + _SIGMA_FLOOR
+        y_total = np.log(_exp(y_log[cal, 0]) + _exp(y_log[cal, 1]) + _LOG_EPS)
+        scores = np.abs(y_total - center) / sigma
+        level = min(1.0, _COVERAGE * (1 + 1 / len(cal)))
+        self.score_quantile = float(np.quantile(scores, level))
+        distances = self.neighbors.kneighbors(X_cal)[0][:, 0]
+        self.distance_threshold = float(np.quantile(distances, 0.95))
+        self.trained_at = time.time()
+
+        # Genauigkeitsbericht auf den zurückgehaltenen Samples
+        rel_bound = np.exp(self.score_quantile * sigma) - 1
+        servable = (rel_bound <= max_rel_error()) & (distances <= self.distance_threshold)
+        pred = _exp(per_tree.mean(axis=0))
+        truth = _exp(y_log[cal])
+        ape = {}
+        for col, name in ((0, "material"), (1, "fab")):
+            ape[name] = np.abs(pred[:, col] - truth[:, col]) / np.maximum(truth[:, col], 1e-4)
+        total_pred, total_true = pred[:, 0] + pred[:, 1], truth[:, 0] + truth[:, 1]
+        ape["total"] = np.abs(total_pred - total_true) / np.maximum(total_true, 1e-4)
+        inside = np.abs(y_total - center) <= self.score_quantile * sigma
+        self.metrics = {
+            "samples": len(samples),
+            "train": len(train),
+            "calibration": len(cal),
+            **{f"mape_{k}": round(float(v.mean()), 4) for k, v in ape.items()},
+            **{f"median_ape_{k}": round(float(np.median(v)), 4) for k, v in ape.items()},
+            "interval_coverage": round(float(inside.mean()), 4),
+            "servable_share": round(float(servable.mean()), 4),
+            "mape_total_servable": round(float(ape["total"][servable].mean()), 4) if servable.any() else None,
+            "max_rel_error": max_rel_error(),
+        }
+        return self.metrics
+
+    # ---------- Vorhersage ----------
+
+    def predict(self, description: Any, lot_size: int) -> Dict[str, Any]:
+        X = self.vectorizer.transform([article_features(description, lot_size)])
+        per_tree = self._tree_predictions(X)
+        values = _exp(per_tree.mean(axis=0)[0])
+        totals = self._log_totals(per_tree)[:, 0]
+        sigma = float(totals.std()) + _SIGMA_FLOOR
+        rel_error = math.exp(self.score_quantile * sigma) - 1
+        distance, index = self.neighbors.kneighbors(X)
+        return {
+            **dict(zip(TARGETS, (float(v) for v in values))),
+            **self.labels[int(index[0][0])],
+            "rel_error": rel_error,
+            "in_domain": float(distance[0][0]) <= self.distance_threshold,
+        }
+
+
+def max_rel_error() -> float:
+    try:
+        return float(os.getenv("EVALUERA_SURROGATE_MAX_REL_ERROR", DEFAULT_MAX_REL_ERROR))
+    except ValueError:
+        return DEFAULT_MAX_REL_ERROR
+
+
+def min_samples() -> int:
+    try:
+        return int(os.getenv("EVALUERA_SURROGATE_MIN_SAMPLES", DEFAULT_MIN_SAMPLES))
+    except ValueError:
+        return DEFAULT_MIN_SAMPLES
+
+
+def _model_path() -> str:
+    return os.getenv("EVALUERA_SURROGATE_MODEL_PATH", DEFAULT_MODEL_PATH)
+
+
+def train_surrogate(save: bool = True) -> Dict[str, Any]:
+    """
+    Trainiert das Modell auf allen Samples im Store (offline, z.B. nachts).
+
+    Returns:
+        Genauigkeitsbericht oder {"_error": True, "error": ...}
+    """
+    if RandomForestRegressor is None:
+        return {"_error": True, "error": "scikit-learn nicht installiert"}
+    store = get_store()
+    samples = store.load() if store is not None else []
+    if len(samples) < min_samples():
+        return {"_error": True, "error": f"Zu wenige Samples: {len(samples)} < {min_samples()}"}
+    model = SurrogateModel()
+    metrics = model.fit(samples)
+    if save:
+        path = _model_path()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        joblib.dump(model, tmp)
+        os.replace(tmp, path)
+    return metrics
+
+
+# ==================== SERVING ====================
+
+_model: Optional[SurrogateModel] = None
+_model_mtime = 0.0
+_model_lock = threading.Lock()
+_stats: Counter = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(key: str):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def load_model() -> Optional[SurrogateModel]:
+    """Geladenes Modell; wird nach offline-Retraining (neue Datei) neu eingelesen."""
+    global _model, _model_mtime
+    if joblib is None:
+        return None
+    path = _model_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if _model is None or mtime != _model_mtime:
+        with _model_lock:
+            if _model is None or mtime != _model_mtime:
+                try:
+                    _model, _model_mtime = joblib.load(path), mtime
+                except Exception as e:
+                    safe_print(f"WARN Surrogat-Modell nicht ladbar: {e!r}")
+                    return None
+    return _model
+
+
+def surrogate_predict(description: Any, lot_size: int,
+                      accept_uncertain: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Surrogat-Schätzung im Format von gpt_complete_cost_estimate (_source="surrogate").
+
+    Args:
+        accept_uncertain: Auch unsichere Vorhersagen liefern (confidence "low") -
+                          Notlösung, wenn GPT nicht mehr rechtzeitig antworten kann
+
+    Returns:
+        Ergebnis oder None, wenn kein Modell vorliegt oder es unsicher ist
+    """
+    if os.getenv("EVALUERA_SURROGATE_DISABLED") == "1":
+        return None
+    model = load_model()
+    if model is None or model.metrics.get("samples", 0) < min_samples():
+        return None
+    lot_size = max(int(lot_size or 1), 1)
+    pred = model.predict(description, lot_size)
+    uncertain = not pred["in_domain"] or pred["rel_error"] > max_rel_error()
+    if uncertain and not accept_uncertain:
+        _count("uncertain_interval" if pred["in_domain"] else "uncertain_out_of_domain")
+        return None
+
+    _count("served_uncertain" if uncertain else "served")
+    total = pred["material_cost_eur"] + pred["fab_cost_eur"]
+    if uncertain:
+        confidence = "low"
+    else:
+        confidence = "high" if pred["rel_error"] <= _HIGH_CONFIDENCE_REL_ERROR else "medium"
+    return {
+        "material_guess": pred.get("material_guess") or "stahl",
+        "d_mm": None,
+        "l_mm": None,
+        "mass_kg": pred["mass_kg"],
+        "material_price_eur_kg": pred["material_cost_eur"] / pred["mass_kg"] if pred["mass_kg"] else None,
+        "material_cost_eur": pred["material_cost_eur"],
+        "process": pred.get("process") or "cold_forming",
+        **{k: pred[k] for k in ("setup_time_min", "cycle_time_s", "machine_eur_h", "labor_eur_h", "overhead_pct")},
+        "secondary_ops": [],
+        "fab_cost_eur": pred["fab_cost_eur"],
+        "total_cost_eur": total,
+        "confidence": confidence,
+        "assumptions": [f"Surrogat-Modell aus {model.metrics['samples']} GPT-Schätzungen, "
+                        f"90%-Fehlerschranke ±{pred['rel_error']:.0%}"]
+                       + (["Unsichere Vorhersage (Notlösung ohne GPT)"] if uncertain else []),
+        "raw": None,
+        "lot_size": lot_size,
+        "_reference_lot_size": lot_size,
+        "_tokens_used": 0,
+        "_api_called": False,
+        "_source": "surrogate",
+        "_rel_error": pred["rel_error"],
+    }
+
+
+def surrogate_stats() -> Dict[str, Any]:
+    """Bedient/unsicher seit Prozessstart, Samples im Store, Bericht des geladenen Modells."""
+    with _stats_lock:
+        stats: Dict[str, Any] = dict(_stats)
+    store = get_store()
+    try:
+        stats["samples_stored"] = store.count() if store is not None else 0
+    except sqlite3.Error:
+        stats["samples_stored"] = None
+    model = load_model()
+    stats["model"] = dict(model.metrics, trained_at=model.trained_at) if model is not None else None
+    return stats
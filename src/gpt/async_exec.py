@@ -0,0 +1,308 @@
+"""
+ASYNC GPT-AUSFÜHRUNG
+====================
+asyncio-Kern für GPT-Calls mit begrenzter Parallelität je Modell,
+Deadlines und Abbruch.
+
+- safe_gpt_request_async(): Async-Pendant zu safe_gpt_request (AsyncOpenAI,
+  gleicher Ergebnis-Vertrag: {"_error": False, "response": ...} bzw. Fehler-Dict)
+- call_blocking(): bestehende synchrone (gecachte) GPT-Funktionen im Thread,
+  aber unter demselben Modell-Semaphor
+- gather_gpt(): mehrere Calls überlappen, Fehler/Timeouts pro Call isoliert
+- run_parallel(): Einstieg aus dem synchronen Streamlit-Skript; die Coroutines
+  laufen auf einer prozessweiten Hintergrund-Loop, damit Semaphoren und
+  AsyncOpenAI-Verbindungen von allen Sessions geteilt werden
+
+Deadlines sind absolute time.monotonic()-Zeitpunkte (siehe deadline_after()).
+Ohne explizite Deadline gilt die aktive Schritt-Deadline (src.gpt.deadline);
+eine explizite kann sie nur verkürzen.
+
+Konfiguration (ENV):
+    EVALUERA_GPT_MODEL_CONCURRENCY     Parallele Calls je Modell (Default: 4)
+    EVALUERA_GPT_CONCURRENCY_<MODELL>  Override je Modell, z.B. EVALUERA_GPT_CONCURRENCY_GPT_4O_MINI=8
+"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+import traceback
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except Exception:
+    add_script_run_ctx = None
+    get_script_run_ctx = None
+
+from src.gpt.client import get_async_openai_client
+from src.gpt.deadline import DeadlineExceeded, current_deadline, deadline_at, earliest
+from src.gpt.rate_limiter import current_session
+from src.gpt.utils import (
+    retry_delay,
+    safe_print,
+    sanitize_env_variables,
+    sanitize_input,
+    sanitize_options,
+    sanitize_payload_recursive,
+)
+
+DEFAULT_MODEL_CONCURRENCY = 4
+# run_sync wartet so lange über die Schritt-Deadline hinaus auf die Fehler-Dicts der Calls
+_DEADLINE_GRACE_S = 1.0
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_loop_lock = threading.Lock()
+# Nur aus der Hintergrund-Loop benutzt → kein Lock nötig
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+# Streamlit-Kontext des aufrufenden Skript-Threads; Tasks erben ihn, call_blocking
+# hängt ihn an den Worker-Thread (st.cache_data, st.session_state)
+_script_ctx: contextvars.ContextVar = contextvars.ContextVar("evaluera_script_ctx", default=None)
+
+
+def deadline_after(seconds: Optional[float]) -> Optional[float]:
+    """Absolute Deadline (time.monotonic()) in `seconds` Sekunden; None = keine."""
+    return None if seconds is None else time.monotonic() + seconds
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    """Verbleibende Sekunden bis zur Deadline (None = unbegrenzt, nie negativ)."""
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+def model_concurrency(model: str) -> int:
+    """Erlaubte parallele Calls für ein Modell (Override vor globalem Default)."""
+    suffix = re.sub(r"[^A-Z0-9]+", "_", (model or "").upper()).strip("_")
+    for name in (f"EVALUERA_GPT_CONCURRENCY_{suffix}", "EVALUERA_GPT_MODEL_CONCURRENCY"):
+        raw = os.getenv(name)
+        if raw:
+            try:
+                return max(1, int(raw))
+            except ValueError:
+                safe_print(f"WARN Ungültiger Wert für {name}: {raw!r}")
+    return DEFAULT_MODEL_CONCURRENCY
+
+
+def _model_semaphore(model: str) -> asyncio.Semaphore:
+    sem = _semaphores.get(model)
+    if sem is None:
+        sem = _semaphores[model] = asyncio.Semaphore(model_concurrency(model))
+    return sem
+
+
+def _error(stage: str, error: str, trace: Optional[str] = None) -> Dict[str, Any]:
+    out = {"_error": True, "error": error, "_stage": stage}
+    if trace:
+        out["trace"] = trace
+    return out
+
+
+async def _bounded(model: str, deadline: Optional[float], coro_fn: Callable[[], Awaitable[Any]]) -> Any:
+    """Wartet auf den Modell-Semaphor und führt coro_fn aus - beides innerhalb der Deadline."""
+    async def _run():
+        async with _model_semaphore(model):
+            return await coro_fn()
+    if deadline is None:
+        return await _run()
+    return await asyncio.wait_for(_run(), timeout=remaining(deadline))
+
+
+async def safe_gpt_request_async(
+    model: str,
+    messages: Any,
+    client_factory: Optional[Callable[[], Any]] = None,
+    retries: int = 0,
+    deadline: Optional[float] = None,
+    **kwargs,
+) -> Dict[str, Any]:
+    """
+    Async-Variante von safe_gpt_request.
+
+    Args:
+        model: Modellname (bestimmt auch den Semaphor)
+        messages: Chat-Messages
+        client_factory: Liefert einen AsyncOpenAI-Client (Default: geteilter Client)
+        retries: Zusätzliche Versuche bei API-Fehlern
+        deadline: Absolute Deadline (time.monotonic()), gilt inkl. Wartezeit auf den Semaphor
+                  (Default: aktive Schritt-Deadline)
+        **kwargs: Weitere Parameter für chat.completions.create
+
+    Returns:
+        {"_error": False, "response": ...} oder Fehler-Dict mit _stage
+        ("serialize", "client", "deadline", "api_call").
+        Abbruch (CancelledError) wird nicht abgefangen.
+    """
+    sanitize_env_variables(["OPENAI_API_KEY", "OPENAI_MODEL", "OPENAI_BASE_URL", "OPENAI_ORG"])
+
+    deadline = earliest(deadline, current_deadline())
+    clean_model = sanitize_input(model)
+    clean_messages = sanitize_payload_recursive(messages)
+    clean_kwargs = sanitize_options(kwargs)
+
+    try:
+        _ = json.dumps({"model": clean_model, "messages": clean_messages}, ensure_ascii=False)[:0]
+    except Exception as ser_err:
+        return _error("serialize", f"Serialization failed: {ser_err}", traceback.format_exc())
+
+    try:
+        client = (client_factory or get_async_openai_client)()
+    except Exception as e:
+        return _error("client", str(e), traceback.format_exc())
+
+    last_err = None
+    for attempt in range(retries + 1):
+        if deadline is not None and remaining(deadline) <= 0:
+            return _error("deadline", "Deadline überschritten")
+        try:
+            res = await _bounded(clean_model, deadline, lambda: client.chat.completions.create(
+                model=clean_model,
+                messages=clean_messages,
+                **clean_kwargs,
+            ))
+            return {"_error": False, "response": res}
+        except asyncio.TimeoutError:
+            return _error("deadline", "Deadline überschritten")
+        except Exception as e:
+            last_err = e
+            if attempt >= retries:
+                return _error("api_call", str(e), traceback.format_exc())
+            delay = retry_delay(e, attempt)
+            if deadline is not None and delay >= remaining(deadline):
+                return _error("deadline", f"Deadline vor erneutem Versuch erreicht: {e}")
+            await asyncio.sleep(delay)
+    return _error("api_call", str(last_err) if last_err else "unknown_error")
+
+
+async def call_blocking(fn: Callable[..., Any], *args, model: str = "default",
+                        deadline: Optional[float] = None, **kwargs) -> Any:
+    """
+    Führt eine synchrone Funktion (z.B. cached_gpt_*) im Thread-Pool der Loop aus,
+    begrenzt durch den Semaphor von `model`.
+
+    Bei Deadline-Überschreitung wird nicht mehr gewartet (asyncio.TimeoutError);
+    der Thread selbst läuft zu Ende, sein Ergebnis landet weiterhin im Cache.
+    Die Deadline gilt im Thread weiter (src.gpt.deadline), verschachtelte Calls
+    bekommen dort nur die Restzeit.
+    """
+    ctx = _script_ctx.get()
+    deadline = earliest(deadline, current_deadline())
+
+    def _run():
+        if ctx is not None and add_script_run_ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        with deadline_at(deadline):
+            return fn(*args, **kwargs)
+
+    loop = asyncio.get_running_loop()
+    return await _bounded(model, deadline, lambda: loop.run_in_executor(None, _run))
+
+
+async def gather_gpt(calls: Sequence[Awaitable[Any]], deadline: Optional[float] = None) -> List[Any]:
+    """
+    Führt Calls überlappend aus und liefert die Ergebnisse in Eingabe-Reihenfolge.
+
+    Exceptions werden pro Call zu Fehler-Dicts ({"_error": True, "_stage": ...});
+    nach Ablauf der Deadline werden offene Calls abgebrochen (_stage "deadline").
+    """
+    tasks = [asyncio.ensure_future(c) for c in calls]
+    if not tasks:
+        return []
+    try:
+        await asyncio.wait(tasks, timeout=remaining(deadline))
+    except asyncio.CancelledError:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    results: List[Any] = []
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+            results.append(_error("deadline", "Deadline überschritten"))
+        elif task.cancelled():
+            results.append(_error("cancelled", "Abgebrochen"))
+        elif task.exception() is not None:
+            exc = task.exception()
+            if isinstance(exc, asyncio.TimeoutError):
+                results.append(_error("deadline", "Deadline überschritten"))
+            else:
+                trace = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+                results.append(_error("exception", str(exc), trace))
+        else:
+            results.append(task.result())
+    return results
+
+
+# ==================== SYNC-BRÜCKE ====================
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None or not _loop_thread.is_alive():
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="gpt-async-loop", daemon=True)
+            _loop_thread.start()
+        return _loop
+
+
+def run_sync(coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """
+    Führt eine Coroutine auf der Hintergrund-Loop aus und wartet auf das Ergebnis.
+    Die Coroutine erbt die aktive Schritt-Deadline; gewartet wird höchstens bis
+    kurz nach deren Ablauf (die Calls liefern bis dahin selbst _stage "deadline").
+
+    Raises:
+        TimeoutError: nach `timeout` Sekunden (die Coroutine wird abgebrochen)
+        DeadlineExceeded: wenn die Schritt-Deadline das Warten beendet hat
+        RuntimeError: bei Aufruf aus der Hintergrund-Loop selbst
+    """
+    loop = _background_loop()
+    if threading.current_thread() is _loop_thread:
+        raise RuntimeError("run_sync() aus der GPT-Loop aufgerufen - dort direkt awaiten")
+    step_deadline = current_deadline()
+    wait = timeout
+    if step_deadline is not None:
+        grace_left = max(remaining(step_deadline), 0.0) + _DEADLINE_GRACE_S
+        wait = grace_left if timeout is None else min(timeout, grace_left)
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result(timeout=wait)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        if wait != timeout:
+            raise DeadlineExceeded("GPT-Calls nach Ablauf der Deadline abgebrochen")
+        raise TimeoutError(f"GPT-Calls nach {timeout}s abgebrochen")
+
+
+def run_parallel(calls: Dict[str, Callable[[], Awaitable[Any]]],
+                 timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Einstieg aus dem synchronen Streamlit-Skript: startet alle Calls überlappend.
+
+    Args:
+        calls: Name -> Factory, die die Coroutine erzeugt, z.B.
+               {"supplier": functools.partial(call_blocking, cached_gpt_analyze_supplier, ...)}
+        timeout: Gemeinsame Deadline in Sekunden für alle Calls (höchstens bis zur Schritt-Deadline)
+
+    Returns:
+        Name -> Ergebnis bzw. Fehler-Dict (siehe gather_gpt)
+    """
+    names = list(calls)
+    ctx = get_script_run_ctx() if get_script_run_ctx is not None else None
+    deadline = earliest(deadline_after(timeout), current_deadline())
+
+    async def _main():
+        _script_ctx.set(ctx)
+        if ctx is not None:
+            # Faire Rate-Limit-Queue: Requests aus der Loop der aufrufenden Session zuordnen
+            current_session.set(ctx.session_id)
+        results = await gather_gpt([calls[name]() for name in names], deadline=deadline)
+        return dict(zip(names, results))
+
+    return run_sync(_main())
+
@@ -2,7 +2,10 @@
 GPT CACHING LAYER
 =================
 Zentrales Caching für alle GPT-Calls zur massiven Token-Reduktion.
-Nutzt Streamlit's @st.cache_data für Session-übergreifendes Caching.
+Zwei Ebenen:
+1. @st.cache_data  - In-Prozess, Session-übergreifend (schnellster Pfad)
+2. @disk_cached    - Persistenter SQLite-Cache, überlebt Deploys/Neustarts
+                     und wird von allen Worker-Prozessen geteilt
 """
 
 import hashlib
@@ -10,6 +13,23 @@ import json
 from typing import Any, Dict, List, Optional, Callable
 import streamlit as st
 from src.gpt.utils import sanitize_input, sanitize_payload_recursive
+from src.gpt.cache_metrics import cache_metrics, instrumented
+from src.gpt.disk_cache import disk_cached, disk_lookup, disk_store, get_disk_cache
+from src.gpt.cascade import cascade_cache_key
+from src.gpt.deadline import DeadlineExceeded, check_deadline, record_fallback
+from src.gpt.prompts import prompt_version
+
+# Disk-TTLs pro Funktion (Sekunden) - deutlich länger als der In-Prozess-Cache
+DAY = 24 * 3600
+DISK_TTL = {
+    "material": 7 * DAY,
+    "cost_estimate": 7 * DAY,
+    "process": 7 * DAY,
+    "supplier_analysis": 30 * DAY,
+    "article_search": 1 * DAY,
+    "technical_drawing": 30 * DAY,
+    "rate_supplier": 7 * DAY,
+}
 
 
 def _make_hashable(obj: Any) -> str:
@@ -32,7 +52,10 @@ def _cache_key(*args, **kwargs) -> str:
     return hashlib.sha256(combined.encode()).hexdigest()[:16]
 
 
+@instrumented("material")
 @st.cache_data(ttl=3600, show_spinner=False)
+@disk_cached("material", ttl=DISK_TTL["material"], model="gpt-4o",
+             prompt_version=prompt_version("material_estimate"))
 def cached_gpt_estimate_material(description: str) -> Dict[str, Any]:
     """
     Gecachte Material-Schätzung.
@@ -44,27 +67,211 @@ def cached_gpt_estimate_material(description: str) -> Dict[str, Any]:
     return gpt_estimate_material(description)
 
 
-@st.cache_data(ttl=3600, show_spinner=False)
 def cached_gpt_complete_cost_estimate(description: str, lot_size: int,
                                       supplier_competencies_json: Optional[str] = None,
-                                      technical_drawing_context_json: Optional[str] = None) -> Dict[str, Any]:
+                                      technical_drawing_context_json: Optional[str] = None,
+                                      refresh: bool = False) -> Dict[str, Any]:
     """
     ALL-IN-ONE Kostenschätzung mit Caching.
     Kombiniert Material + Fertigungskosten in EINEM GPT-Call!
 
-    TTL: 1 Stunde
-    50% schneller & günstiger als 2 separate Calls!
+    Der Cache-Key enthält nur das Losgrößen-Regime, nicht die exakte Losgröße:
+    GPT wird einmal pro Artikel und Regime gefragt, jede andere Losgröße im
+    selben Regime wird lokal über calc_fab_cost_per_unit umgerechnet.
+
+    Normteil-Bezeichnungen werden vorher kanonisiert ("DIN933 M12x35",
+    "M12x35 DIN933" → "DIN 933 M12x35"), damit Schreibvarianten einen
+    Eintrag teilen. Nicht sicher erkennbare Bezeichnungen bleiben unverändert.
+
+    Ohne Zeichnungskontext (Extras sind dort Kostentreiber) wird GPT nur
+    gefragt, wenn keine lokale Schätzung greift - siehe _local_cost_estimate.
+    Läuft die Schritt-Deadline (src.gpt.deadline) vorher ab, kommt die beste
+    lokale Schätzung - auch eine unsichere (_deadline_fallback_estimate).
 
     Args:
         description: Artikel-Bezeichnung
         lot_size: Losgröße
         supplier_competencies_json: JSON-String (für Hashability)
         technical_drawing_context_json: JSON-String (für Hashability)
+        refresh: True = lokale Schätzungen überspringen, GPT-Schätzung anfordern
+
+    Returns:
+        Komplette Kostenschätzung (Material + Fertigung) für lot_size
+    """
+    from src.core.article_key import canonical_article_key
+    from src.core.cost_estimation import regime_reference_lot_size, rescale_estimate_to_lot_size
+
+    description = canonical_article_key(description) or description
+    if not technical_drawing_context_json and not refresh:
+        local = _local_cost_estimate(description, lot_size, supplier_competencies_json)
+        if local is not None:
+            return local
+
+    try:
+        base = _cached_cost_estimate_for_regime(
+            description,
+            regime_reference_lot_size(lot_size),
+            supplier_competencies_json,
+            technical_drawing_context_json,
+        )
+    except DeadlineExceeded as e:
+        base = _deadline_fallback_estimate(description, regime_reference_lot_size(lot_size), e)
+    return rescale_estimate_to_lot_size(base, lot_size)
+
+
+def _local_cost_estimate(description: str, lot_size: int,
+                         supplier_competencies_json: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Kostenschätzung ohne GPT-Call, in dieser Reihenfolge:
+    1. Regelbasiert für Normteile (src.core.rule_estimation)
+    2. Bereits gecachte GPT-Schätzung → None, der Cache-Pfad liefert sie
+    3. Abgeleitet vom nächsten fast identischen Artikel (src.core.neighbor_estimation)
+    4. Surrogat-Modell, wenn es sich sicher ist (src.core.surrogate)
+
+    Returns:
+        Schätzung für lot_size oder None (GPT bzw. Cache fragen)
+    """
+    from src.core.cost_estimation import regime_reference_lot_size, rescale_estimate_to_lot_size
+    from src.core.neighbor_estimation import neighbor_estimate
+    from src.core.rule_estimation import rule_based_estimate
+    from src.core.surrogate import surrogate_predict
+
+    local = rule_based_estimate(description, lot_size)
+    if local is not None:
+        return local
+    reference = regime_reference_lot_size(lot_size)
+    if disk_lookup("cost_estimate", description, reference, supplier_competencies_json, None) is not None:
+        return None
+    for estimator in (neighbor_estimate, surrogate_predict):
+        predicted = estimator(description, reference)
+        if predicted is not None:
+            return rescale_estimate_to_lot_size(predicted, lot_size)
+    return None
+
+
+def _deadline_fallback_estimate(description: str, reference_lot_size: int,
+                                error: DeadlineExceeded) -> Dict[str, Any]:
+    """
+    Ersatz, wenn GPT nicht mehr rechtzeitig antworten kann: Nachbar-Ableitung,
+    sonst Surrogat auch außerhalb seiner Fehlerschranke (confidence "low").
+
+    Returns:
+        Schätzung für die Referenz-Losgröße oder Fehler-Dict (_stage "deadline")
+    """
+    from src.core.neighbor_estimation import neighbor_estimate
+    from src.core.surrogate import surrogate_predict
+
+    estimate = (neighbor_estimate(description, reference_lot_size)
+                or surrogate_predict(description, reference_lot_size, accept_uncertain=True))
+    if estimate is None:
+        return {"_error": True, "error": f"{error} - keine lokale Schätzung verfügbar", "_stage": "deadline"}
+    record_fallback("cost_estimate")
+    return {**estimate, "_deadline_fallback": True}
+
+
+def _record_gpt_estimate(description: str, reference_lot_size: int, result: Dict[str, Any]):
+    """Frische GPT-Schätzung (ohne Zeichnungskontext) für Surrogat und Nachbar-Index merken."""
+    from src.core.neighbor_estimation import remember_estimate
+    from src.core.surrogate import record_estimate
+    record_estimate(description, reference_lot_size, result)
+    remember_estimate(description, reference_lot_size, result)
+
+
+def cached_gpt_complete_cost_estimate_batch(items: List[Dict[str, Any]],
+                                            supplier_competencies_json: Optional[str] = None,
+                                            technical_drawing_context_json: Optional[str] = None,
+                                            on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Kostenschätzung für viele Artikel (Portfolio, Zeichnungspositionen).
+
+    Pro Artikel wie cached_gpt_complete_cost_estimate (Kanonisierung, lokale
+    Schätzungen, Disk-Cache je Losgrößen-Regime) - nur die verbleibenden Artikel
+    gehen gebündelt an GPT, und deren Ergebnisse landen unter denselben Keys
+    im Disk-Cache wie Einzel-Calls.
+
+    Args:
+        items: [{"id", "description", "lot_size"}, ...]
+        supplier_competencies_json: JSON-String (gemeinsam für alle Artikel)
+        technical_drawing_context_json: JSON-String (gemeinsam für alle Artikel)
+        on_progress: Callback(erledigte Artikel, Gesamt) für die GPT-Batches
 
     Returns:
-        Komplette Kostenschätzung (Material + Fertigung)
+        id -> Kostenschätzung für die jeweilige Losgröße
+    """
+    from src.core.article_key import canonical_article_key
+    from src.core.cost_estimation import (
+        gpt_complete_cost_estimate_batch,
+        regime_reference_lot_size,
+        rescale_estimate_to_lot_size,
+    )
+
+    results: Dict[str, Dict[str, Any]] = {}
+    # (Beschreibung, Referenz-Losgröße) -> Items, die sich eine Schätzung teilen
+    pending: Dict[tuple, List[Dict[str, Any]]] = {}
+    for item in items:
+        item_id, lot_size = str(item["id"]), int(item["lot_size"])
+        description = canonical_article_key(item["description"]) or item["description"]
+        if not technical_drawing_context_json:
+            local = _local_cost_estimate(description, lot_size, supplier_competencies_json)
+            if local is not None:
+                results[item_id] = local
+                continue
+        reference = regime_reference_lot_size(lot_size)
+        cached = disk_lookup("cost_estimate", description, reference,
+                             supplier_competencies_json, technical_drawing_context_json)
+        if cached is not None:
+            results[item_id] = rescale_estimate_to_lot_size(cached, lot_size)
+            continue
+        pending.setdefault((description, reference), []).append(item)
+
+    if not pending:
+        return results
+
+    supplier_competencies = None
+    if supplier_competencies_json:
+        supplier_competencies = sanitize_payload_recursive(json.loads(sanitize_input(supplier_competencies_json)))
+    technical_drawing_context = None
+    if technical_drawing_context_json:
+        technical_drawing_context = sanitize_payload_recursive(json.loads(sanitize_input(technical_drawing_context_json)))
+
+    keys = list(pending)
+    batch_items = [{"id": str(idx), "description": sanitize_input(desc), "lot_size": ref}
+                   for idx, (desc, ref) in enumerate(keys)]
+
+    def _single(batch_item):
+        desc, ref = keys[int(batch_item["id"])]
+        try:
+            return _cached_cost_estimate_for_regime(desc, ref, supplier_competencies_json,
+                                                    technical_drawing_context_json)
+        except DeadlineExceeded as e:
+            return _deadline_fallback_estimate(desc, ref, e)
+
+    estimates = gpt_complete_cost_estimate_batch(batch_items, supplier_competencies, technical_drawing_context,
+                                                 fallback=_single, on_progress=on_progress)
+    for idx, (desc, ref) in enumerate(keys):
+        base = estimates.get(str(idx))
+        if base and base.get("_batch_size"):
+            disk_store("cost_estimate", base, desc, ref, supplier_competencies_json, technical_drawing_context_json)
+            if not technical_drawing_context_json:
+                _record_gpt_estimate(desc, ref, base)
+        for item in pending[(desc, ref)]:
+            results[str(item["id"])] = rescale_estimate_to_lot_size(base, int(item["lot_size"]))
+    return results
+
+
+@instrumented("cost_estimate")
+@st.cache_data(ttl=3600, show_spinner=False)
+@disk_cached("cost_estimate", ttl=DISK_TTL["cost_estimate"], model=cascade_cache_key("cost_estimate"),
+             prompt_version=prompt_version("cost_estimate"))
+def _cached_cost_estimate_for_regime(description: str, reference_lot_size: int,
+                                     supplier_competencies_json: Optional[str] = None,
+                                     technical_drawing_context_json: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Gecachter GPT-Call für die Referenz-Losgröße eines Regimes.
+    TTL: 1 Stunde (In-Prozess), 7 Tage (Disk)
     """
     from src.core.cost_estimation import gpt_complete_cost_estimate
+    lot_size = reference_lot_size
 
     # Deserialize supplier_competencies
     supplier_competencies = None
@@ -83,8 +290,18 @@ def cached_gpt_complete_cost_estimate(description: str, lot_size: int,
     payload_drawing = sanitize_payload_recursive(technical_drawing_context) if technical_drawing_context else None
 
     try:
-        return gpt_complete_cost_estimate(desc_clean, lot_size, payload_competencies, payload_drawing)
+        result = gpt_complete_cost_estimate(desc_clean, lot_size, payload_competencies, payload_drawing)
+        if result.get("_error"):
+            # Abgelaufene Deadline nicht als Fehler cachen - der Aufrufer schätzt lokal
+            check_deadline("Kostenschätzung", grace=0.5)
+        if payload_drawing is None:
+            # Nur echte GPT-Calls landen hier (Cache-Treffer laufen nicht durch)
+            _record_gpt_estimate(desc_clean, lot_size, result)
+        return result
+    except DeadlineExceeded:
+        raise
     except Exception as e:
+        check_deadline("Kostenschätzung", grace=0.5)
         import traceback
         # Rückgabe eines Debug-Dicts statt harter Exception, damit UI weiterläuft
         return {
@@ -96,7 +313,9 @@ def cached_gpt_complete_cost_estimate(description: str, lot_size: int,
         }
 
 
+@instrumented("process")
 @st.cache_data(ttl=3600, show_spinner=False)
+@disk_cached("process", ttl=DISK_TTL["process"], model="gpt-4o-mini")
 def cached_choose_process(description: str, material: str, d_mm: Optional[float],
                           l_mm: Optional[float], lot_size: int) -> Dict[str, Any]:
     """
@@ -107,23 +326,50 @@ def cached_choose_process(description: str, material: str, d_mm: Optional[float]
     return choose_process_with_gpt(description, material, d_mm, l_mm, lot_size)
 
 
-@st.cache_data(ttl=3600, show_spinner=False)
 def cached_gpt_analyze_supplier(supplier_name: str, article_history_json: str,
                                 country: Optional[str]) -> Dict[str, Any]:
     """
     Gecachte Lieferanten-Analyse.
     article_history als JSON-String für Hashability.
     TTL: 1 Stunde - Lieferanten-Kompetenzen ändern sich selten!
+
+    Läuft die Schritt-Deadline ab, kommt eine lokale Analyse der Artikelhistorie
+    (heuristic_supplier_competencies) - ungecacht, der nächste Aufruf fragt GPT erneut.
     """
+    try:
+        return _cached_supplier_analysis(supplier_name, article_history_json, country)
+    except DeadlineExceeded:
+        from src.core.cbam import heuristic_supplier_competencies
+        record_fallback("supplier_analysis")
+        result = heuristic_supplier_competencies(supplier_name, _load_article_history(article_history_json), country)
+        return {**result, "_deadline_fallback": True}
+
+
+def _load_article_history(article_history_json: Optional[str]) -> Optional[List[str]]:
+    if not article_history_json:
+        return None
+    clean = article_history_json.replace("\u2028", " ").replace("\u2029", " ")
+    return json.loads(clean)
+
+
+@instrumented("supplier_analysis")
+@st.cache_data(ttl=3600, show_spinner=False)
+@disk_cached("supplier_analysis", ttl=DISK_TTL["supplier_analysis"],
+             model=cascade_cache_key("supplier_competencies"))
+def _cached_supplier_analysis(supplier_name: str, article_history_json: str,
+                              country: Optional[str]) -> Dict[str, Any]:
+    """Gecachter GPT-Call der Lieferanten-Analyse (TTL: 1 Stunde In-Prozess, 30 Tage Disk)."""
     from src.core.cbam import gpt_analyze_supplier_competencies
-    article_history = None
-    if article_history_json:
-        clean = article_history_json.replace("\u2028", " ").replace("\u2029", " ")
-        article_history = json.loads(clean)
-    return gpt_analyze_supplier_competencies(supplier_name, article_history, country)
+    result = gpt_analyze_supplier_competencies(supplier_name, _load_article_history(article_history_json), country)
+    if result.get("_error"):
+        # Abgelaufene Deadline nicht als Fehler cachen - der Aufrufer analysiert lokal
+        check_deadline("Lieferanten-Analyse", grace=0.5)
+    return result
 
 
+@instrumented("article_search")
 @st.cache_data(ttl=1800, show_spinner=False)
+@disk_cached("article_search", ttl=DISK_TTL["article_search"], model="gpt-4o-mini")
 def cached_gpt_article_search(query: str, items_json: str) -> List[int]:
     """
     Gecachte Artikel-Suche.
@@ -135,7 +381,10 @@ def cached_gpt_article_search(query: str, items_json: str) -> List[int]:
     return gpt_intelligent_article_search(query, items)
 
 
+@instrumented("technical_drawing")
 @st.cache_data(ttl=3600, show_spinner=False)
+@disk_cached("technical_drawing", ttl=DISK_TTL["technical_drawing"], model="gpt-4o-mini",
+             ignore=("image_data",))
 def cached_gpt_technical_drawing(image_hash: str, image_data: bytes, filename: str) -> Dict[str, Any]:
     """
     Gecachte Zeichnungsanalyse.
@@ -146,33 +395,67 @@ def cached_gpt_technical_drawing(image_hash: str, image_data: bytes, filename: s
     return gpt_analyze_technical_drawing(image_data, filename)
 
 
-@st.cache_data(ttl=3600, show_spinner=False)
 def cached_gpt_rate_supplier(supplier_name: str, country: Optional[str],
                             price_volatility: Optional[float], total_orders: Optional[int],
                             avg_price: Optional[float], article_name: Optional[str]) -> Dict[str, Any]:
     """
     Gecachte Lieferanten-Bewertung.
     TTL: 1 Stunde
+
+    Läuft die Schritt-Deadline ab, kommt eine lokale Bewertung aus Preisvolatilität
+    und Land (heuristic_rate_supplier) - ungecacht.
     """
+    try:
+        return _cached_rate_supplier(supplier_name, country, price_volatility,
+                                     total_orders, avg_price, article_name)
+    except DeadlineExceeded:
+        from src.core.cbam import heuristic_rate_supplier
+        record_fallback("rate_supplier")
+        result = heuristic_rate_supplier(supplier_name, country, price_volatility,
+                                         total_orders, avg_price, article_name)
+        return {**result, "_deadline_fallback": True}
+
+
+@instrumented("rate_supplier")
+@st.cache_data(ttl=3600, show_spinner=False)
+@disk_cached("rate_supplier", ttl=DISK_TTL["rate_supplier"], model=cascade_cache_key("rate_supplier"))
+def _cached_rate_supplier(supplier_name: str, country: Optional[str],
+                          price_volatility: Optional[float], total_orders: Optional[int],
+                          avg_price: Optional[float], article_name: Optional[str]) -> Dict[str, Any]:
+    """Gecachter GPT-Call der Lieferanten-Bewertung (TTL: 1 Stunde In-Prozess, 7 Tage Disk)."""
     from src.core.cbam import gpt_rate_supplier
-    return gpt_rate_supplier(supplier_name, country, price_volatility,
-                           total_orders, avg_price, article_name)
+    result = gpt_rate_supplier(supplier_name, country, price_volatility,
+                               total_orders, avg_price, article_name)
+    if result.get("_error"):
+        # Abgelaufene Deadline nicht als Fehler cachen - der Aufrufer bewertet lokal
+        check_deadline("Lieferanten-Bewertung", grace=0.5)
+    return result
 
 
-def clear_all_caches():
+def clear_all_caches(include_disk: bool = True):
     """Löscht alle GPT-Caches (z.B. bei neuen Daten)."""
     st.cache_data.clear()
+    if include_disk:
+        disk = get_disk_cache()
+        if disk is not None:
+            disk.clear()
 
 
-# Cache-Statistiken
-_cache_hits = 0
-_cache_misses = 0
-
+def get_cache_stats() -> Dict[str, Any]:
+    """
+    Cache-Statistiken seit Prozessstart (Summe über alle gecachten GPT-Funktionen).
 
-def get_cache_stats() -> Dict[str, int]:
-    """Gibt Cache-Statistiken zurück."""
+    Treffer = st.cache_data, Disk-Cache oder zusammengelegter Call;
+    Aufschlüsselung je Funktion unter "functions" (siehe src.gpt.cache_metrics).
+    """
+    rows = cache_metrics()
+    hits = sum(r["memory_hit"] + r["disk_hit"] + r["coalesced"] for r in rows)
+    misses = sum(r["miss"] for r in rows)
     return {
-        "hits": _cache_hits,
-        "misses": _cache_misses,
-        "hit_rate": _cache_hits / max(_cache_hits + _cache_misses, 1)
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / max(hits + misses, 1),
+        "tokens_saved": sum(r["tokens_saved"] for r in rows),
+        "seconds_saved": round(sum(r["seconds_saved"] for r in rows), 2),
+        "functions": rows,
     }
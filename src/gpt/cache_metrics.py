@@ -0,0 +1,187 @@
+"""
+GPT-CACHE-METRIKEN
+==================
+Treffer, Fehlschläge, Latenz und Einsparungen je gecachter GPT-Funktion.
+
+Ergebnisarten pro Aufruf:
+    memory_hit  st.cache_data hatte das Ergebnis (Funktionskörper lief nicht)
+    disk_hit    Ergebnis aus dem SQLite-Disk-Cache
+    coalesced   an einen gleichzeitig laufenden identischen Call angehängt (Single-Flight)
+    miss        GPT wurde tatsächlich gefragt
+
+@instrumented(name) sitzt außen um @st.cache_data; disk_cached meldet über
+record_outcome(), was darunter passiert ist. Eingesparte Zeit = mittlere
+Miss-Latenz minus Hit-Latenz, eingesparte Tokens = _tokens_used des Ergebnisses.
+
+Export: metrics_prometheus() (Text-Exposition-Format) und metrics_jsonl().
+"""
+
+import contextvars
+import functools
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+OUTCOMES = ("memory_hit", "disk_hit", "coalesced", "miss")
+HIT_OUTCOMES = ("memory_hit", "disk_hit", "coalesced")
+
+# Wird von disk_cached gesetzt; bleibt None, wenn st.cache_data direkt geliefert hat
+_outcome: contextvars.ContextVar = contextvars.ContextVar("evaluera_cache_outcome", default=None)
+
+
+def _tokens_of(result: Any) -> int:
+    if isinstance(result, dict):
+        try:
+            return int(result.get("_tokens_used") or 0)
+        except (TypeError, ValueError):
+            return 0
+    return 0
+
+
+class FunctionMetrics:
+    """Zähler einer gecachten Funktion."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.counts = {o: 0 for o in OUTCOMES}
+        self.seconds = {o: 0.0 for o in OUTCOMES}
+        self.tokens_spent = 0
+        self.tokens_saved = 0
+        self.seconds_saved = 0.0
+        self.entries_stored = 0
+        self.entry_bytes = 0
+
+    def record(self, outcome: str, seconds: float, result: Any):
+        self.counts[outcome] += 1
+        self.seconds[outcome] += seconds
+        tokens = _tokens_of(result)
+        if outcome == "miss":
+            self.tokens_spent += tokens
+        else:
+            self.tokens_saved += tokens
+            avg_miss = self.avg_seconds("miss")
+            if avg_miss is not None:
+                self.seconds_saved += max(0.0, avg_miss - seconds)
+
+    def avg_seconds(self, outcome: str) -> Optional[float]:
+        n = self.counts[outcome]
+        return self.seconds[outcome] / n if n else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        hits = sum(self.counts[o] for o in HIT_OUTCOMES)
+        calls = hits + self.counts["miss"]
+        return {
+            "function": self.name,
+            "calls": calls,
+            **{o: self.counts[o] for o in OUTCOMES},
+            "hit_rate": round(hits / calls, 4) if calls else 0.0,
+            "avg_hit_ms": round(1000 * sum(self.seconds[o] for o in HIT_OUTCOMES) / hits, 2) if hits else None,
+            "avg_miss_ms": round(1000 * self.avg_seconds("miss"), 1) if self.counts["miss"] else None,
+            "seconds_saved": round(self.seconds_saved, 2),
+            "tokens_spent": self.tokens_spent,
+            "tokens_saved": self.tokens_saved,
+            "entries_stored": self.entries_stored,
+            "avg_entry_bytes": round(self.entry_bytes / self.entries_stored) if self.entries_stored else None,
+        }
+
+
+_metrics: Dict[str, FunctionMetrics] = {}
+_lock = threading.Lock()
+
+
+def _get(name: str) -> FunctionMetrics:
+    m = _metrics.get(name)
+    if m is None:
+        m = _metrics.setdefault(name, FunctionMetrics(name))
+    return m
+
+
+def record_outcome(outcome: str):
+    """Von disk_cached aufgerufen: was unterhalb von st.cache_data passiert ist."""
+    _outcome.set(outcome)
+
+
+def record_entry_size(name: str, size: int):
+    """Größe eines neu im Disk-Cache gespeicherten Eintrags (Bytes)."""
+    with _lock:
+        m = _get(name)
+        m.entries_stored += 1
+        m.entry_bytes += size
+
+
+def instrumented(name: str) -> Callable:
+    """
+    Decorator für gecachte GPT-Wrapper (außerhalb von @st.cache_data anbringen).
+
+    Args:
+        name: Funktions-Name in den Metriken (= Disk-Cache-Namespace)
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            token = _outcome.set(None)
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+                outcome = _outcome.get() or "memory_hit"
+            finally:
+                _outcome.reset(token)
+            elapsed = time.perf_counter() - started
+            with _lock:
+                _get(name).record(outcome, elapsed, result)
+            return result
+
+        # st.cache_data-API weiter erreichbar
+        if hasattr(fn, "clear"):
+            wrapper.clear = fn.clear
+        return wrapper
+
+    return decorator
+
+
+def cache_metrics() -> List[Dict[str, Any]]:
+    """Metriken aller instrumentierten Funktionen (sortiert nach Name)."""
+    with _lock:
+        return [_metrics[name].snapshot() for name in sorted(_metrics)]
+
+
+def reset_cache_metrics():
+    with _lock:
+        _metrics.clear()
+
+
+def metrics_jsonl() -> str:
+    """Eine JSON-Zeile je Funktion, mit Zeitstempel (für Log-Shipping)."""
+    ts = time.time()
+    return "".join(json.dumps({"ts": ts, **row}, ensure_ascii=False) + "\n" for row in cache_metrics())
+
+
+def metrics_prometheus() -> str:
+    """Prometheus-Text-Exposition (ohne Client-Bibliothek)."""
+    rows = cache_metrics()
+    lines: List[str] = []
+
+    def metric(name: str, kind: str, help_text: str, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_str = ",".join(f'{k}="{v}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_str}}} {value}")
+
+    metric("evaluera_gpt_cache_calls_total", "counter", "Aufrufe gecachter GPT-Funktionen nach Ergebnisart",
+           [({"function": r["function"], "outcome": o}, r[o]) for r in rows for o in OUTCOMES])
+    metric("evaluera_gpt_cache_tokens_total", "counter", "Verbrauchte bzw. eingesparte Tokens",
+           [({"function": r["function"], "kind": kind}, r[f"tokens_{kind}"]) for r in rows for kind in ("spent", "saved")])
+    metric("evaluera_gpt_cache_seconds_saved_total", "counter", "Geschätzt eingesparte Wartezeit in Sekunden",
+           [({"function": r["function"]}, r["seconds_saved"]) for r in rows])
+    with _lock:
+        seconds = [(m.name, o, m.seconds[o]) for m in _metrics.values() for o in OUTCOMES]
+        entry_bytes = [(m.name, m.entry_bytes, m.entries_stored) for m in _metrics.values()]
+    metric("evaluera_gpt_cache_latency_seconds_total", "counter", "Summierte Latenz nach Ergebnisart",
+           [({"function": f, "outcome": o}, round(s, 6)) for f, o, s in sorted(seconds)])
+    metric("evaluera_gpt_cache_entry_bytes_total", "counter", "Größe neu gespeicherter Disk-Einträge in Bytes",
+           [({"function": f}, b) for f, b, _ in sorted(entry_bytes)])
+    metric("evaluera_gpt_cache_entries_stored_total", "counter", "Neu gespeicherte Disk-Einträge",
+           [({"function": f}, n) for f, _, n in sorted(entry_bytes)])
+    return "\n".join(lines) + "\n"
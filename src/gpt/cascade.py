@@ -0,0 +1,383 @@
+"""
+MODELL-KASKADE
+==============
+Günstiges Modell zuerst, teures nur wenn nötig:
+
+    gpt-4o-mini (Schema-Antwort) ──ok──────────────────────────→ Ergebnis
+        │ ungültig (Schema/Plausibilität), confidence low, API-Fehler
+        ▼
+    gpt-4o (gleiche Messages, gleiches Schema) ───────────────→ Ergebnis
+
+Jede Funktion hat eine eigene Policy (Modelle, max_tokens, Schema, Confidence-
+Feld, Plausibilitäts-Check). Das Schema geht als response_format an die API
+(strict = vom Provider erzwungen) und wird lokal nochmal geprüft.
+
+cascade_stats() zeigt je Funktion Eskalationsquote, Latenz je Modell und die
+gesparte Wartezeit gegenüber "immer das letzte Modell".
+
+Konfiguration (ENV):
+    EVALUERA_CASCADE_<NAME>       Modelle der Funktion, kommagetrennt, z.B.
+                                  EVALUERA_CASCADE_RATE_SUPPLIER="gpt-4o" (= ohne Kaskade)
+    EVALUERA_CASCADE_DISABLED     "1" = überall nur das letzte Modell
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.gpt.utils import parse_gpt_json, safe_float, safe_gpt_request, safe_print, sanitize_input
+
+_CONFIDENCE = ["high", "medium", "low"]
+
+
+@dataclass(frozen=True)
+class CascadePolicy:
+    """Modell-Reihenfolge und Eskalationsregeln einer GPT-Funktion."""
+    name: str
+    models: Tuple[str, ...]
+    max_tokens: int
+    schema: Dict[str, Any]
+    strict: bool = False
+    confidence_field: Optional[str] = "confidence"
+    escalate_confidence: Tuple[str, ...] = ("low",)
+    check: Optional[Callable[[Dict[str, Any]], List[str]]] = field(default=None, compare=False)
+    # Idempotent (temperature=0) → Hedging gegen hängende Requests (src.gpt.hedging)
+    hedge: bool = False
+
+    def response_format(self) -> Dict[str, Any]:
+        return {"type": "json_schema",
+                "json_schema": {"name": self.name, "schema": self.schema, "strict": self.strict}}
+
+
+# ==================== SCHEMAS ====================
+
+def _nullable(kind: str) -> Dict[str, Any]:
+    return {"type": [kind, "null"]}
+
+
+_NUMBER = {"type": "number"}
+_STRINGS = {"type": "array", "items": {"type": "string"}}
+_CONFIDENCE_ENUM = {"type": "string", "enum": _CONFIDENCE}
+
+COST_ESTIMATE_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "material_guess": {"type": "string"},
+        "d_mm": _nullable("number"),
+        "l_mm": _nullable("number"),
+        "mass_kg": _NUMBER,
+        "material_price_eur_kg": _NUMBER,
+        "material_cost_eur": _NUMBER,
+        "process": {"type": "string"},
+        "setup_time_min": _NUMBER,
+        "cycle_time_s": _NUMBER,
+        "machine_eur_h": _NUMBER,
+        "labor_eur_h": _NUMBER,
+        "overhead_pct": _NUMBER,
+        "secondary_ops": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"name": {"type": "string"}, "cost_eur": _NUMBER},
+                "required": ["name", "cost_eur"],
+                "additionalProperties": False,
+            },
+        },
+        "fab_cost_eur": _NUMBER,
+        "total_cost_eur": _NUMBER,
+        "confidence": _CONFIDENCE_ENUM,
+        "assumptions": _STRINGS,
+    },
+    "additionalProperties": False,
+}
+# strict verlangt: alle Felder required
+COST_ESTIMATE_SCHEMA["required"] = list(COST_ESTIMATE_SCHEMA["properties"])
+
+RATE_SUPPLIER_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "rating": {"type": "integer", "minimum": 1, "maximum": 10},
+        "risk_level": {"type": "string", "enum": ["low", "medium", "high", "critical"]},
+        "confidence": _CONFIDENCE_ENUM,
+        "company_analysis": {"type": "object"},
+        "country_analysis": {"type": "object"},
+        "article_fit": {"type": "object"},
+        "performance_metrics": {"type": "object"},
+        "strengths": _STRINGS,
+        "weaknesses": _STRINGS,
+        "risks": _STRINGS,
+        "recommendations": _STRINGS,
+        "overall_assessment": {"type": "string"},
+    },
+    "required": ["rating", "risk_level", "confidence", "strengths", "weaknesses", "recommendations",
+                 "overall_assessment"],
+}
+
+SUPPLIER_COMPETENCIES_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "supplier_name": {"type": "string"},
+        "analysis_confidence": _CONFIDENCE_ENUM,
+        "core_competencies": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"process": {"type": "string"}, "confidence": _CONFIDENCE_ENUM,
+                               "evidence": _STRINGS, "capability_level": {"type": "string"}},
+                "required": ["process", "confidence"],
+            },
+        },
+        "material_expertise": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"material": {"type": "string"}, "confidence": _CONFIDENCE_ENUM},
+                "required": ["material"],
+            },
+        },
+        "specialization": {"type": "object"},
+        "production_capabilities": {"type": "object"},
+        "recommendations": _STRINGS,
+    },
+    "required": ["analysis_confidence", "core_competencies", "material_expertise"],
+}
+
+
+def _check_cost_estimate(data: Dict[str, Any]) -> List[str]:
+    """Plausibilität über das Schema hinaus (Mini rechnet gern falsch zusammen)."""
+    errors = []
+    for key in ("mass_kg", "material_cost_eur", "fab_cost_eur", "total_cost_eur", "cycle_time_s"):
+        if safe_float(data.get(key), 0.0) < 0:
+            errors.append(f"{key} < 0")
+    if not safe_float(data.get("mass_kg"), 0.0) > 0:
+        errors.append("mass_kg fehlt")
+    total = safe_float(data.get("total_cost_eur"), 0.0)
+    parts = safe_float(data.get("material_cost_eur"), 0.0) + safe_float(data.get("fab_cost_eur"), 0.0)
+    if abs(total - parts) > 0.05 * max(total, parts) + 0.001:
+        errors.append(f"total_cost_eur {total:.4f} ≠ Material + Fertigung {parts:.4f}")
+    return errors
+
+
+def _check_supplier_competencies(data: Dict[str, Any]) -> List[str]:
+    return [] if data.get("core_competencies") else ["core_competencies leer"]
+
+
+POLICIES: Dict[str, CascadePolicy] = {}
+
+
+def register_policy(policy: CascadePolicy) -> CascadePolicy:
+    POLICIES[policy.name] = policy
+    return policy
+
+
+register_policy(CascadePolicy(
+    name="cost_estimate", models=("gpt-4o-mini", "gpt-4o"), max_tokens=2000,
+    schema=COST_ESTIMATE_SCHEMA, strict=True, check=_check_cost_estimate, hedge=True,
+))
+register_policy(CascadePolicy(
+    name="rate_supplier", models=("gpt-4o-mini", "gpt-4o"), max_tokens=2000,
+    schema=RATE_SUPPLIER_SCHEMA,
+))
+register_policy(CascadePolicy(
+    name="supplier_competencies", models=("gpt-4o-mini", "gpt-4o"), max_tokens=2500,
+    schema=SUPPLIER_COMPETENCIES_SCHEMA, confidence_field="analysis_confidence",
+    check=_check_supplier_competencies,
+))
+
+
+def cascade_models(name: str) -> Tuple[str, ...]:
+    """Modell-Reihenfolge der Funktion (Policy, überschreibbar per ENV)."""
+    models = POLICIES[name].models
+    override = os.getenv(f"EVALUERA_CASCADE_{name.upper()}")
+    if override:
+        models = tuple(m.strip() for m in override.split(",") if m.strip()) or models
+    if os.getenv("EVALUERA_CASCADE_DISABLED") == "1":
+        models = models[-1:]
+    return models
+
+
+def cascade_cache_key(name: str) -> str:
+    """Modell-Teil des Disk-Cache-Keys: andere Kaskade → andere Ergebnisse."""
+    return ">".join(cascade_models(name))
+
+
+# ==================== VALIDIERUNG ====================
+
+_TYPES = {
+    "object": dict, "array": list, "string": str, "boolean": bool, "null": type(None),
+    "number": (int, float), "integer": int,
+}
+
+
+def validate_schema(value: Any, schema: Dict[str, Any], path: str = "$") -> List[str]:
+    """Prüft die Schema-Teilmenge, die die Policies nutzen (type, enum, required, properties, items, min/max)."""
+    kinds = schema.get("type")
+    if kinds is not None:
+        kinds = kinds if isinstance(kinds, list) else [kinds]
+        ok = any(isinstance(value, _TYPES[k]) and not (k in ("number", "integer") and isinstance(value, bool))
+                 for k in kinds)
+        if not ok:
+            return [f"{path}: erwartet {'|'.join(kinds)}, erhalten {type(value).__name__}"]
+    errors = []
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(f"{path}: {value!r} nicht in {schema['enum']}")
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if "minimum" in schema and value < schema["minimum"]:
+            errors.append(f"{path}: {value} < {schema['minimum']}")
+        if "maximum" in schema and value > schema["maximum"]:
+            errors.append(f"{path}: {value} > {schema['maximum']}")
+    if isinstance(value, dict):
+        for key in schema.get("required", []):
+            if key not in value:
+                errors.append(f"{path}.{key}: fehlt")
+        for key, sub in schema.get("properties", {}).items():
+            if key in value:
+                errors.extend(validate_schema(value[key], sub, f"{path}.{key}"))
+    if isinstance(value, list) and "items" in schema:
+        for idx, item in enumerate(value):
+            errors.extend(validate_schema(item, schema["items"], f"{path}[{idx}]"))
+    return errors
+
+
+# ==================== METRIKEN ====================
+
+_lock = threading.Lock()
+_stats: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
+    "calls": 0,
+    "escalated": 0,
+    "reasons": defaultdict(int),
+    "served_by": defaultdict(int),
+    "attempts": defaultdict(int),
+    "latency_s": defaultdict(float),
+    "tokens": defaultdict(int),
+    "total_latency_s": 0.0,
+})
+
+
+def _record(name: str, attempts: List[Dict[str, Any]], served_by: Optional[str]):
+    with _lock:
+        s = _stats[name]
+        s["calls"] += 1
+        if len(attempts) > 1:
+            s["escalated"] += 1
+        for attempt in attempts:
+            s["attempts"][attempt["model"]] += 1
+            s["latency_s"][attempt["model"]] += attempt["latency_s"]
+            s["tokens"][attempt["model"]] += attempt["tokens"]
+            s["total_latency_s"] += attempt["latency_s"]
+            if attempt.get("reason"):
+                s["reasons"][attempt["reason"]] += 1
+        if served_by:
+            s["served_by"][served_by] += 1
+
+
+def cascade_stats() -> Dict[str, Any]:
+    """
+    Je Funktion: Eskalationsquote, Ø-Latenz je Modell, Tokens je Modell und
+    gesparte Wartezeit = Calls × Ø-Latenz des letzten Modells - tatsächliche Latenz
+    (None, solange das letzte Modell noch nie lief).
+    """
+    out = {}
+    with _lock:
+        for name, s in _stats.items():
+            final = cascade_models(name)[-1] if name in POLICIES else None
+            avg = {m: s["latency_s"][m] / n for m, n in s["attempts"].items() if n}
+            baseline = avg.get(final)
+            out[name] = {
+                "calls": s["calls"],
+                "escalated": s["escalated"],
+                "escalation_rate": s["escalated"] / max(s["calls"], 1),
+                "reasons": dict(s["reasons"]),
+                "served_by": dict(s["served_by"]),
+                "avg_latency_s": {m: round(v, 3) for m, v in avg.items()},
+                "tokens": dict(s["tokens"]),
+                "seconds_saved": round(s["calls"] * baseline - s["total_latency_s"], 2) if baseline else None,
+            }
+    return out
+
+
+# ==================== REQUEST ====================
+
+def _escalation_reason(policy: CascadePolicy, data: Dict[str, Any]) -> Tuple[Optional[str], List[str]]:
+    errors = validate_schema(data, policy.schema)
+    if not errors and policy.check is not None:
+        errors = policy.check(data)
+    if errors:
+        return "invalid", errors
+    if policy.confidence_field and str(data.get(policy.confidence_field, "")).lower() in policy.escalate_confidence:
+        return "low_confidence", []
+    return None, []
+
+
+def cascade_request(name: str, messages: List[Dict[str, Any]], client_factory: Callable[[], Any],
+                    **kwargs) -> Dict[str, Any]:
+    """
+    Führt einen GPT-Request nach der Kaskaden-Policy aus.
+
+    Args:
+        name: Policy-Name (siehe POLICIES)
+        messages: Chat-Messages (für alle Stufen gleich → Prompt-Cache je Modell)
+        client_factory: wie bei safe_gpt_request
+        **kwargs: weitere API-Optionen (temperature, retries, ...)
+
+    Returns:
+        {"_error": False, "data", "text", "model", "responses", "escalations", "tokens_used"}
+        oder {"_error": True, "error", "escalations"}, wenn auch das letzte Modell scheitert
+    """
+    policy = POLICIES[name]
+    models = cascade_models(name)
+    attempts: List[Dict[str, Any]] = []
+    responses = []
+    last_error = None
+    for tier, model in enumerate(models):
+        is_last = tier == len(models) - 1
+        started = time.perf_counter()
+        api_result = safe_gpt_request(model=model, messages=messages, client_factory=client_factory,
+                                      function=f"{name}/{model}", hedge=policy.hedge,
+                                      max_tokens=policy.max_tokens, response_format=policy.response_format(),
+                                      **kwargs)
+        attempt = {"model": model, "latency_s": time.perf_counter() - started, "tokens": 0}
+        attempts.append(attempt)
+
+        if api_result.get("_error"):
+            last_error = api_result.get("error", "safe_gpt_request failed")
+            attempt["reason"] = "error"
+            safe_print(f"WARN Kaskade {name}: {model} fehlgeschlagen ({last_error})")
+            continue
+
+        response = api_result["response"]
+        responses.append(response)
+        attempt["tokens"] = response.usage.total_tokens if response.usage else 0
+        text = sanitize_input((response.choices[0].message.content or "").strip())
+        data = parse_gpt_json(text, default={})
+        if response.choices[0].finish_reason == "length":
+            reason, errors = "invalid", ["Antwort abgeschnitten"]
+        else:
+            reason, errors = _escalation_reason(policy, data)
+        if reason and not is_last:
+            attempt["reason"] = reason
+            safe_print(f"INFO Kaskade {name}: {model} → eskaliere ({reason}{': ' + '; '.join(errors[:3]) if errors else ''})")
+            continue
+        if reason:
+            safe_print(f"WARN Kaskade {name}: letzte Stufe {model} mit {reason} übernommen")
+
+        _record(name, attempts, model)
+        return {
+            "_error": False,
+            "data": data,
+            "text": text,
+            "model": model,
+            "responses": responses,
+            "escalations": [{"model": a["model"], "reason": a["reason"]} for a in attempts if a.get("reason")],
+            "tokens_used": sum(a["tokens"] for a in attempts),
+        }
+
+    _record(name, attempts, None)
+    return {
+        "_error": True,
+        "error": last_error or "Kaskade ohne Ergebnis",
+        "escalations": [{"model": a["model"], "reason": a.get("reason")} for a in attempts],
+    }
@@ -0,0 +1,351 @@
+"""
+OPENAI CLIENT-REGISTRY
+======================
+Prozessweit geteilte OpenAI-Clients mit abgestimmtem httpx-Connection-Pool.
+
+Bisher baute jeder GPT-Aufruf einen neuen OpenAI(api_key=key) - jeder Call
+zahlte TLS-Handshake und Verbindungsaufbau. Hier gibt es einen Client pro
+(API-Key, Base-URL) mit Keep-Alive, optional HTTP/2 und Pool-Metriken.
+Der OpenAI-Client ist thread-safe und kann von allen Sessions geteilt werden.
+Für die Async-Schicht (src.gpt.async_exec) gibt es analog AsyncOpenAI-Clients;
+diese sind an die Event-Loop gebunden, in der sie erzeugt wurden.
+Jeder Request läuft durch den Rate-Limit-Scheduler (src.gpt.rate_limiter);
+Timeouts und Queue-Wartezeit werden auf die Restzeit der aktiven Deadline
+gekappt (src.gpt.deadline).
+
+Konfiguration (ENV):
+    EVALUERA_OPENAI_MAX_CONNECTIONS    Maximale Verbindungen im Pool (Default: 20)
+    EVALUERA_OPENAI_MAX_KEEPALIVE      Maximale Keep-Alive-Verbindungen (Default: 10)
+    EVALUERA_OPENAI_KEEPALIVE_EXPIRY   Leerlaufzeit bis Keep-Alive-Verbindungen schließen, s (Default: 60)
+    EVALUERA_OPENAI_TIMEOUT            Gesamt-Timeout je Request, s (Default: 120)
+    EVALUERA_OPENAI_CONNECT_TIMEOUT    Verbindungsaufbau-Timeout, s (Default: 10)
+    EVALUERA_OPENAI_POOL_TIMEOUT       Warten auf freie Pool-Verbindung, s (Default: 30)
+    EVALUERA_OPENAI_HTTP2              "0" deaktiviert HTTP/2 (aktiv, wenn das Paket h2 installiert ist)
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import httpx
+except Exception:
+    httpx = None
+
+try:
+    from openai import AsyncOpenAI, OpenAI
+except Exception:
+    AsyncOpenAI = None
+    OpenAI = None
+
+try:
+    import h2  # noqa: F401
+    _H2_AVAILABLE = True
+except Exception:
+    _H2_AVAILABLE = False
+
+from src.gpt.deadline import time_left
+from src.gpt.rate_limiter import estimate_request_tokens, get_scheduler, max_queue_wait
+from src.gpt.utils import safe_print
+
+DEFAULTS = {
+    "MAX_CONNECTIONS": 20,
+    "MAX_KEEPALIVE": 10,
+    "KEEPALIVE_EXPIRY": 60.0,
+    "TIMEOUT": 120.0,
+    "CONNECT_TIMEOUT": 10.0,
+    "POOL_TIMEOUT": 30.0,
+}
+
+
+def _env_number(name: str, cast=float):
+    raw = os.getenv(f"EVALUERA_OPENAI_{name}")
+    if raw:
+        try:
+            return cast(raw)
+        except ValueError:
+            safe_print(f"WARN Ungültiger Wert für EVALUERA_OPENAI_{name}: {raw!r}")
+    return cast(DEFAULTS[name])
+
+
+def http2_enabled() -> bool:
+    return _H2_AVAILABLE and os.getenv("EVALUERA_OPENAI_HTTP2", "1") != "0"
+
+
+class PoolMetrics:
+    """Zähler je Client: Requests, laufende Requests, Status-Codes, Transportfehler, Latenz."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.errors = 0
+        self.status: Dict[int, int] = {}
+        self.total_seconds = 0.0
+
+    def started(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finished(self, started_at: float, status_code: Optional[int]):
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.total_seconds += time.perf_counter() - started_at
+            if status_code is None:
+                self.errors += 1
+            else:
+                self.status[status_code] = self.status.get(status_code, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "transport_errors": self.errors,
+                "status": dict(self.status),
+                "avg_latency_s": round(self.total_seconds / self.requests, 3) if self.requests else None,
+            }
+
+
+def _scheduled(request):
+    """(Scheduler, Tokens) für Requests mit Modell im Body, sonst (None, 0)."""
+    if request.method != "POST":
+        return None, 0
+    try:
+        body = request.content
+    except Exception:
+        return None, 0
+    model, tokens = estimate_request_tokens(body)
+    return (get_scheduler(model), tokens) if model else (None, 0)
+
+
+def _apply_deadline(request) -> Optional[float]:
+    """
+    Kappt die httpx-Timeouts des Requests auf die Restzeit der aktiven Deadline
+    (src.gpt.deadline) und liefert die maximale Wartezeit in der Rate-Limit-Queue.
+    """
+    left = time_left()
+    if left is None:
+        return None
+    if left <= 0:
+        raise httpx.TimeoutException("Deadline überschritten", request=request)
+    timeouts = request.extensions.get("timeout") or {}
+    request.extensions["timeout"] = {
+        phase: left if timeouts.get(phase) is None else min(timeouts[phase], left)
+        for phase in ("connect", "read", "write", "pool")
+    }
+    return min(max_queue_wait(), left)
+
+
+def _admit(request):
+    queue_timeout = _apply_deadline(request)
+    scheduler, tokens = _scheduled(request)
+    if scheduler is not None:
+        scheduler.acquire(tokens, timeout=queue_timeout)
+    return scheduler
+
+
+async def _admit_async(request):
+    queue_timeout = _apply_deadline(request)
+    scheduler, tokens = _scheduled(request)
+    if scheduler is not None:
+        await scheduler.acquire_async(tokens, timeout=queue_timeout)
+    return scheduler
+
+
+if httpx is not None:
+    class _MeteredTransport(httpx.HTTPTransport):
+        """HTTPTransport, der jeden Request in PoolMetrics zählt (auch bei Verbindungsfehlern)."""
+
+        def __init__(self, metrics: PoolMetrics, **kwargs):
+            super().__init__(**kwargs)
+            self.metrics = metrics
+
+        def handle_request(self, request):
+            scheduler = _admit(request)
+            started_at = time.perf_counter()
+            self.metrics.started()
+            status_code = None
+            try:
+                response = super().handle_request(request)
+                status_code = response.status_code
+                if scheduler is not None:
+                    scheduler.observe_response(status_code, response.headers)
+                return response
+            finally:
+                self.metrics.finished(started_at, status_code)
+
+    class _MeteredAsyncTransport(httpx.AsyncHTTPTransport):
+        """Async-Pendant zu _MeteredTransport."""
+
+        def __init__(self, metrics: PoolMetrics, **kwargs):
+            super().__init__(**kwargs)
+            self.metrics = metrics
+
+        async def handle_async_request(self, request):
+            scheduler = await _admit_async(request)
+            started_at = time.perf_counter()
+            self.metrics.started()
+            status_code = None
+            try:
+                response = await super().handle_async_request(request)
+                status_code = response.status_code
+                if scheduler is not None:
+                    scheduler.observe_response(status_code, response.headers)
+                return response
+            finally:
+                self.metrics.finished(started_at, status_code)
+
+
+def _connection_stats(http_client) -> Dict[str, int]:
+    """Verbindungen im httpcore-Pool (offen/aktiv/idle) - best effort, interne API."""
+    try:
+        conns = list(http_client._transport._pool.connections)
+    except Exception:
+        return {}
+    idle = sum(1 for c in conns if c.is_idle())
+    return {"open": len(conns), "idle": idle, "active": len(conns) - idle,
+            "http2": sum(1 for c in conns if "HTTP/2" in repr(c))}
+
+
+_clients: Dict[Tuple[str, Optional[str]], Tuple[Any, Any, PoolMetrics]] = {}
+_clients_lock = threading.Lock()
+# (API-Key, Base-URL, Loop-ID) -> (AsyncOpenAI, httpx.AsyncClient, PoolMetrics, Loop)
+_async_clients: Dict[Tuple[str, Optional[str], int], Tuple[Any, Any, PoolMetrics, Any]] = {}
+
+
+def _pool_settings():
+    limits = httpx.Limits(
+        max_connections=_env_number("MAX_CONNECTIONS", int),
+        max_keepalive_connections=_env_number("MAX_KEEPALIVE", int),
+        keepalive_expiry=_env_number("KEEPALIVE_EXPIRY"),
+    )
+    timeout = httpx.Timeout(
+        _env_number("TIMEOUT"),
+        connect=_env_number("CONNECT_TIMEOUT"),
+        pool=_env_number("POOL_TIMEOUT"),
+    )
+    return limits, timeout
+
+
+def _build_http_client(metrics: PoolMetrics):
+    limits, timeout = _pool_settings()
+    transport = _MeteredTransport(metrics, limits=limits, http2=http2_enabled())
+    return httpx.Client(transport=transport, timeout=timeout)
+
+
+def _build_async_http_client(metrics: PoolMetrics):
+    limits, timeout = _pool_settings()
+    transport = _MeteredAsyncTransport(metrics, limits=limits, http2=http2_enabled())
+    return httpx.AsyncClient(transport=transport, timeout=timeout)
+
+
+def get_openai_client(api_key: Optional[str] = None, base_url: Optional[str] = None):
+    """
+    Geteilter OpenAI-Client für (API-Key, Base-URL).
+
+    Args:
+        api_key: API-Key (Default: OPENAI_API_KEY)
+        base_url: Optionale Base-URL (Default: OPENAI_BASE_URL bzw. OpenAI-Standard)
+
+    Returns:
+        OpenAI-Client
+
+    Raises:
+        RuntimeError: wenn das openai-Paket fehlt
+    """
+    if OpenAI is None:
+        raise RuntimeError("openai-Paket nicht installiert")
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    base_url = base_url or os.getenv("OPENAI_BASE_URL") or None
+    registry_key = (api_key, base_url)
+
+    entry = _clients.get(registry_key)
+    if entry is not None:
+        return entry[0]
+
+    with _clients_lock:
+        entry = _clients.get(registry_key)
+        if entry is None:
+            if httpx is None:
+                client, http_client, metrics = OpenAI(api_key=api_key, base_url=base_url), None, PoolMetrics()
+            else:
+                metrics = PoolMetrics()
+                http_client = _build_http_client(metrics)
+                client = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+            entry = (client, http_client, metrics)
+            _clients[registry_key] = entry
+    return entry[0]
+
+
+def get_async_openai_client(api_key: Optional[str] = None, base_url: Optional[str] = None):
+    """
+    Geteilter AsyncOpenAI-Client für (API-Key, Base-URL) in der laufenden Event-Loop.
+
+    Muss innerhalb einer Coroutine aufgerufen werden; httpx.AsyncClient-Verbindungen
+    dürfen nicht zwischen Event-Loops wandern.
+
+    Raises:
+        RuntimeError: wenn das openai-Paket fehlt oder keine Event-Loop läuft
+    """
+    if AsyncOpenAI is None:
+        raise RuntimeError("openai-Paket nicht installiert")
+    loop = asyncio.get_running_loop()
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    base_url = base_url or os.getenv("OPENAI_BASE_URL") or None
+    registry_key = (api_key, base_url, id(loop))
+
+    with _clients_lock:
+        entry = _async_clients.get(registry_key)
+        if entry is None:
+            metrics = PoolMetrics()
+            if httpx is None:
+                client, http_client = AsyncOpenAI(api_key=api_key, base_url=base_url), None
+            else:
+                http_client = _build_async_http_client(metrics)
+                client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+            entry = (client, http_client, metrics, loop)
+            _async_clients[registry_key] = entry
+    return entry[0]
+
+
+def client_pool_stats() -> Dict[str, Any]:
+    """Pool-Nutzung aller registrierten Clients (API-Key gekürzt)."""
+    stats = {}
+    entries = [(k[0], k[1], "", v[1], v[2]) for k, v in list(_clients.items())]
+    entries += [(k[0], k[1], " (async)", v[1], v[2]) for k, v in list(_async_clients.items())]
+    for api_key, base_url, suffix, http_client, metrics in entries:
+        label = f"{(api_key or '')[:7]}…@{base_url or 'default'}{suffix}"
+        entry = metrics.snapshot()
+        if http_client is not None:
+            entry["connections"] = _connection_stats(http_client)
+        stats[label] = entry
+    return {"http2": http2_enabled(), "clients": stats}
+
+
+def close_all_clients():
+    """Schließt alle Pools (z.B. bei API-Key-Wechsel oder in Tests)."""
+    with _clients_lock:
+        entries = list(_clients.values())
+        _clients.clear()
+        async_entries = list(_async_clients.values())
+        _async_clients.clear()
+    for _, http_client, _ in entries:
+        if http_client is not None:
+            try:
+                http_client.close()
+            except Exception:
+                pass
+    # Async-Pools in ihrer eigenen Loop schließen (sofern diese noch läuft)
+    for _, http_client, _, loop in async_entries:
+        if http_client is not None and loop.is_running() and not loop.is_closed():
+            try:
+                asyncio.run_coroutine_threadsafe(http_client.aclose(), loop)
+            except Exception:
+                pass
@@ -0,0 +1,97 @@
+"""
+GPT CONCURRENCY
+===============
+Begrenzte Parallelisierung unabhängiger (gecachter) GPT-Calls.
+
+Streamlit-Skripte laufen synchron; mehrere Positionen einer Zeichnung
+oder eines Portfolios würden sonst strikt nacheinander geschätzt.
+map_bounded() verteilt die Calls auf einen kleinen Thread-Pool, behält
+die Reihenfolge der Eingaben bei und isoliert Fehler pro Element.
+Die Schritt-Deadline (src.gpt.deadline) gilt in den Worker-Threads weiter.
+
+Konfiguration (ENV):
+    EVALUERA_GPT_MAX_WORKERS   Maximale parallele Calls (Default: 4)
+"""
+
+import os
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from src.gpt.deadline import current_deadline, deadline_at
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except Exception:
+    add_script_run_ctx = None
+    get_script_run_ctx = None
+
+DEFAULT_MAX_WORKERS = 4
+
+
+def default_max_workers() -> int:
+    try:
+        return max(1, int(os.getenv("EVALUERA_GPT_MAX_WORKERS", DEFAULT_MAX_WORKERS)))
+    except ValueError:
+        return DEFAULT_MAX_WORKERS
+
+
+def _thread_initializer(ctx) -> Callable[[], None]:
+    """Hängt den Streamlit-ScriptRunContext an Worker-Threads (st.cache_data etc.)."""
+    def _init():
+        if ctx is not None and add_script_run_ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+    return _init
+
+
+def map_bounded(
+    fn: Callable[[Any], Any],
+    items: Iterable[Any],
+    max_workers: Optional[int] = None,
+    on_progress: Optional[Callable[[int, int, int, Dict[str, Any]], None]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Führt fn(item) für alle Elemente mit begrenzter Parallelität aus.
+
+    Args:
+        fn: Funktion pro Element (z.B. gecachte GPT-Schätzung)
+        items: Eingaben
+        max_workers: Maximale parallele Calls (Default: EVALUERA_GPT_MAX_WORKERS)
+        on_progress: Callback(done, total, index, outcome) - läuft im aufrufenden
+                     Thread, darf also Streamlit-Elemente aktualisieren
+
+    Returns:
+        Liste von Outcomes in Eingabe-Reihenfolge:
+        {"ok": True, "result": ...} oder {"ok": False, "error": str, "trace": str}
+    """
+    items = list(items)
+    total = len(items)
+    outcomes: List[Optional[Dict[str, Any]]] = [None] * total
+    if total == 0:
+        return []
+
+    deadline = current_deadline()
+
+    def _run(item):
+        try:
+            with deadline_at(deadline):
+                return {"ok": True, "result": fn(item)}
+        except Exception as e:
+            return {"ok": False, "error": str(e), "trace": traceback.format_exc()}
+
+    workers = min(max_workers or default_max_workers(), total)
+    ctx = get_script_run_ctx() if get_script_run_ctx is not None else None
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gpt-fanout",
+                            initializer=_thread_initializer(ctx)) as pool:
+        futures = {pool.submit(_run, item): idx for idx, item in enumerate(items)}
+        done = 0
+        for fut in as_completed(futures):
+            idx = futures[fut]
+            outcomes[idx] = fut.result()
+            done += 1
+            if on_progress is not None:
+                on_progress(done, total, idx, outcomes[idx])
+
+    return outcomes
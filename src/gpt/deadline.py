@@ -0,0 +1,177 @@
+"""
+DEADLINES
+=========
+Zeitbudget je Wizard-Schritt, weitergereicht an alle verschachtelten GPT- und
+HTTP-Calls als Rest-Timeout:
+
+    with step_deadline(5):                       # Schritt 5: 25 s (Default)
+        cached_gpt_complete_cost_estimate(...)   # jeder Call bekommt nur die Restzeit
+
+Die Deadline (absoluter time.monotonic()-Zeitpunkt) liegt in einer ContextVar
+des Streamlit-Script-Threads. Verschachtelte Deadlines können sie nur
+verkürzen. Ist sie abgelaufen, werfen die Calls DeadlineExceeded - die Aufrufer
+fallen auf lokale Heuristiken zurück (record_fallback()).
+
+Weitergabe:
+- OpenAI-Clients: with_deadline(client) → timeout=Restzeit, keine SDK-Retries;
+  zusätzlich kappt der Transport (src.gpt.client) jeden Request auf die Restzeit
+- GPT-Loop (src.gpt.async_exec): Tasks erben die ContextVar, run_sync wartet
+  höchstens die Restzeit; Executor-Threads erben sie nicht - call_blocking
+  setzt sie dort explizit
+- Sonstige HTTP-Calls: requests.get(..., timeout=call_timeout(8))
+
+Konfiguration (ENV):
+    EVALUERA_DEADLINE_STEP<N>_S    Budget für Wizard-Schritt N in s (z.B. EVALUERA_DEADLINE_STEP5_S=25)
+    EVALUERA_DEADLINE_DISABLED     "1" = keine Schritt-Deadlines (nur feste Client-Timeouts)
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from src.gpt.utils import safe_print
+
+# Default-Budget je Wizard-Schritt (s); Schritte ohne GPT-Calls fehlen
+STEP_BUDGETS = {
+    2: 15.0,   # Artikel-Suche
+    4: 30.0,   # Lieferanten-Bewertung
+    5: 25.0,   # Kostenschätzung
+    6: 120.0,  # Nachhaltigkeit + Verhandlungsvorbereitung (Streaming)
+}
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar("evaluera_deadline", default=None)
+
+_stats_lock = threading.Lock()
+_stats: Counter = Counter()
+
+
+class DeadlineExceeded(TimeoutError):
+    """Das Zeitbudget des aktuellen Schritts ist aufgebraucht."""
+
+
+def _count(*keys: str):
+    with _stats_lock:
+        for key in keys:
+            _stats[key] += 1
+
+
+def current_deadline() -> Optional[float]:
+    """Aktive Deadline (time.monotonic()) oder None."""
+    return _deadline.get()
+
+
+def time_left() -> Optional[float]:
+    """Restzeit in s (kann negativ sein) oder None ohne Deadline."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def earliest(*deadlines: Optional[float]) -> Optional[float]:
+    """Früheste der gesetzten Deadlines oder None."""
+    given = [d for d in deadlines if d is not None]
+    return min(given) if given else None
+
+
+def check_deadline(what: str = "GPT-Call", grace: float = 0.0):
+    """
+    Wirft DeadlineExceeded, wenn die Deadline abgelaufen ist.
+
+    grace: schon so viele Sekunden vor Ablauf als abgelaufen werten (z.B. nach
+           einem Timeout, der auf die Restzeit gekappt war)
+    """
+    left = time_left()
+    if left is not None and left <= grace:
+        _count("exceeded")
+        raise DeadlineExceeded(f"{what}: Zeitbudget aufgebraucht")
+
+
+def call_timeout(default: Optional[float] = None, what: str = "GPT-Call") -> Optional[float]:
+    """
+    Timeout für den nächsten Call: min(default, Restzeit).
+
+    Raises:
+        DeadlineExceeded: wenn keine Restzeit mehr bleibt
+    """
+    check_deadline(what)
+    left = time_left()
+    if left is None:
+        return default
+    return left if default is None else min(default, left)
+
+
+@contextmanager
+def deadline_at(deadline: Optional[float]) -> Iterator[Optional[float]]:
+    """Setzt eine absolute Deadline (verkürzt eine äußere, verlängert sie nie)."""
+    outer = _deadline.get()
+    if deadline is None or (outer is not None and outer <= deadline):
+        effective = outer
+    else:
+        effective = deadline
+    token = _deadline.set(effective)
+    try:
+        yield effective
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def deadline_in(seconds: Optional[float]) -> Iterator[Optional[float]]:
+    """Deadline in `seconds` Sekunden ab jetzt (None = unverändert)."""
+    with deadline_at(None if seconds is None else time.monotonic() + seconds) as effective:
+        yield effective
+
+
+def step_budget(step: int) -> Optional[float]:
+    """Budget für Wizard-Schritt `step` (ENV-Override, sonst STEP_BUDGETS) oder None."""
+    if os.getenv("EVALUERA_DEADLINE_DISABLED") == "1":
+        return None
+    raw = os.getenv(f"EVALUERA_DEADLINE_STEP{step}_S")
+    if raw:
+        try:
+            return float(raw)
+        except ValueError:
+            safe_print(f"WARN Ungültiger Wert für EVALUERA_DEADLINE_STEP{step}_S: {raw!r}")
+    return STEP_BUDGETS.get(step)
+
+
+@contextmanager
+def step_deadline(step: int) -> Iterator[Optional[float]]:
+    """Deadline für einen Wizard-Schritt; zählt Schritte, die ihr Budget überziehen."""
+    budget = step_budget(step)
+    with deadline_in(budget) as effective:
+        try:
+            yield effective
+        finally:
+            _count(f"step{step}_opened")
+            if effective is not None and time.monotonic() > effective:
+                _count(f"step{step}_overrun")
+
+
+def with_deadline(client: Any) -> Any:
+    """
+    OpenAI-Client für den nächsten Call: Timeout = Restzeit, ohne SDK-Retries
+    (deren Backoff würde die Deadline ignorieren). Ohne Deadline unverändert.
+
+    Raises:
+        DeadlineExceeded: wenn keine Restzeit mehr bleibt
+    """
+    timeout = call_timeout()
+    if timeout is None or not hasattr(client, "with_options"):
+        return client
+    return client.with_options(timeout=timeout, max_retries=0)
+
+
+def record_fallback(what: str):
+    """Zählt eine lokale Ersatz-Antwort nach abgelaufener Deadline."""
+    _count("fallbacks", f"fallback_{what}")
+    safe_print(f"WARN Deadline abgelaufen - lokale Schätzung für {what}")
+
+
+def deadline_stats() -> Dict[str, Any]:
+    """Zähler seit Prozessstart: exceeded, fallbacks, stepN_opened/stepN_overrun."""
+    with _stats_lock:
+        return dict(_stats)
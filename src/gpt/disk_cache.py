@@ -0,0 +1,528 @@
+"""
+PERSISTENTER GPT-CACHE
+======================
+Inhaltsadressierter Disk-Cache (SQLite) für GPT-Antworten.
+
+- Überlebt Deploys und Pod-Neustarts (im Gegensatz zu st.cache_data)
+- Wird von allen Streamlit-Worker-Prozessen auf einem Host geteilt (WAL-Modus)
+- Key = stabiler Hash aus Funktion, Modell, Prompt-Version und bereinigten Argumenten
+- TTL pro Funktion, größenbegrenzte LRU-Verdrängung
+- Single-Flight: identische, gleichzeitig laufende Calls (gleicher Key) werden
+  zusammengelegt - im Prozess über ein Future, prozessübergreifend über eine
+  Lease-Zeile in der SQLite-Datei. Nur der erste Aufrufer fragt GPT.
+
+Konfiguration (ENV):
+    EVALUERA_GPT_CACHE_PATH       Pfad zur SQLite-Datei (Default: .cache/gpt_cache.sqlite3)
+    EVALUERA_GPT_CACHE_MAX_MB     Maximale Größe aller Einträge in MB (Default: 256)
+    EVALUERA_GPT_CACHE_DISABLED   "1" deaktiviert den Disk-Cache
+    EVALUERA_GPT_CACHE_TTL_<NS>   TTL-Override in Sekunden pro Namespace (z.B. ..._TTL_COST_ESTIMATE)
+    EVALUERA_GPT_SINGLEFLIGHT_LEASE  Maximale Wartezeit auf einen laufenden Call, s (Default: 180)
+    EVALUERA_GPT_SINGLEFLIGHT_DISABLED  "1" deaktiviert das Zusammenlegen
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from src.gpt.cache_metrics import record_entry_size, record_outcome
+from src.gpt.deadline import DeadlineExceeded, call_timeout, check_deadline, time_left
+from src.gpt.utils import sanitize_payload_recursive, safe_print
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DEFAULT_CACHE_PATH = os.path.join(BASE_DIR, ".cache", "gpt_cache.sqlite3")
+DEFAULT_MAX_MB = 256
+DEFAULT_LEASE_S = 180.0
+
+# last_access wird nur aktualisiert, wenn der letzte Zugriff länger her ist
+# (spart Schreibzugriffe bei vielen parallelen Lesern)
+_TOUCH_INTERVAL_S = 60.0
+
+
+def make_cache_key(namespace: str, prompt_version: str, model: Optional[str], payload: Dict[str, Any]) -> str:
+    """
+    Stabiler, inhaltsadressierter Cache-Key.
+
+    Args:
+        namespace: Funktions-Namespace (z.B. "cost_estimate")
+        prompt_version: Version des Prompts (neue Version = neue Keys)
+        model: GPT-Modell
+        payload: Bereinigte Funktionsargumente
+
+    Returns:
+        SHA-256 Hex-Digest
+    """
+    material = json.dumps(
+        {"ns": namespace, "v": prompt_version, "model": model, "args": payload},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    SQLite-Key-Value-Store mit TTL und LRU-Verdrängung.
+
+    Jeder Thread bekommt eine eigene Verbindung; parallele Prozesse
+    synchronisieren über SQLite-Locks (WAL + busy_timeout).
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._init_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL,
+                last_access REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_namespace ON entries(namespace)")
+        # Laufende Berechnungen (Single-Flight über Prozessgrenzen)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS inflight (
+                key TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+
+    def get(self, key: str) -> Optional[Any]:
+        """Liefert den gespeicherten Wert oder None (fehlend/abgelaufen)."""
+        now = time.time()
+        row = self._conn().execute(
+            "SELECT value, expires_at, last_access FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at, last_access = row
+        if expires_at is not None and expires_at < now:
+            self.delete(key)
+            return None
+        if now - last_access > _TOUCH_INTERVAL_S:
+            self._conn().execute(
+                "UPDATE entries SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+        try:
+            return json.loads(value)
+        except Exception:
+            self.delete(key)
+            return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, namespace: str = "default") -> int:
+        """
+        Speichert einen JSON-serialisierbaren Wert.
+
+        Returns:
+            Größe des Eintrags in Bytes, 0 wenn nicht serialisierbar oder zu groß
+        """
+        try:
+            encoded = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return 0
+        now = time.time()
+        size = len(encoded.encode("utf-8"))
+        if size > self.max_bytes:
+            return 0
+        expires_at = now + ttl if ttl else None
+        self._conn().execute(
+            """
+            INSERT OR REPLACE INTO entries (key, namespace, value, size, created_at, expires_at, last_access, hits)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 0)
+            """,
+            (key, namespace, encoded, size, now, expires_at, now),
+        )
+        self._evict_if_needed()
+        return size
+
+    def delete(self, key: str):
+        self._conn().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self, namespace: Optional[str] = None):
+        """Löscht alle Einträge (optional nur eines Namespace)."""
+        if namespace:
+            self._conn().execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+        else:
+            self._conn().execute("DELETE FROM entries")
+
+    def purge_expired(self) -> int:
+        cur = self._conn().execute(
+            "DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+        )
+        return cur.rowcount or 0
+
+    def total_size(self) -> int:
+        row = self._conn().execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return int(row[0] or 0)
+
+    def _evict_if_needed(self):
+        """LRU-Verdrängung: löscht die am längsten ungenutzten Einträge bis 90% des Limits."""
+        total = self.total_size()
+        if total <= self.max_bytes:
+            return
+        self.purge_expired()
+        total = self.total_size()
+        target = int(self.max_bytes * 0.9)
+        conn = self._conn()
+        while total > target:
+            rows = conn.execute(
+                "SELECT key, size FROM entries ORDER BY last_access ASC LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+                if total <= target:
+                    break
+
+    def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        """
+        Reserviert die Berechnung für `key`. True = dieser Aufrufer rechnet;
+        False = ein anderer Prozess/Thread hält eine gültige Lease.
+        Abgelaufene Leases (z.B. abgestürzter Prozess) werden übernommen.
+        """
+        now = time.time()
+        conn = self._conn()
+        conn.execute("DELETE FROM inflight WHERE key = ? AND expires_at < ?", (key, now))
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO inflight (key, owner, expires_at) VALUES (?, ?, ?)",
+            (key, owner, now + ttl),
+        )
+        return cur.rowcount == 1
+
+    def release_lease(self, key: str, owner: str):
+        self._conn().execute("DELETE FROM inflight WHERE key = ? AND owner = ?", (key, owner))
+
+    def lease_active(self, key: str) -> bool:
+        row = self._conn().execute(
+            "SELECT 1 FROM inflight WHERE key = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def stats(self) -> Dict[str, Any]:
+        """Anzahl/Größe der Einträge pro Namespace."""
+        rows = self._conn().execute(
+            "SELECT namespace, COUNT(*), COALESCE(SUM(size), 0) FROM entries GROUP BY namespace"
+        ).fetchall()
+        per_ns = {ns: {"entries": n, "bytes": b} for ns, n, b in rows}
+        return {
+            "path": self.path,
+            "max_bytes": self.max_bytes,
+            "total_bytes": sum(v["bytes"] for v in per_ns.values()),
+            "namespaces": per_ns,
+        }
+
+
+_disk_cache: Optional[DiskCache] = None
+_disk_cache_lock = threading.Lock()
+
+
+def get_disk_cache() -> Optional[DiskCache]:
+    """Prozessweite DiskCache-Instanz (None wenn deaktiviert oder nicht verfügbar)."""
+    global _disk_cache
+    if os.getenv("EVALUERA_GPT_CACHE_DISABLED") == "1":
+        return None
+    if _disk_cache is None:
+        with _disk_cache_lock:
+            if _disk_cache is None:
+                try:
+                    max_mb = float(os.getenv("EVALUERA_GPT_CACHE_MAX_MB", DEFAULT_MAX_MB))
+                    _disk_cache = DiskCache(
+                        path=os.getenv("EVALUERA_GPT_CACHE_PATH", DEFAULT_CACHE_PATH),
+                        max_bytes=int(max_mb * 1024 * 1024),
+                    )
+                except Exception as e:
+                    safe_print(f"WARN Disk-Cache nicht verfügbar: {e!r}")
+                    return None
+    return _disk_cache
+
+
+def _is_cacheable(result: Any) -> bool:
+    """Fehler, Fallbacks und leere Ergebnisse werden nicht persistiert."""
+    if result is None:
+        return False
+    if isinstance(result, dict):
+        if not result or result.get("_error") or result.get("_fallback"):
+            return False
+        return "error" not in result and result.get("ok") is not False
+    if isinstance(result, (list, tuple)):
+        return len(result) > 0
+    return True
+
+
+def _resolve_ttl(namespace: str, default: Optional[float]) -> Optional[float]:
+    override = os.getenv(f"EVALUERA_GPT_CACHE_TTL_{namespace.upper()}")
+    if override:
+        try:
+            return float(override)
+        except ValueError:
+            pass
+    return default
+
+
+# ==================== SINGLE-FLIGHT ====================
+
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+_flight_stats = {"leader": 0, "coalesced_local": 0, "coalesced_remote": 0, "lease_timeouts": 0,
+                "releads": 0}
+_flight_stats_lock = threading.Lock()
+
+
+def _count(name: str):
+    with _flight_stats_lock:
+        _flight_stats[name] += 1
+
+
+def single_flight_stats() -> Dict[str, int]:
+    """Ausgeführte vs. zusammengelegte Calls seit Prozessstart."""
+    with _flight_stats_lock:
+        return dict(_flight_stats, in_flight=len(_inflight))
+
+
+def _lease_seconds() -> float:
+    try:
+        return float(os.getenv("EVALUERA_GPT_SINGLEFLIGHT_LEASE", DEFAULT_LEASE_S))
+    except ValueError:
+        return DEFAULT_LEASE_S
+
+
+def _compute_and_store(cache: DiskCache, key: str, namespace: str, ttl: Optional[float],
+                       compute: Callable[[], Any]) -> Any:
+    result = compute()
+    record_outcome("miss")
+    if _is_cacheable(result):
+        try:
+            size = cache.set(key, result, ttl=_resolve_ttl(namespace, ttl), namespace=namespace)
+            if size:
+                record_entry_size(namespace, size)
+        except sqlite3.Error as e:
+            safe_print(f"WARN Disk-Cache Schreibfehler ({namespace}): {e!r}")
+    return result
+
+
+def _lead(cache: DiskCache, key: str, namespace: str, ttl: Optional[float],
+          compute: Callable[[], Any]) -> Any:
+    """
+    Rechnet als Leader - oder wartet, solange ein anderer Prozess die Lease hält,
+    und liest dann dessen Ergebnis aus dem Cache.
+    """
+    owner = f"{os.getpid()}:{threading.get_ident()}"
+    lease = _lease_seconds()
+    give_up_at = time.monotonic() + lease
+    poll = 0.1
+    while True:
+        try:
+            leased = cache.acquire_lease(key, owner, lease)
+        except sqlite3.Error as e:
+            safe_print(f"WARN Single-Flight Lease-Fehler ({namespace}): {e!r}")
+            return _compute_and_store(cache, key, namespace, ttl, compute)
+
+        if leased:
+            try:
+                # Double-Check: der vorherige Leader kann gerade fertig geworden sein
+                cached = cache.get(key)
+                if cached is not None:
+                    _count("coalesced_remote")
+                    record_outcome("coalesced")
+                    return cached
+                _count("leader")
+                return _compute_and_store(cache, key, namespace, ttl, compute)
+            finally:
+                try:
+                    cache.release_lease(key, owner)
+                except sqlite3.Error:
+                    pass
+
+        check_deadline("Single-Flight")
+        time.sleep(poll)
+        poll = min(poll * 2, 1.0)
+        try:
+            cached = cache.get(key)
+        except sqlite3.Error:
+            cached = None
+        if cached is not None:
+            _count("coalesced_remote")
+            record_outcome("coalesced")
+            return cached
+        if time.monotonic() >= give_up_at:
+            _count("lease_timeouts")
+            return _compute_and_store(cache, key, namespace, ttl, compute)
+        # Lease freigegeben, aber kein Ergebnis (Fehler beim Leader) → nächste Runde selbst übernehmen
+
+
+def _release_inflight(key: str):
+    with _inflight_lock:
+        _inflight.pop(key, None)
+
+
+def _single_flight(cache: DiskCache, key: str, namespace: str, ttl: Optional[float],
+                   compute: Callable[[], Any]) -> Any:
+    """Genau ein Thread pro Prozess und Key führt _lead aus, die übrigen warten auf sein Future."""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+
+    if not leader:
+        try:
+            result = future.result(timeout=call_timeout(_lease_seconds(), "Single-Flight"))
+        except DeadlineExceeded:
+            # Deadline des Leaders abgelaufen - mit eigener Restzeit selbst übernehmen
+            left = time_left()
+            if left is not None and left <= 0:
+                raise
+            _count("releads")
+            return _single_flight(cache, key, namespace, ttl, compute)
+        except FutureTimeout:
+            # Eigene Schritt-Deadline abgelaufen → DeadlineExceeded, sonst Lease abgelaufen → selbst rechnen
+            check_deadline("Single-Flight", grace=0.1)
+            _count("lease_timeouts")
+            return _compute_and_store(cache, key, namespace, ttl, compute)
+        _count("coalesced_local")
+        record_outcome("coalesced")
+        return result
+
+    # Key vor dem Auflösen des Futures freigeben: wartende Follower, die neu
+    # übernehmen, sollen nicht erneut auf dieses (fertige) Future treffen
+    try:
+        result = _lead(cache, key, namespace, ttl, compute)
+    except BaseException as e:
+        _release_inflight(key)
+        future.set_exception(e)
+        raise
+    _release_inflight(key)
+    future.set_result(result)
+    return result
+
+
+def disk_cached(namespace: str, ttl: Optional[float], model: Optional[str] = None,
+                prompt_version: str = "1", ignore: Iterable[str] = ()) -> Callable:
+    """
+    Decorator: persistiert Funktionsergebnisse im Disk-Cache.
+
+    Args:
+        namespace: Funktions-Namespace (Teil des Keys, Basis für TTL-Override)
+        ttl: Lebensdauer in Sekunden (None = unbegrenzt, nur LRU)
+        model: GPT-Modell (Teil des Keys)
+        prompt_version: Prompt-Version (Teil des Keys)
+        ignore: Argumentnamen, die nicht in den Key eingehen (z.B. Rohbytes)
+    """
+    ignored = set(ignore)
+
+    def decorator(fn: Callable) -> Callable:
+        sig = inspect.signature(fn)
+
+        def cache_key(*args, **kwargs) -> str:
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            payload = {
+                k: sanitize_payload_recursive(v)
+                for k, v in bound.arguments.items()
+                if k not in ignored
+            }
+            return make_cache_key(namespace, prompt_version, model, payload)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            cache = get_disk_cache()
+            if cache is None:
+                record_outcome("miss")
+                return fn(*args, **kwargs)
+
+            key = cache_key(*args, **kwargs)
+
+            try:
+                cached = cache.get(key)
+            except sqlite3.Error as e:
+                safe_print(f"WARN Disk-Cache Lesefehler ({namespace}): {e!r}")
+                cached = None
+            if cached is not None:
+                record_outcome("disk_hit")
+                return cached
+
+            compute = functools.partial(fn, *args, **kwargs)
+            if os.getenv("EVALUERA_GPT_SINGLEFLIGHT_DISABLED") == "1":
+                return _compute_and_store(cache, key, namespace, ttl, compute)
+            return _single_flight(cache, key, namespace, ttl, compute)
+
+        wrapper.cache_namespace = namespace
+        wrapper.cache_key = cache_key
+        wrapper.cache_ttl = ttl
+        _registry[namespace] = wrapper
+        return wrapper
+
+    return decorator
+
+
+# ==================== DIREKTZUGRIFF (BATCH) ====================
+# Für Batch-Calls, die mehrere Einträge eines Namespace in einem GPT-Request
+# berechnen: Lesen/Schreiben unter exakt dem Key, den der Einzel-Call verwenden würde.
+
+_registry: Dict[str, Callable] = {}
+
+
+def disk_lookup(namespace: str, *args, **kwargs) -> Optional[Any]:
+    """Eintrag der mit disk_cached(namespace) dekorierten Funktion für diese Argumente."""
+    cache = get_disk_cache()
+    wrapper = _registry.get(namespace)
+    if cache is None or wrapper is None:
+        return None
+    try:
+        return cache.get(wrapper.cache_key(*args, **kwargs))
+    except sqlite3.Error as e:
+        safe_print(f"WARN Disk-Cache Lesefehler ({namespace}): {e!r}")
+        return None
+
+
+def disk_store(namespace: str, result: Any, *args, **kwargs) -> bool:
+    """Speichert ein extern berechnetes Ergebnis, als hätte der Einzel-Call es geliefert."""
+    cache = get_disk_cache()
+    wrapper = _registry.get(namespace)
+    if cache is None or wrapper is None or not _is_cacheable(result):
+        return False
+    try:
+        size = cache.set(wrapper.cache_key(*args, **kwargs), result,
+                         ttl=_resolve_ttl(namespace, wrapper.cache_ttl), namespace=namespace)
+    except sqlite3.Error as e:
+        safe_print(f"WARN Disk-Cache Schreibfehler ({namespace}): {e!r}")
+        return False
+    if size:
+        record_entry_size(namespace, size)
+    return bool(size)
@@ -2,6 +2,8 @@ import os, json, math
 import pandas as pd
 from dotenv import load_dotenv
 from src.gpt.utils import sanitize_input, sanitize_payload_recursive, safe_gpt_request, safe_print
+from src.gpt.client import get_openai_client
+from src.gpt.deadline import DeadlineExceeded, record_fallback, with_deadline
 load_dotenv()
 
 def _safe_float(x, d=None):
@@ -17,12 +19,15 @@ def route_scenarios_with_gpt(item_text, material, d_mm, l_mm, lot_sizes):
         for ls in lot_sizes:
             out.append({"label":"Heuristik CNC-Drehen","primary":{"name":"turning","setup_time_min":20,"cycle_time_s":6.0,"machine_eur_h":80,"labor_eur_h":35,"overhead_pct":0.2},"secondary_ops":[],"lot_size":int(ls)})
         return out
-    from openai import OpenAI
-    client=OpenAI(api_key=key)
+    client=get_openai_client(key)
     sys="Du erstellst 3 bis 5 alternative Fertigungsszenarien für das Teil. Antworte ausschließlich als JSON-Array. Jedes Szenario: {label, primary:{name,setup_time_min,cycle_time_s,machine_eur_h,labor_eur_h,overhead_pct}, secondary_ops:[{name,cycle_time_s,machine_eur_h,labor_eur_h}], lot_size}."
     user=f"Bezeichnung: {item_text}\nMaterial: {material}\nD_mm: {d_mm}\nL_mm: {l_mm}\nLosgrößen: {list(map(int,lot_sizes))}\nErzeuge realistische Szenarien wie cold_forming, warm_forging, turning, machining, stamping. Sekundäre Operationen nur falls plausibel. Parameter realistisch in EU-üblichen Spannen."
-    r=client.chat.completions.create(model="gpt-4o-mini",temperature=0,messages=[{"role":"system","content":sys},{"role":"user","content":user}])
-    txt=r.choices[0].message.content.strip()
+    try:
+        r=with_deadline(client).chat.completions.create(model="gpt-4o-mini",temperature=0,messages=[{"role":"system","content":sys},{"role":"user","content":user}])
+    except DeadlineExceeded:
+        record_fallback("route_scenarios")
+        r=None
+    txt=r.choices[0].message.content.strip() if r else ""
     try:
         arr=json.loads(txt)
         out=[]
@@ -61,14 +66,14 @@ def calc_route_cost_per_unit(route, lot_size):
         cost += (float(op.get("cycle_time_s",0))/3600.0)*(float(op.get("machine_eur_h",0))+float(op.get("labor_eur_h",0)))
     return cost
 
-def supplier_scores(idf, qty_col, price_series):
+def supplier_scores(idf, qty_col, price_series, schema=None):
     df=idf.copy()
     if price_series is not None:
         df["_unit_price"]=price_series
-    grp_cols=[c for c in df.columns if str(c).lower() in ("supplier","lieferant","anbieter","vendor","firma")]
-    ctry_cols=[c for c in df.columns if str(c).lower() in ("country","land","herkunft","ursprung","origin")]
-    by=grp_cols + ctry_cols
-    by=[b for b in by if b in df.columns]
+    if schema is None:
+        from src.core.dataset_schema import infer_schema
+        schema=infer_schema(idf)
+    by=[b for b in (schema.supplier, schema.country) if b is not None and b in df.columns]
     if not by:
         by=[df.columns[0]]
     if qty_col and qty_col in df.columns:
@@ -76,7 +81,7 @@ def supplier_scores(idf, qty_col, price_series):
     else:
         q=pd.Series(1,index=df.index,dtype="float64")
     p=pd.to_numeric(df.get("_unit_price",pd.Series(index=df.index,dtype="float64")),errors="coerce")
-    agg=df.assign(_q=q,_p=p).groupby(by,dropna=False).agg(avg_price=("_p","mean"), std_price=("_p","std"), n=(" _p","count") if " _p" in df.columns else ("_p","count"), qty_total=("_q","sum")).reset_index()
+    agg=df.assign(_q=q,_p=p).groupby(by,dropna=False,observed=True).agg(avg_price=("_p","mean"), std_price=("_p","std"), n=(" _p","count") if " _p" in df.columns else ("_p","count"), qty_total=("_q","sum")).reset_index()
     agg["cv"]=agg["std_price"]/agg["avg_price"]
     agg["risk"]=agg["cv"].fillna(0)*0.6 + (1.0/agg["qty_total"].replace(0,1))*0.4
     return agg
@@ -85,11 +90,14 @@ def translate_query_with_gpt(headers, prompt):
     key=os.getenv("OPENAI_API_KEY")
     if not key or not prompt or not prompt.strip():
         return {}
-    from openai import OpenAI
-    client=OpenAI(api_key=key)
+    client=get_openai_client(key)
     sys="Du übersetzt eine deutsche Freitext-Abfrage in Filterregeln gegen ein Tabellen-DataFrame. Antworte nur als kompaktes JSON mit Feldern wie {contains:{col:text}, range:{col:[min,max]}, equals:{col:value}}. Nutze nur vorhandene Spaltennamen."
     user=f"Spalten: {headers}\nAbfrage: {prompt}"
-    r=client.chat.completions.create(model="gpt-4o-mini",temperature=0,messages=[{"role":"system","content":sys},{"role":"user","content":user}])
+    try:
+        r=with_deadline(client).chat.completions.create(model="gpt-4o-mini",temperature=0,messages=[{"role":"system","content":sys},{"role":"user","content":user}])
+    except DeadlineExceeded:
+        record_fallback("query_filter")
+        return {}
     txt=r.choices[0].message.content.strip()
     try:
         return json.loads(txt)
@@ -155,9 +163,10 @@ def gpt_intelligent_article_search(query, item_column_values):
         return []
 
     # Limit zu max 1000 Artikel für bessere Recall
+    # (für große Datensätze: search_articles() mit lokalem Index vorschalten)
     sample_items = list(item_column_values)[:1000]
-
-    from openai import OpenAI
+    if len(item_column_values) > len(sample_items):
+        safe_print(f"WARN GPT Artikel-Suche: nur {len(sample_items)} von {len(item_column_values)} Artikeln geprüft")
 
     system_prompt = """Du bist ein intelligenter Artikel-Such-Assistent für technische Teile.
 
@@ -196,11 +205,15 @@ WICHTIG: Finde ALLE Varianten, auch mit unterschiedlichen Längen/Größen!"""
         res = safe_gpt_request(
             model="gpt-4o-mini",
             messages=messages,
-            client_factory=lambda: OpenAI(api_key=key),
+            function="article_search",
+            client_factory=lambda: get_openai_client(key),
             temperature=0.3,
             max_tokens=500,
             retries=0,
         )
+        if res.get("_stage") == "deadline":
+            # Nicht als leeres Ergebnis cachen - search_articles nimmt die lokale Shortlist
+            raise DeadlineExceeded(res.get("error", "Artikel-Suche: Zeitbudget aufgebraucht"))
         if res.get("_error"):
             safe_print(f"GPT Artikel-Suche fehlgeschlagen: {res}")
             return []
@@ -221,7 +234,49 @@ WICHTIG: Finde ALLE Varianten, auch mit unterschiedlichen Längen/Größen!"""
         safe_print(f"GPT Intelligente Suche: '{query}' → {len(valid_indices)} Treffer gefunden")
         return valid_indices
 
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         safe_print(f"⚠️ GPT Artikel-Suche fehlgeschlagen: {e!r}")
         # Fallback: Einfache String-Suche
         return []
+
+def search_articles(query, index, top_k=50, use_gpt_rerank=False):
+    """
+    Artikel-Suche über den lokalen Index (src.core.article_index).
+
+    Der Index liefert die Kandidaten (Millisekunden, alle Artikel);
+    GPT sortiert optional nur die Top-K-Kandidaten nach.
+
+    Args:
+        query: Suchanfrage (z.B. "DIN933 M12")
+        index: ArticleIndex über die Artikelbezeichnungen
+        top_k: Maximale Anzahl Kandidaten
+        use_gpt_rerank: Shortlist zusätzlich von GPT bewerten lassen
+
+    Returns:
+        Liste der passenden Positionen in index.items, bestes Ergebnis zuerst
+    """
+    if not query or not str(query).strip():
+        return []
+    shortlist = index.search(query, top_k=top_k)
+    if not use_gpt_rerank or len(shortlist) < 2:
+        return shortlist
+
+    from src.gpt.cache import cached_gpt_article_search
+    names = [str(index.items[i]) for i in shortlist]
+    try:
+        picked = cached_gpt_article_search(query, json.dumps(names, ensure_ascii=False))
+    except DeadlineExceeded:
+        record_fallback("article_search")
+        picked = []
+    except Exception as e:
+        safe_print(f"⚠️ GPT Nachsortierung fehlgeschlagen: {e!r}")
+        picked = []
+    if not picked:
+        return shortlist
+
+    # GPT-Treffer zuerst (in GPT-Reihenfolge), restliche Kandidaten dahinter
+    preferred = [shortlist[i] for i in dict.fromkeys(picked) if 0 <= i < len(shortlist)]
+    chosen = set(preferred)
+    return preferred + [i for i in shortlist if i not in chosen]
@@ -0,0 +1,207 @@
+"""
+HEDGED REQUESTS
+===============
+Gegen einzelne hängende OpenAI-Requests (p99 ≫ Median):
+
+    t=0        Request A läuft
+    t=p90      A noch nicht fertig → identischer Request B
+    t=...      erste erfolgreiche Antwort gewinnt, der andere wird abgebrochen
+
+Nur für idempotente Calls mit temperature=0 (gleiche Anfrage → gleiche Antwort)
+und nur auf Wunsch: safe_gpt_request(..., hedge=True, function="...").
+Beide Requests laufen als Tasks auf der GPT-Loop (src.gpt.async_exec), der
+Verlierer wird per Task-Abbruch beendet (HTTP-Request wird geschlossen).
+
+Budget: jeder gehedgte Aufruf einer Funktion spart EVALUERA_HEDGE_BUDGET Tokens
+an (max. _BUDGET_BURST), ein Hedge verbraucht einen - die Zusatz-Requests sind
+so auf diesen Anteil der Requests begrenzt.
+
+Latenz-Perzentile (p50/p90/p99) werden für JEDEN safe_gpt_request je Funktion
+erfasst, auch ohne Hedging (hedge_stats()).
+
+Konfiguration (ENV):
+    EVALUERA_HEDGE_DISABLED       "1" = nie hedgen (Perzentile werden weiter erfasst)
+    EVALUERA_HEDGE_PERCENTILE     Hedge-Schwelle als Perzentil (Default: 90)
+    EVALUERA_HEDGE_BUDGET         Max. Anteil zusätzlicher Requests je Funktion (Default: 0.05)
+    EVALUERA_HEDGE_MIN_SAMPLES    Latenz-Samples, bevor gehedgt wird (Default: 20)
+    EVALUERA_HEDGE_MIN_DELAY_S    Untergrenze der Hedge-Schwelle in s (Default: 0.5)
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+from src.gpt.async_exec import safe_gpt_request_async
+from src.gpt.utils import safe_print
+
+DEFAULT_PERCENTILE = 90.0
+DEFAULT_BUDGET = 0.05
+DEFAULT_MIN_SAMPLES = 20
+DEFAULT_MIN_DELAY_S = 0.5
+# Gleitendes Fenster je Funktion
+_WINDOW = 512
+# Max. angesparte Hedges je Funktion (kleiner Burst nach ruhiger Phase)
+_BUDGET_BURST = 2.0
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        safe_print(f"WARN Ungültiger Wert für {name}: {os.getenv(name)!r}")
+        return default
+
+
+class LatencyWindow:
+    """Die letzten _WINDOW Latenzen einer Funktion."""
+
+    def __init__(self, size: int = _WINDOW):
+        self._values: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._values.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Nearest-Rank-Perzentil (None ohne Samples)."""
+        with self._lock:
+            values = sorted(self._values)
+        if not values:
+            return None
+        rank = max(1, math.ceil(p / 100.0 * len(values)))
+        return values[rank - 1]
+
+
+_lock = threading.Lock()
+# Vom Aufrufer erlebte Latenz (inkl. Hedge-Gewinn)
+_latency: Dict[str, LatencyWindow] = defaultdict(LatencyWindow)
+# Latenz des ersten Requests (bei Abbruch: Untergrenze) - Basis der Hedge-Schwelle
+_primary: Dict[str, LatencyWindow] = defaultdict(LatencyWindow)
+_budget: Dict[str, float] = defaultdict(lambda: 1.0)
+_stats: Dict[str, Counter] = defaultdict(Counter)
+
+
+def _window(table: Dict[str, LatencyWindow], function: str) -> LatencyWindow:
+    with _lock:
+        return table[function]
+
+
+def record_latency(function: str, seconds: float, primary: Optional[float] = None):
+    """Erfasst eine erfolgreiche Anfrage (primary = Latenz des ersten Requests, falls abweichend)."""
+    _window(_latency, function).add(seconds)
+    _window(_primary, function).add(seconds if primary is None else primary)
+    with _lock:
+        _stats[function]["requests"] += 1
+
+
+def hedge_delay(function: str) -> Optional[float]:
+    """Wartezeit bis zum Hedge (beobachtetes Perzentil) oder None (zu wenig Daten/deaktiviert)."""
+    if os.getenv("EVALUERA_HEDGE_DISABLED") == "1":
+        return None
+    window = _window(_primary, function)
+    if len(window) < int(_env_float("EVALUERA_HEDGE_MIN_SAMPLES", DEFAULT_MIN_SAMPLES)):
+        return None
+    threshold = window.percentile(_env_float("EVALUERA_HEDGE_PERCENTILE", DEFAULT_PERCENTILE))
+    return max(threshold, _env_float("EVALUERA_HEDGE_MIN_DELAY_S", DEFAULT_MIN_DELAY_S))
+
+
+def _accrue_budget(function: str):
+    with _lock:
+        _budget[function] = min(_BUDGET_BURST, _budget[function] + _env_float("EVALUERA_HEDGE_BUDGET", DEFAULT_BUDGET))
+
+
+def _take_budget(function: str) -> bool:
+    with _lock:
+        if _budget[function] >= 1.0:
+            _budget[function] -= 1.0
+            return True
+        _stats[function]["budget_denied"] += 1
+        return False
+
+
+def hedge_eligible(kwargs: Dict[str, Any]) -> bool:
+    """Nur deterministische, nicht gestreamte Calls dürfen doppelt laufen."""
+    return kwargs.get("temperature") == 0 and not kwargs.get("stream") and kwargs.get("n", 1) == 1
+
+
+async def hedged_request_async(function: str, model: str, messages: Any,
+                               client_factory: Optional[Callable[[], Any]] = None,
+                               retries: int = 0, **kwargs) -> Dict[str, Any]:
+    """
+    safe_gpt_request_async mit Hedge nach der beobachteten Perzentil-Latenz.
+
+    Returns:
+        Ergebnis-Vertrag von safe_gpt_request_async, plus "_hedged"/"_hedge_won"
+        wenn ein zweiter Request lief
+    """
+    _accrue_budget(function)
+    delay = hedge_delay(function)
+    started = time.monotonic()
+    primary = asyncio.ensure_future(safe_gpt_request_async(model, messages, client_factory, retries, **kwargs))
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+    except asyncio.CancelledError:
+        primary.cancel()
+        raise
+    if done or not _take_budget(function):
+        result = await primary
+        if not result.get("_error"):
+            record_latency(function, time.monotonic() - started)
+        return result
+
+    with _lock:
+        _stats[function]["hedged"] += 1
+    safe_print(f"INFO Hedge {function}: {model} nach {delay:.1f}s ohne Antwort → zweiter Request")
+    hedge = asyncio.ensure_future(safe_gpt_request_async(model, messages, client_factory, 0, **kwargs))
+    pending = {primary, hedge}
+    winner, result = None, None
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                outcome = task.result()
+                if not outcome.get("_error"):
+                    winner, result = task, outcome
+                    break
+                result = result or outcome
+    finally:
+        for task in pending:
+            task.cancel()
+
+    elapsed = time.monotonic() - started
+    if winner is not None:
+        # Primär-Latenz: echt, wenn er gewann - sonst Untergrenze (abgebrochen)
+        record_latency(function, elapsed, primary=elapsed)
+        with _lock:
+            _stats[function]["hedge_won" if winner is hedge else "primary_won"] += 1
+        result = dict(result, _hedged=True, _hedge_won=winner is hedge)
+    return result
+
+
+def hedge_stats() -> Dict[str, Dict[str, Any]]:
+    """Je Funktion: Requests, Hedges, Gewinne, Budget-Ablehnungen, p50/p90/p99 (Sekunden)."""
+    with _lock:
+        functions = sorted(set(_stats) | set(_latency))
+        counters = {name: dict(_stats[name]) for name in functions}
+    out = {}
+    for name in functions:
+        window = _window(_latency, name)
+        c = counters[name]
+        out[name] = {
+            "requests": c.get("requests", 0),
+            "hedged": c.get("hedged", 0),
+            "hedge_rate": c.get("hedged", 0) / max(c.get("requests", 0), 1),
+            "hedge_won": c.get("hedge_won", 0),
+            "budget_denied": c.get("budget_denied", 0),
+            **{f"p{p}": (round(v, 3) if (v := window.percentile(p)) is not None else None) for p in (50, 90, 99)},
+            "samples": len(window),
+        }
+    return out
@@ -0,0 +1,106 @@
+"""
+INKREMENTELLER JSON-PARSER
+==========================
+Liest eine gestreamte GPT-Antwort (JSON-Objekt, optional in ```json-Fences)
+Stück für Stück und meldet jeden Top-Level-Key, sobald sein Wert vollständig ist.
+
+    parser = TopLevelJSONStream()
+    for chunk in stream:
+        for key, value in parser.feed(chunk):
+            render(key, value)
+
+Verschachtelte Werte werden erst als Ganzes geliefert (ein Abschnitt = ein Key).
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.gpt.utils import safe_print
+
+
+class TopLevelJSONStream:
+    """Zustandsautomat über die Zeichen des Top-Level-Objekts."""
+
+    def __init__(self):
+        self.text = ""
+        self.values: Dict[str, Any] = {}
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect = "key"          # key | colon | value
+        self._token_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Hängt Text an und liefert die dabei fertig gewordenen (Key, Wert)-Paare."""
+        self.text += chunk or ""
+        completed: List[Tuple[str, Any]] = []
+        text = self.text
+        while self._pos < len(text) and not self.done:
+            i = self._pos
+            ch = text[i]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expect == "key":
+                        self._key = json.loads(text[self._token_start:i + 1])
+                        self._expect = "colon"
+                continue
+
+            if self._depth == 0:
+                # Alles vor dem ersten "{" (z.B. ```json) überspringen
+                if ch == "{":
+                    self._depth = 1
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect == "key":
+                    self._token_start = i
+                elif self._depth == 1 and self._value_start is None:
+                    self._value_start = i
+                continue
+
+            if self._depth == 1:
+                if self._expect == "colon":
+                    if ch == ":":
+                        self._expect = "value"
+                        self._value_start = None
+                    continue
+                if self._expect == "value" and ch in ",}":
+                    self._finish_value(text[self._value_start:i] if self._value_start is not None else "",
+                                       completed)
+                    self._expect = "key"
+                    if ch == "}":
+                        self._depth = 0
+                        self.done = True
+                    continue
+                if self._expect == "value" and self._value_start is None and not ch.isspace():
+                    self._value_start = i
+
+            if ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+        return completed
+
+    def _finish_value(self, raw: str, completed: List[Tuple[str, Any]]):
+        key, self._key, self._value_start = self._key, None, None
+        if key is None:
+            return
+        try:
+            value = json.loads(raw)
+        except ValueError as e:
+            safe_print(f"WARN Stream-JSON: Wert für '{key}' nicht lesbar: {e}")
+            return
+        self.values[key] = value
+        completed.append((key, value))
@@ -0,0 +1,429 @@
+"""
+OPENAI RATE-LIMITER
+===================
+Prozessweiter Scheduler für OpenAI-Requests mit Token-Buckets je Modell
+(Requests/Minute und Tokens/Minute).
+
+- Prompt-Tokens werden vor dem Senden geschätzt (tiktoken, falls installiert,
+  sonst ~4 Zeichen/Token) plus max_tokens der Antwort
+- Wartende Requests werden fair über Sessions verteilt (Round-Robin je
+  Streamlit-Session, FIFO innerhalb einer Session)
+- 429-Antworten pausieren das Modell für Retry-After; die x-ratelimit-*-Header
+  jeder Antwort gleichen die lokalen Buckets mit dem Server-Stand ab
+- scheduler_stats() liefert Queue-Tiefe und Wartezeiten je Modell
+
+Greift auf Transport-Ebene der geteilten Clients (src.gpt.client), gilt also
+für alle Calls - auch die direkten client.chat.completions.create-Aufrufe.
+
+Konfiguration (ENV):
+    EVALUERA_OPENAI_RPM[_<MODELL>]     Requests/Minute (Default: 500; 0 = unbegrenzt)
+    EVALUERA_OPENAI_TPM[_<MODELL>]     Tokens/Minute (Default gpt-4o: 30000, gpt-4o-mini: 200000; 0 = unbegrenzt)
+    EVALUERA_OPENAI_MAX_QUEUE_WAIT     Maximale Wartezeit in der Queue, s (Default: 120)
+"""
+
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import tiktoken
+except Exception:
+    tiktoken = None
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except Exception:
+    get_script_run_ctx = None
+
+from src.gpt.utils import safe_print
+
+DEFAULT_RPM = 500
+DEFAULT_TPM = {"gpt-4o-mini": 200_000, "gpt-4o": 30_000}
+DEFAULT_TPM_OTHER = 30_000
+DEFAULT_MAX_QUEUE_WAIT = 120.0
+# Aufschlag je Message (Rollen-/Trenn-Tokens) und Pauschale je Bild
+_TOKENS_PER_MESSAGE = 4
+_TOKENS_PER_IMAGE = 765
+
+# Session für Aufrufe ohne Streamlit-Kontext (z.B. Async-Loop, siehe async_exec)
+current_session: contextvars.ContextVar = contextvars.ContextVar("evaluera_gpt_session", default=None)
+
+
+class QueueTimeout(Exception):
+    """Request hat länger als EVALUERA_OPENAI_MAX_QUEUE_WAIT auf Budget gewartet."""
+
+
+def _model_env(prefix: str, model: str) -> Optional[str]:
+    suffix = re.sub(r"[^A-Z0-9]+", "_", (model or "").upper()).strip("_")
+    return os.getenv(f"{prefix}_{suffix}") or os.getenv(prefix)
+
+
+def _limit(prefix: str, model: str, default: int) -> int:
+    raw = _model_env(prefix, model)
+    if raw:
+        try:
+            return max(0, int(raw))
+        except ValueError:
+            safe_print(f"WARN Ungültiger Wert für {prefix}: {raw!r}")
+    return default
+
+
+def _default_tpm(model: str) -> int:
+    # Längster Präfix zuerst: "gpt-4o-mini-2024-07-18" → gpt-4o-mini
+    for name in sorted(DEFAULT_TPM, key=len, reverse=True):
+        if (model or "").startswith(name):
+            return DEFAULT_TPM[name]
+    return DEFAULT_TPM_OTHER
+
+
+def max_queue_wait() -> float:
+    try:
+        return float(os.getenv("EVALUERA_OPENAI_MAX_QUEUE_WAIT", DEFAULT_MAX_QUEUE_WAIT))
+    except ValueError:
+        return DEFAULT_MAX_QUEUE_WAIT
+
+
+def current_session_id() -> str:
+    """Streamlit-Session des aufrufenden Threads (bzw. aus current_session)."""
+    sid = current_session.get()
+    if sid:
+        return sid
+    if get_script_run_ctx is not None:
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is not None:
+            return ctx.session_id
+    return "anonymous"
+
+
+# ==================== TOKEN-SCHÄTZUNG ====================
+
+_encodings: Dict[str, Any] = {}
+
+
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    enc = _encodings.get(model)
+    if enc is None:
+        try:
+            enc = tiktoken.encoding_for_model(model)
+        except Exception:
+            enc = tiktoken.get_encoding("o200k_base")
+        _encodings[model] = enc
+    return enc
+
+
+def _count_text(text: str, model: str) -> int:
+    enc = _encoding(model)
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def estimate_tokens(model: str, messages: Any, max_tokens: Optional[int] = None) -> int:
+    """
+    Schätzt den Token-Verbrauch eines Chat-Requests (Prompt + maximale Antwort).
+
+    Ohne max_tokens wird für die Antwort pauschal 1/4 des Prompts angesetzt.
+    """
+    prompt = 3
+    for msg in messages or []:
+        prompt += _TOKENS_PER_MESSAGE
+        content = msg.get("content") if isinstance(msg, dict) else msg
+        if isinstance(content, str):
+            prompt += _count_text(content, model)
+        elif isinstance(content, list):
+            for part in content:
+                if not isinstance(part, dict):
+                    continue
+                if part.get("type") == "text":
+                    prompt += _count_text(part.get("text") or "", model)
+                elif part.get("type") == "image_url":
+                    prompt += _TOKENS_PER_IMAGE
+    completion = max_tokens if max_tokens else max(256, prompt // 4)
+    return prompt + completion
+
+
+def estimate_request_tokens(body: bytes) -> Tuple[Optional[str], int]:
+    """(Modell, geschätzte Tokens) aus dem JSON-Body eines Chat-Completions-Requests."""
+    try:
+        payload = json.loads(body or b"{}")
+    except (ValueError, UnicodeDecodeError):
+        return None, 0
+    if not isinstance(payload, dict):
+        return None, 0
+    model = payload.get("model")
+    max_tokens = payload.get("max_tokens") or payload.get("max_completion_tokens")
+    return model, estimate_tokens(model or "", payload.get("messages"), max_tokens)
+
+
+# ==================== HEADER-AUSWERTUNG ====================
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """OpenAI-Zeitangaben wie '1s', '6m0s', '20ms' oder '2.5' in Sekunden."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    factor = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(num) * factor[unit] for num, unit in parts)
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """Retry-After aus Response-Headern (retry-after-ms vor retry-after vor x-ratelimit-reset-*)."""
+    if headers is None:
+        return None
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000.0
+        except ValueError:
+            pass
+    for name in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        seconds = parse_duration(headers.get(name))
+        if seconds is not None:
+            return seconds
+    return None
+
+
+# ==================== SCHEDULER ====================
+
+class TokenBucket:
+    """Klassischer Token-Bucket: Kapazität = Budget pro Minute, linearer Refill."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        if not self.unlimited:
+            self.level -= min(amount, self.capacity)
+
+    def sync_remaining(self, remaining: float, now: float):
+        """Server meldet weniger Restbudget als lokal angenommen → übernehmen."""
+        if self.unlimited:
+            return
+        self._refill(now)
+        self.level = min(self.level, remaining)
+
+
+class ModelScheduler:
+    """Budget und faire Warteschlange für ein Modell."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.requests = TokenBucket(_limit("EVALUERA_OPENAI_RPM", model, DEFAULT_RPM))
+        self.tokens = TokenBucket(_limit("EVALUERA_OPENAI_TPM", model, _default_tpm(model)))
+        self.paused_until = 0.0
+        self._cond = threading.Condition()
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._tickets = itertools.count()
+        # Metriken
+        self.granted = 0
+        self.rate_limited = 0
+        self.timeouts = 0
+        self.peak_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    # --- Warteschlange (nur unter self._cond) ---
+
+    def _enqueue(self, session: str) -> int:
+        ticket = next(self._tickets)
+        self._queues.setdefault(session, deque()).append(ticket)
+        self.peak_depth = max(self.peak_depth, self._depth())
+        return ticket
+
+    def _depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _is_head(self, session: str, ticket: int) -> bool:
+        # Round-Robin: die erste Session in der Reihenfolge ist dran
+        first = next(iter(self._queues), None)
+        return first == session and self._queues[session][0] == ticket
+
+    def _dequeue(self, session: str, ticket: int, served: bool):
+        queue = self._queues.get(session)
+        if queue is None:
+            return
+        try:
+            queue.remove(ticket)
+        except ValueError:
+            return
+        if not queue:
+            del self._queues[session]
+        elif served:
+            # Session hinten anstellen, damit die anderen Sessions zuerst dran sind
+            self._queues.move_to_end(session)
+
+    def _try_grant(self, session: str, ticket: int, tokens: int) -> float:
+        """0 = Budget vergeben, sonst Sekunden bis zum nächsten Versuch."""
+        if not self._is_head(session, ticket):
+            return 0.25
+        now = time.monotonic()
+        wait = max(self.paused_until - now,
+                   self.requests.wait_time(1, now),
+                   self.tokens.wait_time(tokens, now))
+        if wait > 0:
+            return wait
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        self._dequeue(session, ticket, served=True)
+        self._cond.notify_all()
+        return 0.0
+
+    def _record(self, started: float):
+        waited = time.monotonic() - started
+        self.granted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def _give_up(self, session: str, ticket: int):
+        self._dequeue(session, ticket, served=False)
+        self.timeouts += 1
+        self._cond.notify_all()
+
+    # --- Öffentliche API ---
+
+    def acquire(self, tokens: int, session: Optional[str] = None, timeout: Optional[float] = None) -> float:
+        """
+        Blockiert, bis Request- und Token-Budget frei sind.
+
+        Returns:
+            Wartezeit in Sekunden
+
+        Raises:
+            QueueTimeout: nach `timeout` Sekunden (Default: EVALUERA_OPENAI_MAX_QUEUE_WAIT)
+        """
+        session = session or current_session_id()
+        timeout = max_queue_wait() if timeout is None else timeout
+        started = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(session)
+            while True:
+                wait = self._try_grant(session, ticket, tokens)
+                if wait <= 0:
+                    self._record(started)
+                    return time.monotonic() - started
+                left = started + timeout - time.monotonic()
+                if left <= 0:
+                    self._give_up(session, ticket)
+                    raise QueueTimeout(f"{self.model}: {timeout:g}s ohne freies Rate-Limit-Budget")
+                self._cond.wait(min(wait, left))
+
+    async def acquire_async(self, tokens: int, session: Optional[str] = None,
+                            timeout: Optional[float] = None) -> float:
+        """Wie acquire(), wartet aber mit asyncio.sleep statt den Loop-Thread zu blockieren."""
+        session = session or current_session_id()
+        timeout = max_queue_wait() if timeout is None else timeout
+        started = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(session)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_grant(session, ticket, tokens)
+                    if wait <= 0:
+                        self._record(started)
+                        return time.monotonic() - started
+                    left = started + timeout - time.monotonic()
+                    if left <= 0:
+                        self._give_up(session, ticket)
+                        raise QueueTimeout(f"{self.model}: {timeout:g}s ohne freies Rate-Limit-Budget")
+                # Kurz pollen: Freigaben aus Sync-Threads wecken keine Coroutines
+                await asyncio.sleep(min(wait, left, 0.25))
+        except asyncio.CancelledError:
+            with self._cond:
+                self._dequeue(session, ticket, served=False)
+                self._cond.notify_all()
+            raise
+
+    def observe_response(self, status_code: int, headers):
+        """Gleicht Buckets mit x-ratelimit-*-Headern ab; 429 pausiert das Modell."""
+        now = time.monotonic()
+        with self._cond:
+            for bucket, name in ((self.requests, "x-ratelimit-remaining-requests"),
+                                 (self.tokens, "x-ratelimit-remaining-tokens")):
+                raw = headers.get(name) if headers is not None else None
+                if raw:
+                    try:
+                        bucket.sync_remaining(float(raw), now)
+                    except ValueError:
+                        pass
+            if status_code == 429:
+                self.rate_limited += 1
+                pause = retry_after_seconds(headers) or 1.0
+                self.paused_until = max(self.paused_until, now + pause)
+                safe_print(f"WARN 429 für {self.model} - pausiere {pause:.1f}s")
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            now = time.monotonic()
+            return {
+                "rpm_limit": int(self.requests.capacity),
+                "tpm_limit": int(self.tokens.capacity),
+                "queue_depth": self._depth(),
+                "queued_sessions": len(self._queues),
+                "peak_queue_depth": self.peak_depth,
+                "granted": self.granted,
+                "avg_wait_s": round(self.total_wait / self.granted, 3) if self.granted else None,
+                "max_wait_s": round(self.max_wait, 3),
+                "rate_limited_429": self.rate_limited,
+                "queue_timeouts": self.timeouts,
+                "paused_for_s": round(max(0.0, self.paused_until - now), 1),
+            }
+
+
+_schedulers: Dict[str, ModelScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(model: str) -> ModelScheduler:
+    """Prozessweiter Scheduler je Modell."""
+    model = model or "unknown"
+    sched = _schedulers.get(model)
+    if sched is None:
+        with _schedulers_lock:
+            sched = _schedulers.get(model)
+            if sched is None:
+                sched = _schedulers[model] = ModelScheduler(model)
+    return sched
+
+
+def scheduler_stats() -> Dict[str, Dict[str, Any]]:
+    """Queue-Tiefe, Wartezeiten und 429-Zähler je Modell."""
+    return {model: sched.stats() for model, sched in list(_schedulers.items())}
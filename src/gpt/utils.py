@@ -6,7 +6,9 @@ Sanitizing & robuste GPT-Wrapper, um alle Unicode-/Encoding-Probleme zu vermeide
 
 import json
 import os
+import random
 import re
+import time
 import unicodedata
 import traceback
 from typing import Dict, Any, Optional, Callable
@@ -93,11 +95,27 @@ def safe_print(msg: str):
             pass
 
 
+def retry_delay(err: Exception, attempt: int, cap: float = 30.0) -> float:
+    """
+    Wartezeit vor dem nächsten Versuch: Retry-After der Fehler-Response,
+    sonst exponentielles Backoff (1, 2, 4, ... s) mit Jitter.
+    """
+    from src.gpt.rate_limiter import retry_after_seconds
+
+    response = getattr(err, "response", None)
+    after = retry_after_seconds(getattr(response, "headers", None))
+    if after is not None:
+        return min(after, cap)
+    return min(cap, 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
 def safe_gpt_request(
     model: str,
     messages: Any,
     client_factory: Callable[[], Any],
     retries: int = 0,
+    function: Optional[str] = None,
+    hedge: bool = False,
     **kwargs,
 ) -> Dict[str, Any]:
     """
@@ -106,7 +124,22 @@ def safe_gpt_request(
     - Reinigt Headers
     - Reinigt messages + kwargs
     - Prüft auf U+2028/U+2029 in finalen Headers
+
+    function: Label für die Latenz-Perzentile (Default: Modellname)
+    hedge: Bei temperature=0 nach der p90-Latenz einen zweiten Request starten
+           (src.gpt.hedging, läuft über den geteilten AsyncOpenAI-Client)
+
+    Unter einer aktiven Deadline (src.gpt.deadline) bekommt jeder Versuch nur die
+    Restzeit als Timeout; danach _stage "deadline".
     """
+    from src.gpt.deadline import DeadlineExceeded, time_left, with_deadline
+    from src.gpt.hedging import hedge_eligible, hedged_request_async, record_latency
+
+    label = function or model
+    if hedge and hedge_eligible(kwargs):
+        from src.gpt.async_exec import run_sync
+        return run_sync(hedged_request_async(label, model, messages, retries=retries, **kwargs))
+
     sanitize_env_variables(["OPENAI_API_KEY", "OPENAI_MODEL", "OPENAI_BASE_URL", "OPENAI_ORG"])
 
     clean_model = sanitize_input(model)
@@ -124,25 +157,46 @@ def safe_gpt_request(
             "_stage": "serialize",
         }
 
+    # Client einmal holen (geteilter Pool, siehe src.gpt.client) statt pro Versuch
+    try:
+        client = client_factory()
+    except Exception as e:
+        return {
+            "_error": True,
+            "error": str(e),
+            "trace": traceback.format_exc(),
+            "_stage": "client",
+        }
+
     last_err = None
     for attempt in range(retries + 1):
         try:
-            client = client_factory()
-            res = client.chat.completions.create(
+            started = time.monotonic()
+            res = with_deadline(client).chat.completions.create(
                 model=clean_model,
                 messages=clean_messages,
                 **clean_kwargs,
             )
+            record_latency(label, time.monotonic() - started)
             return {"_error": False, "response": res}
+        except DeadlineExceeded as e:
+            return {"_error": True, "error": str(e), "_stage": "deadline"}
         except Exception as e:
             last_err = e
+            left = time_left()
             if attempt >= retries:
                 return {
                     "_error": True,
                     "error": str(e),
                     "trace": traceback.format_exc(),
-                    "_stage": "api_call",
+                    # Timeout war auf die Restzeit gekappt
+                    "_stage": "deadline" if left is not None and left <= 0.5 else "api_call",
                 }
+            delay = retry_delay(e, attempt)
+            if left is not None and delay >= left:
+                return {"_error": True, "error": f"Deadline vor erneutem Versuch erreicht: {e}",
+                        "_stage": "deadline"}
+            time.sleep(delay)
     return {
         "_error": True,
         "error": str(last_err) if last_err else "unknown_error",
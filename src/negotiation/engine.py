@@ -11,13 +11,167 @@ Massively expanded version with:
 import os
 import json
 import re
-from typing import Dict, Any, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 try:
     from openai import OpenAI
 except ImportError:
     OpenAI = None
 
+from src.gpt.client import get_openai_client
+from src.gpt.deadline import DeadlineExceeded, check_deadline, record_fallback, time_left, with_deadline
+from src.gpt.json_stream import TopLevelJSONStream
+from src.gpt.prompts import get_prompt, record_prompt_usage
+
+# Gemeinsame Request-Parameter für den normalen und den gestreamten Aufruf
+NEGOTIATION_REQUEST = {
+    "model": "gpt-4o",
+    "temperature": 0.12,
+    "max_tokens": 4000,  # MAXIMUM for comprehensive response
+}
+
+
+def _stream_completion(client, messages: List[Dict[str, Any]],
+                       on_section: Callable[[str, Any], None]) -> Tuple[str, Any]:
+    """
+    Streamt die Antwort und ruft on_section(key, value) auf, sobald ein
+    Top-Level-Abschnitt des JSON vollständig ist.
+
+    Returns:
+        (vollständiger Antworttext, usage des letzten Chunks oder None)
+
+    Raises:
+        DeadlineExceeded: Deadline während des Streams abgelaufen (Stream wird geschlossen)
+    """
+    parser = TopLevelJSONStream()
+    parts: List[str] = []
+    usage = None
+    stream = with_deadline(client).chat.completions.create(
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},
+        **NEGOTIATION_REQUEST,
+    )
+    # Der Client-Timeout begrenzt nur das Warten je Chunk - Gesamt-Deadline hier prüfen
+    for chunk in stream:
+        try:
+            check_deadline("Verhandlungsvorbereitung (Stream)")
+        except DeadlineExceeded:
+            stream.close()
+            raise
+        if getattr(chunk, "usage", None) is not None:
+            usage = chunk.usage
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        parts.append(delta)
+        for key, value in parser.feed(delta):
+            try:
+                on_section(key, value)
+            except Exception as e:
+                # Darstellungsfehler dürfen die Generierung nicht abbrechen
+                print(f"⚠️ on_section({key}) failed: {e}")
+    return "".join(parts).strip(), usage
+
+
+def _local_negotiation_prep(
+    supplier_name: str,
+    article_name: str = None,
+    avg_price: float = None,
+    target_price: float = None,
+    country: str = None,
+    weaknesses: List[str] = None,
+    total_orders: int = None,
+    supplier_competencies: Dict[str, Any] = None,
+    min_price: float = None,
+    commodity_analysis: Dict[str, Any] = None,
+    cost_result: Dict[str, Any] = None,
+) -> Dict[str, Any]:
+    """
+    Rule-based negotiation strategy without GPT (used when the step deadline expires).
+    Same sections as gpt_negotiation_prep_enhanced, built only from the price,
+    cost, supplier and market data already on hand.
+    """
+    leverage, arguments = [], []
+
+    if avg_price and min_price and min_price < avg_price:
+        gap_pct = (avg_price - min_price) / avg_price * 100
+        leverage.append(f"Benchmark-Preis {min_price:.4f}€/Stk ({gap_pct:.1f}% unter aktuellem Preis)")
+        arguments.append({
+            "argument": "Vergleichsangebote liegen deutlich unter dem aktuellen Preis",
+            "supporting_facts": [f"Günstigster Preis in der Historie: {min_price:.4f}€/Stk",
+                                 f"Aktueller Durchschnitt: {avg_price:.4f}€/Stk"],
+        })
+
+    total_cost = (cost_result or {}).get("total_cost_eur") if not (cost_result or {}).get("_error") else None
+    if avg_price and total_cost:
+        margin_pct = (avg_price / total_cost - 1) * 100
+        leverage.append(f"Geschätzte Herstellkosten {total_cost:.4f}€/Stk ({margin_pct:.0f}% Aufschlag)")
+        arguments.append({
+            "argument": "Der Preis liegt klar über den geschätzten Herstellkosten",
+            "supporting_facts": [f"Material: {cost_result.get('material_cost_eur', 0):.4f}€/Stk",
+                                 f"Fertigung: {cost_result.get('fab_cost_eur', 0):.4f}€/Stk"],
+        })
+
+    raw_material_trends = {}
+    if commodity_analysis and commodity_analysis.get("ok"):
+        trend_pct = commodity_analysis.get("trend_percentage", 0) or 0
+        raw_material_trends = {
+            "material": commodity_analysis.get("material", ""),
+            "current_price_eur_kg": commodity_analysis.get("current_price_eur_kg", ""),
+            "price_trend_12mo": f"{trend_pct:+.1f}%",
+        }
+        if trend_pct < -1:
+            leverage.append(f"Fallende Rohstoffpreise ({trend_pct:+.1f}%)")
+            arguments.append({
+                "argument": "Gesunkene Rohstoffpreise müssen weitergegeben werden",
+                "supporting_facts": [f"Rohstofftrend: {trend_pct:+.1f}%"],
+            })
+
+    if weaknesses:
+        arguments.append({"argument": "Bekannte Schwächen des Lieferanten",
+                          "supporting_facts": list(weaknesses)[:3]})
+
+    processes = [c.get("process") for c in (supplier_competencies or {}).get("core_competencies", [])
+                 if c.get("process") and c.get("process") != "unknown"]
+
+    goal = (f"Preis von {avg_price:.4f}€ auf {target_price:.4f}€/Stk senken"
+            if avg_price and target_price and target_price < avg_price else "Preis und Konditionen verbessern")
+    minimum = (f"{(avg_price + target_price) / 2:.4f}€/Stk"
+               if avg_price and target_price and target_price < avg_price else "")
+
+    return {
+        "supplier_analysis": {
+            "production_competencies": processes[:5],
+            "supply_chain_risks": [f"Herkunftsland: {country}"] if country else [],
+        },
+        "market_analysis": {"raw_material_trends": raw_material_trends} if raw_material_trends else {},
+        "strategy_overview": {
+            "main_approach": "Datenbasiert: Benchmark- und Kostenargumente zuerst",
+            "negotiation_power_balance": "buyer" if len(leverage) >= 2 else "balanced",
+            "key_leverage_points": leverage,
+        },
+        "objectives": {
+            "primary_goal": goal,
+            "secondary_goals": ["Preisgleitklausel an Rohstoffindex koppeln", "Rahmenvertrag mit Volumenstaffel"],
+            "minimum_acceptable_outcome": minimum,
+            "batna": f"Alternative Lieferanten zum Benchmark-Preis {min_price:.4f}€/Stk" if min_price else "",
+        },
+        "key_arguments": arguments,
+        "tactics": ["Mit dem Zielpreis ankern", "Nach dem Angebot schweigen", "Zugeständnisse nur gegen Gegenleistung"],
+        "concessions": [{"what_we_offer": "Längere Vertragslaufzeit", "what_we_want": "Preisreduktion",
+                         "trade_off_value": ""}] if total_orders else [],
+        "red_flags": [],
+        "opening_statement": (f"Für {article_name or 'den Artikel'} sehen wir deutlichen Spielraum beim Preis - "
+                              f"{goal.lower()}." if leverage else ""),
+        "closing_statement": "",
+        "talking_points": leverage,
+        "recommendations": ["Lokale Schnellstrategie - KI-Strategie später erneut generieren"],
+        "_fallback": True,
+    }
+
 
 def gpt_negotiation_prep_enhanced(
     supplier_name: str,
@@ -33,7 +187,8 @@ def gpt_negotiation_prep_enhanced(
     min_price: float = None,
     max_price: float = None,
     commodity_analysis: Dict[str, Any] = None,
-    cost_result: Dict[str, Any] = None
+    cost_result: Dict[str, Any] = None,
+    on_section: Optional[Callable[[str, Any], None]] = None
 ) -> Dict[str, Any]:
     """
     MASSIVELY ENHANCED negotiation preparation with:
@@ -57,9 +212,12 @@ def gpt_negotiation_prep_enhanced(
         max_price: Maximum price
         commodity_analysis: Raw material market analysis
         cost_result: Cost estimation result (material, fab costs, etc.)
+        on_section: Optional callback(key, value) - streams the response and
+                    reports each top-level section as soon as it is complete
 
     Returns:
-        Comprehensive negotiation strategy dict
+        Comprehensive negotiation strategy dict; if the step deadline expires, a
+        rule-based strategy from the given data ("_deadline_fallback": True)
     """
     key = os.getenv("OPENAI_API_KEY")
     if not key or OpenAI is None:
@@ -74,7 +232,7 @@ def gpt_negotiation_prep_enhanced(
             "_error": True
         }
 
-    client = OpenAI(api_key=key)
+    client = get_openai_client(key)
 
     # Build comprehensive context
     context_parts = [f"**LIEFERANT:** {supplier_name}"]
@@ -157,10 +315,10 @@ def gpt_negotiation_prep_enhanced(
 ➡️ Nutze Markttrend in Verhandlung!
 """
 
-    # MASSIVE ENHANCED PROMPT
-    prompt = f"""Du bist ein WORLD-CLASS PROCUREMENT NEGOTIATION STRATEGIST mit 25+ Jahren globaler Einkaufserfahrung in Automotive, Aerospace und Industrial Manufacturing. Du hast >$500M Einsparungen verhandelt.
-
-**KONTEXT:**
+    # MASSIVE ENHANCED PROMPT - statische Anleitung aus der Registry (Prompt-Cache-Präfix),
+    # hier nur die Daten dieser Verhandlung
+    template = get_prompt("negotiation_prep")
+    prompt = f"""**KONTEXT:**
 {context}
 
 **STÄRKEN:**
@@ -171,138 +329,19 @@ def gpt_negotiation_prep_enhanced(
 {comp_text}
 {cost_context}
 {commodity_text}
-
-**🎯 AUFGABE: ERSTELLE EINE ULTRA-DETAILLIERTE, DATENBASIERTE VERHANDLUNGSSTRATEGIE**
-
-Du MUSST folgende Analysen integrieren:
-
-**1) SUPPLIER ANALYSIS:**
-- Produktionskompetenzen (core processes, expertise level)
-- Skalierungsfähigkeiten (max lot sizes, capacity/month)
-- Zertifizierungen (ISO, IATF, Aerospace, etc.)
-- Standortvorteile (niedrige Lohnkosten, Lieferzeiten, etc.)
-- Standortnachteile (Zölle, Transportkosten, politische Risiken)
-- Supply Chain Risiken (Rohstoffverfügbarkeit, Energiepreise, Disruption)
-
-**2) MARKET ANALYSIS:**
-- Rohstoffpreisentwicklung (12mo, 24mo Trends, Forecast 12mo)
-- Energiepreis-Volatilität & Impact auf Herstellkosten
-- Konkurrenzangebote (min. 2 alternative Lieferanten mit Preisen)
-- Länderrisiken (Zölle, CBAM-Kosten ab 2026, Transportkosten)
-- Erwartete Preisentwicklung nächste 12 Monate
-
-**3) VERHANDLUNGSPAKET:**
-- 3-5 EXTREM STARKE Kernargumente
-- Je Argument: 2-3 belegbare Fakten (aus Supplier/Market Analysis!)
-- Psychologische Taktiken:
-  * **Anchoring:** Eröffnungspreis basierend auf Kostenkalkulation
-  * **Silence:** Strategische Pausen nach Forderungen
-  * **Walk-Away:** Klare BATNA mit konkreten Alternativen
-- Szenario-Strategien: "Wenn Lieferant X sagt, dann antworte Y"
-
-**KRITISCH WICHTIG:**
-- Nutze Kostenschätzung als PRIMÄRES Argument (zeigt reale Herstellkosten!)
-- Nutze Markttrends (fallende Rohstoffpreise → Preissenkung!)
-- Nutze Supplier-Schwächen (fehlende Expertise → Preisnachlass!)
-- Nutze Wettbewerb (alternative Lieferanten → Druckmittel!)
-- Gebe wörtliche Formulierungen (1:1 verwendbar!)
-
-**ANTWORTE ALS ULTRA-AUSFÜHRLICHES JSON:**
-```json
-{{
-  "supplier_analysis": {{
-    "production_competencies": ["Prozess 1 (level)", "Prozess 2 (level)"],
-    "scaling_capabilities": "Klein/Mittel/Groß - Details",
-    "certifications": ["ISO 9001", "etc."],
-    "location_advantages": ["Vorteil 1", "Vorteil 2"],
-    "location_disadvantages": ["Nachteil 1", "Nachteil 2"],
-    "supply_chain_risks": ["Risiko 1", "Risiko 2"]
-  }},
-
-  "market_analysis": {{
-    "raw_material_trends": {{
-      "material": "z.B. Stahl C45",
-      "current_price_eur_kg": 1.85,
-      "price_trend_12mo": "Fallend -8%",
-      "price_trend_24mo": "Volatil",
-      "forecast_next_12mo": "Stabil bis +3-5%"
-    }},
-    "energy_price_volatility": "Hoch/Mittel/Niedrig + Impact",
-    "competitor_offers": ["Lieferant A: 0.042€", "Lieferant B: 0.048€"],
-    "country_risks": {{
-      "tariffs": "EU-Zoll: X%",
-      "cbam_costs": "0.002€/Stk ab 2026",
-      "transport_costs": "0.008€/Stk"
-    }},
-    "expected_price_development": "Prognose mit Begründung"
-  }},
-
-  "strategy_overview": {{
-    "main_approach": "competitive|win-win|collaborative",
-    "rationale": "Begründung basierend auf Supplier + Market Analysis",
-    "negotiation_power_balance": "buyer_advantage|balanced|supplier_advantage",
-    "estimated_success_probability": "high|medium|low",
-    "key_leverage_points": ["Hebel aus Analysen"]
-  }},
-
-  "objectives": {{
-    "primary_goal": "Preisreduktion um X% auf Y€/Stk",
-    "secondary_goals": ["Ziel 1", "Ziel 2"],
-    "minimum_acceptable_outcome": "Minimum",
-    "batna": "Konkrete Alternative mit Namen + Preis!"
-  }},
-
-  "key_arguments": [
-    {{
-      "argument": "Argument mit Zahlen",
-      "supporting_facts": ["Fakt aus Marktanalyse", "Fakt aus Kostenkalkulation", "Fakt aus Supplier-Risiken"],
-      "expected_counter": "Lieferant könnte sagen...",
-      "our_response": "Wir antworten..."
-    }}
-  ],
-
-  "tactics": [
-    "Anchoring: Eröffne mit X€ (basierend auf Herstellkosten + 15% Marge)",
-    "Silence: Nach Forderung 10 Sekunden schweigen",
-    "Walk-Away: BATNA klar kommunizieren"
-  ],
-
-  "concessions": [
-    {{
-      "what_we_offer": "z.B. Höhere MOQ",
-      "what_we_want": "Preis von X auf Y",
-      "trade_off_value": "Bewertung"
-    }}
-  ],
-
-  "red_flags": ["Warnsignal 1", "Warnsignal 2"],
-
-  "opening_statement": "Wörtliche Eröffnung (3-5 Sätze) - integriere Markttrends + Kostenkalkulation!",
-  "closing_statement": "Wörtliche Abschlussformulierung"
-}}
-```
-
-**SEI EXTREM SPEZIFISCH - KEINE GENERISCHEN PHRASEN!**
 """
 
     try:
-        res = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Du bist ein WORLD-CLASS PROCUREMENT STRATEGIST. Gebe ULTRA-SPEZIFISCHE, datenbasierte Strategien mit konkreten Zahlen, Namen und Formulierungen. Nutze ALLE verfügbaren Daten (Kosten, Markt, Supplier). Keine generischen Ratschläge!"
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.12,
-            max_tokens=4000  # MAXIMUM for comprehensive response
-        )
+        messages = template.messages(prompt)
 
-        txt = res.choices[0].message.content.strip()
+        if on_section is None:
+            res = with_deadline(client).chat.completions.create(messages=messages, **NEGOTIATION_REQUEST)
+            txt = res.choices[0].message.content.strip()
+            usage = res.usage
+        else:
+            txt, usage = _stream_completion(client, messages, on_section)
+        tokens_used = usage.total_tokens if usage is not None else None
+        prompt_usage = record_prompt_usage(template.name, usage)
 
         # Robust JSON parsing
         data = {}
@@ -326,7 +365,8 @@ Du MUSST folgende Analysen integrieren:
                     "_error": True
                 }
 
-        print(f"✅ GPT-4o Enhanced Negotiation Prep - Tokens: {res.usage.total_tokens}")
+        cached_tokens = prompt_usage["cached_tokens"] if prompt_usage else 0
+        print(f"✅ GPT-4o Enhanced Negotiation Prep - Tokens: {tokens_used} (Prompt-Cache: {cached_tokens})")
 
         # Extract all fields with fallbacks
         return {
@@ -350,11 +390,22 @@ Du MUSST folgende Analysen integrieren:
 
             # Meta
             "raw": txt,
-            "_tokens_used": res.usage.total_tokens,
+            "_tokens_used": tokens_used,
+            "_cached_tokens": cached_tokens,
+            "_prompt_version": template.version,
             "_api_called": True
         }
 
     except Exception as e:
+        left = time_left()
+        if isinstance(e, DeadlineExceeded) or (left is not None and left <= 0.5):
+            # Step deadline expired (also as a client timeout capped to the remaining time)
+            record_fallback("negotiation")
+            result = _local_negotiation_prep(
+                supplier_name, article_name, avg_price, target_price, country, weaknesses,
+                total_orders, supplier_competencies, min_price, commodity_analysis, cost_result,
+            )
+            return {**result, "_deadline_fallback": True}
         print(f"❌ ERROR in gpt_negotiation_prep_enhanced: {e}")
         import traceback
         traceback.print_exc()
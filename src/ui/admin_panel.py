@@ -0,0 +1,114 @@
+"""
+📊 EVALUERA - Admin-Panel
+=========================
+Betriebskennzahlen für Admins in der Sidebar: GPT-Cache-Effektivität je
+Funktion, regelbasierte Normteil-Schätzungen, Nachbar-Ableitungen, Surrogat-Modell,
+Modell-Kaskade, GPT-Latenz-Perzentile und Hedging, Schritt-Deadlines, Prompt-Cache des Providers, Disk-Cache-Belegung, Single-Flight,
+Rate-Limit-Queue und Connection-Pool.
+Export der Cache-Metriken als Prometheus-Text oder JSON Lines.
+"""
+
+import pandas as pd
+import streamlit as st
+
+from src.core.neighbor_estimation import neighbor_stats
+from src.core.rule_estimation import rule_estimate_stats
+from src.core.surrogate import surrogate_stats
+from src.gpt.cache import get_cache_stats
+from src.gpt.cache_metrics import metrics_jsonl, metrics_prometheus
+from src.gpt.cascade import cascade_stats
+from src.gpt.deadline import deadline_stats
+from src.gpt.client import client_pool_stats
+from src.gpt.disk_cache import get_disk_cache, single_flight_stats
+from src.gpt.hedging import hedge_stats
+from src.gpt.prompts import prompt_cache_stats
+from src.gpt.rate_limiter import scheduler_stats
+
+ADMIN_USERS = {"admin"}
+
+
+def is_admin() -> bool:
+    return st.session_state.get("username") in ADMIN_USERS
+
+
+def render_admin_panel():
+    """Sidebar-Expander mit Cache- und Pool-Metriken (nur für Admins)."""
+    if not is_admin():
+        return
+
+    with st.sidebar.expander("📊 Cache-Metriken", expanded=False):
+        stats = get_cache_stats()
+        col1, col2 = st.columns(2)
+        col1.metric("Trefferquote", f"{stats['hit_rate']:.0%}")
+        col2.metric("Tokens gespart", f"{stats['tokens_saved']:,}".replace(",", "."))
+        st.caption(f"{stats['hits']} Treffer · {stats['misses']} GPT-Calls · "
+                   f"~{stats['seconds_saved']:.0f}s Wartezeit gespart")
+
+        rules = rule_estimate_stats()
+        st.caption(f"Regelbasiert: {rules.get('served_local', 0)} lokal beantwortet · "
+                   f"{rules.get('gpt_fallback', 0)} an GPT weitergereicht")
+        st.caption(f"Nachbar-Ableitung: {neighbor_stats().get('served', 0)} lokal beantwortet")
+
+        surrogate = surrogate_stats()
+        model = surrogate.get("model")
+        uncertain = surrogate.get("uncertain_interval", 0) + surrogate.get("uncertain_out_of_domain", 0)
+        st.caption(f"Surrogat: {surrogate.get('served', 0)} lokal beantwortet · {uncertain} unsicher · "
+                   f"{surrogate.get('samples_stored') or 0} Samples"
+                   + (f" · MAPE {model['mape_total']:.0%}" if model else " · nicht trainiert"))
+
+        cascade = cascade_stats()
+        if cascade:
+            calls = sum(c["calls"] for c in cascade.values())
+            escalated = sum(c["escalated"] for c in cascade.values())
+            saved = sum(c["seconds_saved"] or 0 for c in cascade.values())
+            st.caption(f"Modell-Kaskade: {escalated}/{calls} eskaliert ({escalated / max(calls, 1):.0%}) · "
+                       f"~{saved:.0f}s Latenz gespart")
+
+        latency = hedge_stats()
+        if latency:
+            hedged = sum(h["hedged"] for h in latency.values())
+            won = sum(h["hedge_won"] for h in latency.values())
+            st.caption(f"Hedging: {hedged} zweite Requests · {won} davon schneller")
+            st.dataframe(pd.DataFrame(latency).T[["requests", "p50", "p90", "p99", "hedged", "hedge_won",
+                                                  "budget_denied"]],
+                         use_container_width=True)
+
+        deadlines = deadline_stats()
+        overruns = sum(v for k, v in deadlines.items() if k.endswith("_overrun"))
+        st.caption(f"Deadlines: {deadlines.get('fallbacks', 0)} lokale Notlösungen · "
+                   f"{overruns} Schritte über Budget")
+
+        if stats["functions"]:
+            df = pd.DataFrame(stats["functions"]).set_index("function")
+            st.dataframe(df[["calls", "hit_rate", "memory_hit", "disk_hit", "coalesced", "miss",
+                             "avg_hit_ms", "avg_miss_ms", "tokens_saved", "avg_entry_bytes"]],
+                         use_container_width=True)
+        else:
+            st.caption("Noch keine gecachten GPT-Aufrufe in diesem Prozess.")
+
+        disk = get_disk_cache()
+        if disk is not None:
+            disk_stats = disk.stats()
+            st.caption(f"Disk-Cache: {disk_stats['total_bytes'] / 1024 / 1024:.1f} / "
+                       f"{disk_stats['max_bytes'] / 1024 / 1024:.0f} MB")
+
+        with st.popover("Details"):
+            st.json({
+                "prompt_cache": prompt_cache_stats(),
+                "model_cascade": cascade,
+                "gpt_latency": latency,
+                "deadlines": deadlines,
+                "rule_estimates": rule_estimate_stats(),
+                "neighbor_estimates": neighbor_stats(),
+                "surrogate": surrogate,
+                "single_flight": single_flight_stats(),
+                "rate_limiter": scheduler_stats(),
+                "connection_pool": client_pool_stats(),
+                "disk_cache": disk.stats() if disk is not None else None,
+            })
+
+        col1, col2 = st.columns(2)
+        col1.download_button("Prometheus", metrics_prometheus(), file_name="evaluera_cache_metrics.prom",
+                             mime="text/plain", use_container_width=True)
+        col2.download_button("JSONL", metrics_jsonl(), file_name="evaluera_cache_metrics.jsonl",
+                             mime="application/x-ndjson", use_container_width=True)
@@ -596,6 +596,7 @@ class ExcelLoadingAnimation:
         self.message = message
         self.icon = icon
         self.container = None
+        self.progress_bar = None
 
     def __enter__(self):
         """Startet die Ladeanimation"""
@@ -606,10 +607,20 @@ class ExcelLoadingAnimation:
 
         return self
 
+    def update_progress(self, fraction, text=None):
+        """Zeigt den Fortschritt (0..1) unter der Animation, z.B. beim Chunk-Lesen großer CSVs"""
+        value = min(max(float(fraction), 0.0), 1.0)
+        if self.progress_bar is None:
+            self.progress_bar = st.progress(value, text=text)
+        else:
+            self.progress_bar.progress(value, text=text)
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Beendet die Ladeanimation"""
         if self.container:
             self.container.empty()
+        if self.progress_bar is not None:
+            self.progress_bar.empty()
         return False
 
 
@@ -9,7 +9,7 @@ import pandas as pd
 from src.ui.theme import section_header, card, COLORS
 from src.ui.cards import ExcelLoadingAnimation
 from src.core.cbam import gpt_analyze_technical_drawing, gpt_analyze_pdf_drawing, gpt_estimate_material
-from src.gpt.cache import cached_gpt_complete_cost_estimate
+from src.gpt.cache import cached_gpt_complete_cost_estimate, cached_gpt_complete_cost_estimate_batch
 from src.ui.wizard import create_compact_kpi_row
 import json
 
@@ -131,52 +131,78 @@ def render_drawing_analysis_page():
                                     total_mat = 0.0
                                     total_fab = 0.0
                                     details = []
-                                    
+                                    failed = []
+                                    drawing_json = json.dumps(result)
+
+                                    jobs = []
                                     for item in items:
                                         # Parse quantity
                                         try:
                                             qty = float(str(item.get('quantity', 1)).replace(',', '.').split()[0])
                                         except:
                                             qty = 1.0
-                                        
+
                                         # Prepare description
                                         desc = item.get('description', '')
                                         mat = item.get('material', '')
                                         dims = f"{item.get('diameter_mm', '')}x{item.get('length_mm', '')}"
-                                        full_desc = f"{desc} {mat} {dims}".strip()
-                                        
-                                        # Calculate effective lot size for this item
-                                        item_lot_size = int(lot_size * qty)
-                                        
-                                        # Call Cost Estimation
-                                        res = cached_gpt_complete_cost_estimate(
-                                            description=full_desc,
-                                            lot_size=item_lot_size,
-                                            technical_drawing_context_json=json.dumps(result)
-                                        )
-                                        
-                                        if res and not res.get("_error"):
-                                            # Add to totals (cost per unit * quantity per set)
-                                            mat_cost = res.get('material_cost_eur', 0) * qty
-                                            fab_cost = res.get('fab_cost_eur', 0) * qty
-                                            total_mat += mat_cost
-                                            total_fab += fab_cost
-                                            
-                                            details.append({
+                                        jobs.append({
+                                            "item": item,
+                                            "qty": qty,
+                                            "desc": desc,
+                                            "full_desc": f"{desc} {mat} {dims}".strip(),
+                                            # Effektive Losgröße für dieses Bauteil
+                                            "lot_size": max(int(lot_size * qty), 1),
+                                        })
+
+                                    progress = st.progress(0.0, text=f"0 / {len(jobs)} Positionen kalkuliert")
+
+                                    def _on_progress(done, total):
+                                        progress.progress(done / total, text=f"{done} / {total} Positionen kalkuliert")
+
+                                    # Alle Positionen gebündelt schätzen (wenige GPT-Calls statt einer pro Position)
+                                    estimates = cached_gpt_complete_cost_estimate_batch(
+                                        [{"id": str(idx), "description": job["full_desc"], "lot_size": job["lot_size"]}
+                                         for idx, job in enumerate(jobs)],
+                                        technical_drawing_context_json=drawing_json,
+                                        on_progress=_on_progress,
+                                    )
+                                    progress.empty()
+
+                                    for idx, job in enumerate(jobs):
+                                        item, qty = job["item"], job["qty"]
+                                        res = estimates.get(str(idx))
+                                        if not res or res.get("_error"):
+                                            failed.append({
                                                 "position": item.get('position'),
-                                                "description": desc,
-                                                "quantity": qty,
-                                                "unit_cost": res.get('material_cost_eur', 0) + res.get('fab_cost_eur', 0),
-                                                "total_cost": mat_cost + fab_cost
+                                                "description": job["desc"],
+                                                "error": (res or {}).get("error") or "Kalkulation fehlgeschlagen",
                                             })
-                                    
+                                            continue
+
+                                        # Add to totals (cost per unit * quantity per set)
+                                        mat_cost = (res.get('material_cost_eur') or 0) * qty
+                                        fab_cost = (res.get('fab_cost_eur') or 0) * qty
+                                        total_mat += mat_cost
+                                        total_fab += fab_cost
+
+                                        details.append({
+                                            "position": item.get('position'),
+                                            "description": job["desc"],
+                                            "quantity": qty,
+                                            "unit_cost": (res.get('material_cost_eur') or 0) + (res.get('fab_cost_eur') or 0),
+                                            "total_cost": mat_cost + fab_cost
+                                        })
+
                                     cost_res = {
                                         "material_cost_eur": total_mat,
                                         "fab_cost_eur": total_fab,
                                         "details": details,
-                                        "is_package": True
+                                        "failed_items": failed,
+                                        "is_package": True,
+                                        "_error": not details,
                                     }
-                                    
+
                                 else:
                                     # Single item logic
                                     # Prepare description from analysis
@@ -249,6 +275,10 @@ def render_drawing_analysis_page():
         if is_package and "details" in res:
             st.markdown("##### 🧾 Einzelkosten-Aufstellung")
             st.dataframe(pd.DataFrame(res["details"]), use_container_width=True)
+
+        if is_package and res.get("failed_items"):
+            st.warning(f"⚠️ {len(res['failed_items'])} Position(en) konnten nicht kalkuliert werden und fehlen in der Summe.")
+            st.dataframe(pd.DataFrame(res["failed_items"]), use_container_width=True, hide_index=True)
         
         with st.expander("📋 JSON-Details"):
             st.json(res)
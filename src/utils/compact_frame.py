@@ -0,0 +1,125 @@
+"""
+KOMPAKTE DTYPES
+===============
+Ingest-Stufe für Bestelldaten: Text-Spalten mit wenigen Ausprägungen werden
+Kategorien, Preise/Beträge float64, Mengen float32 (wenn verlustfrei),
+Datumsspalten datetime64.
+
+Jede Session hält pro Datensatz nur eine Referenz auf das geteilte
+DataFrame (siehe dataset_snapshot) - kleinere Frames bedeuten mehr
+gleichzeitige Nutzer pro Node.
+"""
+
+import re
+import warnings
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.core.price_utils import PRICE_UNIT_CANDS, PRICE_TOTAL_CANDS, QTY_CANDS, norm_num_series
+
+PRICE_CANDS = PRICE_UNIT_CANDS + PRICE_TOTAL_CANDS + ["preis", "price"]
+DATE_CANDS = ["date", "datum", "zeitpunkt", "datetime"]
+# Deutsche Komposita ("Bestelldatum", "Lieferzeitpunkt") enden auf das Stichwort
+DATE_SUFFIXES = ("datum", "zeitpunkt")
+# Plausible Jahre für ganzzahlige ERP-Datumswerte (JJJJMMTT)
+DATE_YEAR_RANGE = (1990, 2100)
+# Text-Spalten mit höchstens diesem Anteil eindeutiger Werte → category
+CATEGORY_MAX_RATIO = 0.5
+_FLOAT32_EXACT = 2 ** 24
+
+
+def frame_memory_mb(df: pd.DataFrame) -> float:
+    """Tatsächlicher Speicherbedarf inkl. Python-Strings in MB."""
+    return float(df.memory_usage(deep=True).sum()) / 1024 / 1024
+
+
+def _matches(col: Any, keywords) -> bool:
+    name = str(col).strip().lower()
+    return any(kw in name for kw in keywords)
+
+
+def _is_date_column(col: Any) -> bool:
+    """Ganze Wörter des Spaltennamens ("order_date", "OrderDate", "Bestelldatum") - nicht "validated"."""
+    words = re.findall(r"[A-ZÄÖÜ]?[a-zäöüß]+|[A-ZÄÖÜ]+(?![a-zäöüß])|\d+", str(col).strip())
+    return any(w.lower() in DATE_CANDS or w.lower().endswith(DATE_SUFFIXES) for w in words)
+
+
+def _to_number(ser: pd.Series, allow_float32: bool):
+    """Zahl-Spalte oder None, wenn beim Parsen Werte verloren gingen."""
+    values = norm_num_series(ser)
+    if values.notna().sum() < ser.notna().sum():
+        return None
+    if allow_float32:
+        finite = values.dropna()
+        if finite.empty or ((finite.abs() < _FLOAT32_EXACT) & (finite == finite.astype(np.float32))).all():
+            return values.astype(np.float32)
+    return values
+
+
+def _to_datetime(ser: pd.Series):
+    """
+    Datums-Spalte oder None. Text wird frei geparst, ganze Zahlen nur als
+    JJJJMMTT (20240305) mit plausiblem Jahr - sonst bliebe 20240305 als
+    Nanosekunden nach 1970 stehen. Andere dtypes bleiben unverändert.
+    """
+    if pd.api.types.is_datetime64_any_dtype(ser):
+        return None
+    if pd.api.types.is_integer_dtype(ser) and not pd.api.types.is_bool_dtype(ser):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            parsed = pd.to_datetime(ser.astype("Int64").astype("string"), format="%Y%m%d", errors="coerce")
+        years = parsed.dt.year.dropna()
+        if years.empty or not years.between(*DATE_YEAR_RANGE).all():
+            return None
+    elif ser.dtype == object or pd.api.types.is_string_dtype(ser):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            parsed = pd.to_datetime(ser, dayfirst=True, errors="coerce")
+    else:
+        return None
+    if parsed.notna().sum() < ser.notna().sum():
+        return None
+    return parsed
+
+
+def compact_order_frame(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Wandelt Bestelldaten in kompakte dtypes um.
+
+    Spalten werden nur umgewandelt, wenn dabei kein Wert verloren geht
+    (sonst bleibt die Original-Spalte erhalten).
+
+    Returns:
+        (kompaktes DataFrame, Report mit before_mb, after_mb und Umwandlungen je Spalte)
+    """
+    before = frame_memory_mb(df)
+    out = df.copy(deep=False)
+    converted: Dict[str, str] = {}
+
+    for col in out.columns:
+        ser = out[col]
+        new = None
+        if _matches(col, QTY_CANDS):
+            new = _to_number(ser, allow_float32=True)
+        elif _matches(col, PRICE_CANDS):
+            new = _to_number(ser, allow_float32=False)
+        elif _is_date_column(col):
+            new = _to_datetime(ser)
+
+        if new is None and ser.dtype == object and len(ser) > 0:
+            kind = pd.api.types.infer_dtype(ser, skipna=True)
+            if kind == "string" and ser.nunique(dropna=True) <= CATEGORY_MAX_RATIO * len(ser):
+                new = ser.astype("category")
+
+        if new is not None and new.dtype != ser.dtype:
+            out[col] = new
+            converted[str(col)] = f"{ser.dtype} → {new.dtype}"
+
+    report = {
+        "before_mb": round(before, 2),
+        "after_mb": round(frame_memory_mb(out), 2),
+        "converted": converted,
+    }
+    return out, report
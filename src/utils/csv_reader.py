@@ -0,0 +1,161 @@
+"""
+CSV READER
+==========
+Schneller Einlesepfad für große ERP-Exporte.
+
+pd.read_csv(sep=None, engine="python") sniffed das Trennzeichen über die
+ganze Datei und parst zeilenweise in Python - langsam und speicherhungrig.
+Hier werden Trennzeichen und Encoding nur an einer kleinen Stichprobe
+erkannt; geparst wird danach mit der C-Engine (optional pyarrow), bei
+großen Dateien mit Fortschrittsmeldung.
+"""
+
+import csv
+import io
+import os
+from typing import Callable, Optional, Tuple
+
+import pandas as pd
+
+SAMPLE_BYTES = 64 * 1024
+# Ab dieser Dateigröße wird der Lesefortschritt gemeldet
+PROGRESS_MIN_BYTES = 20 * 1024 * 1024
+
+_ENCODINGS = ("utf-8-sig", "cp1252", "latin-1")
+_DELIMITERS = ";,\t|"
+
+
+def _read_sample(source) -> bytes:
+    """Liest die ersten Bytes und spult das File-Objekt zurück."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read(SAMPLE_BYTES)
+    pos = source.tell()
+    sample = source.read(SAMPLE_BYTES)
+    source.seek(pos)
+    if isinstance(sample, str):
+        return sample.encode("utf-8")
+    return sample
+
+
+def _source_size(source) -> Optional[int]:
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    size = getattr(source, "size", None)
+    if size is not None:
+        return int(size)
+    try:
+        pos = source.tell()
+        source.seek(0, io.SEEK_END)
+        end = source.tell()
+        source.seek(pos)
+        return end
+    except Exception:
+        return None
+
+
+def _decode_sample(sample: bytes, encoding: str) -> str:
+    """Dekodiert die Stichprobe; ein am Ende abgeschnittenes Multibyte-Zeichen ist kein Fehler."""
+    try:
+        return sample.decode(encoding)
+    except UnicodeDecodeError as e:
+        if len(sample) == SAMPLE_BYTES and e.start >= len(sample) - 3:
+            return sample[:e.start].decode(encoding)
+        raise
+
+
+def sniff_csv(sample: bytes) -> Tuple[str, str]:
+    """
+    Erkennt Encoding und Trennzeichen an einer Stichprobe.
+
+    Returns:
+        (encoding, delimiter)
+    """
+    encoding, text = "latin-1", ""
+    for enc in _ENCODINGS:
+        try:
+            text = _decode_sample(sample, enc)
+            encoding = enc
+            break
+        except UnicodeDecodeError:
+            continue
+
+    # Letzte (evtl. unvollständige) Zeile verwerfen
+    lines = text.splitlines()
+    if len(lines) > 1:
+        lines = lines[:-1]
+    head = "\n".join(lines[:50])
+
+    try:
+        delimiter = csv.Sniffer().sniff(head, delimiters=_DELIMITERS).delimiter
+    except csv.Error:
+        first = lines[0] if lines else ""
+        counts = {d: first.count(d) for d in _DELIMITERS}
+        delimiter = max(counts, key=counts.get) if any(counts.values()) else ","
+    return encoding, delimiter
+
+
+class _ProgressReader(io.RawIOBase):
+    """Binär-Reader, der beim Lesen den Fortschritt meldet (gedrosselt auf ~1%-Schritte)."""
+
+    def __init__(self, raw, size: int, on_progress: Callable[[float], None]):
+        self._raw = raw
+        self._size = max(size, 1)
+        self._read = 0
+        self._last = -1.0
+        self._on_progress = on_progress
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._raw.read(len(buffer))
+        n = len(data)
+        buffer[:n] = data
+        self._read += n
+        fraction = min(self._read / self._size, 1.0)
+        if fraction - self._last >= 0.01 or (n == 0 and self._last < 1.0):
+            self._last = fraction if n else 1.0
+            self._on_progress(self._last)
+        return n
+
+
+def read_csv_fast(source, on_progress: Optional[Callable[[float], None]] = None,
+                  engine: Optional[str] = None) -> pd.DataFrame:
+    """
+    Liest eine CSV-Datei mit Sniffing an einer Stichprobe und schneller Engine.
+
+    Args:
+        source: Pfad oder binäres File-Objekt (z.B. Streamlit UploadedFile)
+        on_progress: Callback(anteil 0..1) - nur für Dateien ab PROGRESS_MIN_BYTES
+        engine: "c" (Default) oder "pyarrow" (ENV: EVALUERA_CSV_ENGINE)
+
+    Returns:
+        DataFrame
+    """
+    sample = _read_sample(source)
+    encoding, delimiter = sniff_csv(sample)
+    engine = (engine or os.getenv("EVALUERA_CSV_ENGINE") or "c").lower()
+
+    if engine == "pyarrow":
+        try:
+            return pd.read_csv(source, sep=delimiter, encoding=encoding, engine="pyarrow")
+        except (ImportError, ValueError):
+            if hasattr(source, "seek"):
+                source.seek(0)
+
+    options = dict(sep=delimiter, encoding=encoding, engine="c", low_memory=False)
+    size = _source_size(source)
+    if on_progress is None or size is None or size < PROGRESS_MIN_BYTES:
+        return pd.read_csv(source, **options)
+
+    # Ein einziger C-Engine-Durchlauf (Typen wie beim normalen Lesen),
+    # Fortschritt über die gelesenen Bytes
+    handle = open(source, "rb") if isinstance(source, (str, os.PathLike)) else source
+    try:
+        start = handle.tell()
+        reader = io.BufferedReader(_ProgressReader(handle, size - start, on_progress), buffer_size=1024 * 1024)
+        return pd.read_csv(reader, **options)
+    finally:
+        if handle is not source:
+            handle.close()
@@ -0,0 +1,197 @@
+"""
+DATASET SNAPSHOTS
+=================
+Hochgeladene Bestelldaten werden einmal geparst und als typisierter
+Parquet-Snapshot abgelegt (Key = SHA-256 der Datei).
+
+- Erneuter Upload derselben Datei (auch in anderen Sessions): kein CSV/XLSX-Parsing,
+  der Snapshot wird per Memory-Map gelesen
+- Streamlit-Reruns: st.session_state.df hält nur ein DatasetHandle,
+  das DataFrame liegt einmal pro Prozess in einem kleinen LRU-Cache
+- Vor dem Schreiben werden kompakte dtypes gesetzt (compact_order_frame) und
+  die Spaltenrollen bestimmt (infer_schema); beides landet in den Parquet-Metadaten
+
+Konfiguration (ENV):
+    EVALUERA_DATASET_CACHE_DIR    Verzeichnis für Snapshots (Default: .cache/datasets)
+    EVALUERA_DATASET_CACHE_FRAMES Anzahl DataFrames im Prozess-Cache (Default: 4)
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    pa = None
+    pq = None
+
+from src.core.dataset_schema import DatasetSchema, infer_schema
+from src.utils.compact_frame import compact_order_frame
+from src.utils.csv_reader import read_csv_fast
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DEFAULT_SNAPSHOT_DIR = os.path.join(BASE_DIR, ".cache", "datasets")
+DEFAULT_CACHED_FRAMES = 4
+_REPORT_META_KEY = b"evaluera_memory_report"
+_SCHEMA_META_KEY = b"evaluera_schema"
+
+_frames: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+_frames_lock = threading.Lock()
+
+
+def snapshot_dir() -> str:
+    return os.getenv("EVALUERA_DATASET_CACHE_DIR", DEFAULT_SNAPSHOT_DIR)
+
+
+def _max_frames() -> int:
+    try:
+        return max(1, int(os.getenv("EVALUERA_DATASET_CACHE_FRAMES", DEFAULT_CACHED_FRAMES)))
+    except ValueError:
+        return DEFAULT_CACHED_FRAMES
+
+
+def file_sha256(uploaded_file) -> str:
+    """SHA-256 über den Dateiinhalt (Streamlit UploadedFile oder binäres File-Objekt)."""
+    if hasattr(uploaded_file, "getvalue"):
+        return hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    h = hashlib.sha256()
+    pos = uploaded_file.tell()
+    for block in iter(lambda: uploaded_file.read(1024 * 1024), b""):
+        h.update(block)
+    uploaded_file.seek(pos)
+    return h.hexdigest()
+
+
+def _remember_frame(key: str, df: pd.DataFrame):
+    with _frames_lock:
+        _frames[key] = df
+        _frames.move_to_end(key)
+        while len(_frames) > _max_frames():
+            _frames.popitem(last=False)
+
+
+def _cached_frame(key: str) -> Optional[pd.DataFrame]:
+    with _frames_lock:
+        df = _frames.get(key)
+        if df is not None:
+            _frames.move_to_end(key)
+        return df
+
+
+@dataclass
+class DatasetHandle:
+    """
+    Leichtgewichtiger Verweis auf einen hochgeladenen Datensatz.
+
+    Hält nur Metadaten; load() liefert das (prozessweit geteilte) DataFrame.
+    Das DataFrame nicht in-place verändern - bei Bedarf .copy().
+    """
+    key: str
+    name: str
+    path: Optional[str]
+    n_rows: int
+    columns: List[str] = field(default_factory=list)
+    source_id: Optional[tuple] = None
+    # Spaltenrollen, einmal beim Upload bestimmt
+    schema: DatasetSchema = field(default_factory=DatasetSchema)
+    # Speicher vor/nach compact_order_frame (MB)
+    memory_report: Dict[str, Any] = field(default_factory=dict)
+    # Nur ohne pyarrow: Datensatz bleibt direkt am Handle
+    _frame: Optional[pd.DataFrame] = field(default=None, repr=False)
+
+    def load(self) -> pd.DataFrame:
+        if self._frame is not None:
+            return self._frame
+        df = _cached_frame(self.key)
+        if df is None:
+            df = pq.read_table(self.path, memory_map=True).to_pandas()
+            _remember_frame(self.key, df)
+        return df
+
+
+def _to_arrow_table(df: pd.DataFrame):
+    """
+    Konvertiert nach Arrow. Objekt-Spalten mit gemischten Typen (z.B. Zahlen und
+    Text in einer Excel-Spalte) werden als Text gespeichert.
+    """
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        fixed = df.copy()
+        for col in fixed.columns:
+            if fixed[col].dtype == object and pd.api.types.infer_dtype(fixed[col], skipna=True).startswith("mixed"):
+                fixed[col] = fixed[col].map(lambda v: v if pd.isna(v) else str(v))
+        return pa.Table.from_pandas(fixed, preserve_index=False)
+
+
+def _parse_upload(uploaded_file, on_progress: Optional[Callable[[float], None]]) -> pd.DataFrame:
+    if uploaded_file.name.lower().endswith(".csv"):
+        return read_csv_fast(uploaded_file, on_progress=on_progress)
+    return pd.read_excel(uploaded_file)
+
+
+def load_dataset(uploaded_file, on_progress: Optional[Callable[[float], None]] = None,
+                 current: Optional[DatasetHandle] = None) -> DatasetHandle:
+    """
+    Liefert ein DatasetHandle für eine hochgeladene Datei.
+
+    Args:
+        uploaded_file: Streamlit UploadedFile
+        on_progress: Fortschritts-Callback für das CSV-Parsing
+        current: Bisheriges Handle der Session (Rerun mit derselben Datei → sofort zurück)
+
+    Returns:
+        DatasetHandle
+    """
+    source_id = (getattr(uploaded_file, "file_id", None), uploaded_file.name, getattr(uploaded_file, "size", None))
+    if isinstance(current, DatasetHandle) and source_id[0] is not None and current.source_id == source_id:
+        return current
+
+    key = file_sha256(uploaded_file)
+    if pq is None:
+        df, report = compact_order_frame(_parse_upload(uploaded_file, on_progress))
+        return DatasetHandle(key=key, name=uploaded_file.name, path=None, n_rows=len(df),
+                             columns=list(df.columns), source_id=source_id, schema=infer_schema(df),
+                             memory_report=report, _frame=df)
+
+    path = os.path.join(snapshot_dir(), f"{key}.parquet")
+    if os.path.exists(path):
+        arrow_schema = pq.read_schema(path)
+        meta = arrow_schema.metadata or {}
+        raw_report = meta.get(_REPORT_META_KEY)
+        handle = DatasetHandle(key=key, name=uploaded_file.name, path=path,
+                               n_rows=pq.read_metadata(path).num_rows, columns=list(arrow_schema.names),
+                               source_id=source_id, memory_report=json.loads(raw_report) if raw_report else {})
+        raw_schema = meta.get(_SCHEMA_META_KEY)
+        # Ältere Snapshots ohne gespeichertes Schema: einmalig nachträglich ableiten
+        handle.schema = DatasetSchema.from_dict(json.loads(raw_schema)) if raw_schema else infer_schema(handle.load())
+        return handle
+
+    df, report = compact_order_frame(_parse_upload(uploaded_file, on_progress))
+    schema = infer_schema(df)
+    os.makedirs(snapshot_dir(), exist_ok=True)
+    table = _to_arrow_table(df)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        _REPORT_META_KEY: json.dumps(report).encode("utf-8"),
+        _SCHEMA_META_KEY: json.dumps(schema.to_dict()).encode("utf-8"),
+    })
+    # Atomar schreiben, damit parallele Sessions nie eine halbe Datei lesen
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+    # Typen wie beim späteren Lesen aus dem Snapshot
+    df = table.to_pandas()
+    _remember_frame(key, df)
+    return DatasetHandle(key=key, name=uploaded_file.name, path=path, n_rows=len(df),
+                         columns=list(df.columns), source_id=source_id, schema=schema,
+                         memory_report=report)
@@ -8,8 +8,10 @@ Eliminiert Code-Duplikation in simple_app.py.
 import pandas as pd
 from typing import Optional, Tuple, List
 from src.ui.components_main import GPTLoadingAnimation
-from src.gpt.cache import cached_gpt_article_search
-import json
+from src.core.article_index import ArticleIndex
+from src.core.dataset_schema import DatasetSchema, infer_schema
+from src.utils.csv_reader import read_csv_fast
+from src.gpt.engine import search_articles
 
 
 def read_and_normalize_excel(uploaded_file) -> pd.DataFrame:
@@ -25,7 +27,7 @@ def read_and_normalize_excel(uploaded_file) -> pd.DataFrame:
     name = (uploaded_file.name or "").lower()
 
     if name.endswith(".csv"):
-        df = pd.read_csv(uploaded_file, sep=None, engine="python")
+        df = read_csv_fast(uploaded_file)
     else:
         df = pd.read_excel(uploaded_file)
 
@@ -74,80 +76,62 @@ def search_excel_for_article(excel_df: pd.DataFrame,
     Args:
         excel_df: Excel DataFrame
         description: Artikel-Beschreibung
-        use_gpt: Ob GPT-basierte Suche verwendet werden soll
+        use_gpt: Ob GPT die Index-Treffer nachsortieren soll
 
     Returns:
         Tuple: (matches_df, avg_price, min_price, max_price)
     """
-    from price_utils import derive_unit_price
+    from src.core.price_utils import derive_unit_price
 
     # Finde Artikel-Spalte
-    item_col = find_column(excel_df, ["item", "artikel", "bezeichnung", "produkt"])
+    schema = infer_schema(excel_df)
+    item_col = schema.item
 
     if not item_col:
         return None, None, None, None
 
-    # Intelligente Suche
-    if use_gpt and len(excel_df) > 0:
-        item_values = excel_df[item_col].tolist()
-
-        # GPT-basierte Suche mit Caching
+    # Lokaler Index über alle Artikel; GPT sortiert optional nur die Shortlist
+    if len(excel_df) > 0:
+        index = ArticleIndex(excel_df[item_col].dropna().unique().tolist())
         with GPTLoadingAnimation("🔍 Suche Artikel in Datenbank...", icon="🤖"):
-            items_json = json.dumps(item_values[:500])  # Max 500 für Performance
-            matching_indices = cached_gpt_article_search(description, items_json)
-
-        if matching_indices:
-            matches_df = excel_df.iloc[matching_indices].copy()
-        else:
-            # Fallback: String-Suche
-            search_mask = excel_df[item_col].astype(str).str.lower().str.contains(
-                description.lower(), na=False, regex=False
-            )
-            matches_df = excel_df[search_mask].copy()
+            matched = search_articles(description, index, top_k=50, use_gpt_rerank=use_gpt)
+        matched_items = [index.items[i] for i in matched]
+        matches_df = excel_df[excel_df[item_col].isin(matched_items)].copy()
     else:
-        # Nur String-Suche
-        search_mask = excel_df[item_col].astype(str).str.lower().str.contains(
-            description.lower(), na=False, regex=False
-        )
-        matches_df = excel_df[search_mask].copy()
+        matches_df = excel_df.iloc[0:0].copy()
 
     if matches_df.empty:
         return None, None, None, None
 
     # Berechne Preise
-    avg_price, min_price, max_price, _, _ = derive_unit_price(matches_df)
+    avg_price, min_price, max_price, _, _ = derive_unit_price(matches_df, schema=schema)
 
     return matches_df, avg_price, min_price, max_price
 
 
-def get_price_series_per_unit(df: pd.DataFrame, qty_col: Optional[str]) -> Optional[pd.Series]:
+def get_price_series_per_unit(df: pd.DataFrame, qty_col: Optional[str],
+                              schema: Optional[DatasetSchema] = None) -> Optional[pd.Series]:
     """
     Berechnet Preisserie pro Einheit.
 
     Args:
         df: DataFrame
         qty_col: Name der Mengen-Spalte
+        schema: Spaltenrollen des Datensatzes (Default: aus df abgeleitet)
 
     Returns:
         Series mit Preisen pro Einheit oder None
     """
-    # Suche Einzelpreis-Spalte
-    price_col = find_column(df, [
-        "unit_price", "einzelpreis", "stkpreis", "preis_pro_stk",
-        "price", "preis", "avg_price"
-    ])
+    if schema is None:
+        schema = infer_schema(df)
 
-    if price_col is not None:
-        return pd.to_numeric(df[price_col], errors="coerce")
+    # Einzelpreis-Spalte
+    if schema.unit_price in df.columns:
+        return pd.to_numeric(df[schema.unit_price], errors="coerce")
 
     # Fallback: Berechnung aus Total/Qty
-    total_col = find_column(df, [
-        "rechnungsnettowert", "nettowert", "netto", "betrag",
-        "invoice_amount", "amount", "total"
-    ])
-
-    if total_col is not None and qty_col is not None:
-        total = pd.to_numeric(df[total_col], errors="coerce")
+    if schema.total in df.columns and qty_col is not None:
+        total = pd.to_numeric(df[schema.total], errors="coerce")
         qty = pd.to_numeric(df[qty_col], errors="coerce").replace(0, pd.NA)
         return total / qty
 
@@ -0,0 +1,39 @@
+"""Tests für den lokalen Artikel-Index (src.core.article_index)."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.core.article_index import ArticleIndex
+
+
+ITEMS = [
+    "Sechskantschraube DIN 933 M12x35",
+    "Zylinderschraube ISO 4762 M8x20",
+    "Sechskantmutter DIN 934 M12",
+    "Unterlegscheibe DIN 125 M12",
+]
+
+
+def test_compound_word_part_finds_articles():
+    index = ArticleIndex(ITEMS)
+    names = [index.items[i] for i in index.search("schraube")]
+    assert set(names) == {ITEMS[0], ITEMS[1]}
+
+
+def test_compound_word_part_combined_with_norm():
+    index = ArticleIndex(ITEMS)
+    names = [index.items[i] for i in index.search("Schraube DIN 933")]
+    assert names[0] == ITEMS[0]
+
+
+def test_infix_only_when_no_exact_match():
+    index = ArticleIndex(ITEMS + ["Schraube M12"])
+    names = [index.items[i] for i in index.search("schraube")]
+    assert names == ["Schraube M12"]
+
+
+def test_short_tokens_do_not_match_as_infix():
+    index = ArticleIndex(ITEMS)
+    assert index.search("aub") == []
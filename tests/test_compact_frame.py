@@ -0,0 +1,27 @@
+"""Regressionstests für die Datums-Erkennung in src.utils.compact_frame."""
+
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.utils.compact_frame import compact_order_frame
+
+
+def test_integer_erp_dates_parse_as_yyyymmdd():
+    df = pd.DataFrame({"Bestelldatum": [20240305, 20231231], "Belegdatum": [1, 2]})
+    out, report = compact_order_frame(df)
+    assert out["Bestelldatum"].tolist() == [pd.Timestamp("2024-03-05"), pd.Timestamp("2023-12-31")]
+    # Keine plausiblen JJJJMMTT-Werte → Spalte bleibt unverändert
+    assert out["Belegdatum"].dtype == "int64"
+    assert "Belegdatum" not in report["converted"]
+
+
+def test_date_keyword_must_be_a_whole_word():
+    df = pd.DataFrame({"validated": ["2024-01-01", "2024-02-01", "2024-03-01"],
+                       "order_date": ["2024-01-01", "2024-02-01", "2024-03-01"]})
+    out, _ = compact_order_frame(df)
+    assert not pd.api.types.is_datetime64_any_dtype(out["validated"])
+    assert pd.api.types.is_datetime64_any_dtype(out["order_date"])
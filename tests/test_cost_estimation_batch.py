@@ -0,0 +1,75 @@
+"""Regressionstests für den Batch-Modus der Kostenschätzung (src.core.cost_estimation)."""
+
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.core import cost_estimation
+
+
+def _fake_response(rows):
+    message = SimpleNamespace(content=json.dumps({"results": rows}))
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=message, finish_reason="stop")],
+        usage=SimpleNamespace(prompt_tokens=100, completion_tokens=50, total_tokens=150),
+    )
+
+
+def test_batch_rows_without_costs_go_to_single_fallback(monkeypatch):
+    rows = [
+        {"id": "ok", "material_guess": "stahl", "material_cost_eur": 0.05, "fab_cost_eur": 0.10,
+         "total_cost_eur": 0.15, "process": "cold_forming"},
+        {"id": "missing", "material_guess": "stahl", "process": "turning"},
+        {"id": "empty", "material_guess": "stahl", "total_cost_eur": "", "fab_cost_eur": "abc"},
+        {"id": "zero", "material_guess": "stahl", "total_cost_eur": 0, "fab_cost_eur": 0},
+    ]
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(cost_estimation, "OpenAI", object)
+    monkeypatch.setattr(cost_estimation, "safe_gpt_request",
+                        lambda **kwargs: {"_error": False, "response": _fake_response(rows)})
+
+    fallback_ids = []
+
+    def fallback(item):
+        fallback_ids.append(item["id"])
+        return {"total_cost_eur": 1.0, "_fallback_used": True}
+
+    items = [{"id": row["id"], "description": f"Teil {row['id']}", "lot_size": 1000} for row in rows]
+    results = cost_estimation.gpt_complete_cost_estimate_batch(items, fallback=fallback)
+
+    assert sorted(fallback_ids) == ["empty", "missing", "zero"]
+    assert results["ok"]["_batch_size"] == len(items)
+    assert results["ok"]["total_cost_eur"] > 0
+    for item_id in fallback_ids:
+        assert results[item_id].get("_fallback_used")
+        assert "_batch_size" not in results[item_id]
+
+
+def test_single_fallbacks_report_progress_per_item(monkeypatch):
+    rows = [
+        {"id": "ok", "material_guess": "stahl", "material_cost_eur": 0.05, "fab_cost_eur": 0.10,
+         "total_cost_eur": 0.15, "process": "cold_forming"},
+        {"id": "missing", "material_guess": "stahl", "process": "turning"},
+    ]
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(cost_estimation, "OpenAI", object)
+    monkeypatch.setattr(cost_estimation, "safe_gpt_request",
+                        lambda **kwargs: {"_error": False, "response": _fake_response(rows)})
+
+    def fallback(item):
+        if item["id"] == "broken":
+            raise RuntimeError("kaputt")
+        return {"total_cost_eur": 1.0}
+
+    items = [{"id": item_id, "description": f"Teil {item_id}", "lot_size": 1000}
+             for item_id in ("ok", "missing", "broken")]
+    progress = []
+    results = cost_estimation.gpt_complete_cost_estimate_batch(
+        items, fallback=fallback, on_progress=lambda done, total: progress.append((done, total)))
+
+    assert progress == [(1, 3), (2, 3), (3, 3)]
+    assert results["missing"] == {"total_cost_eur": 1.0}
+    assert results["broken"]["_error"] and "kaputt" in results["broken"]["error"]
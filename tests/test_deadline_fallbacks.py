@@ -0,0 +1,73 @@
+"""Tests für die lokalen Ersatz-Antworten nach abgelaufener Deadline (Lieferanten, Verhandlung)."""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.core import cbam
+from src.gpt import cache
+from src.gpt.deadline import deadline_at, deadline_stats
+from src.negotiation import engine
+
+
+def test_heuristic_rating_uses_volatility_and_country():
+    stable = cbam.heuristic_rate_supplier("A", country="Deutschland", price_volatility=0.02, total_orders=80)
+    volatile = cbam.heuristic_rate_supplier("B", country="China", price_volatility=0.4, total_orders=3)
+
+    assert stable["rating"] > volatile["rating"]
+    assert stable["country_risk"] == "low" and volatile["country_risk"] == "high"
+    assert volatile["risk_level"] in ("high", "critical")
+    assert stable["_fallback"] and stable["confidence"] == "low"
+
+
+def test_heuristic_competencies_from_order_history():
+    history = ["Sechskantschraube DIN 933 M12x35 A2", "Zylinderschraube ISO 4762 M8 A2",
+               "Sechskantmutter DIN 934 M12 verzinkt", "Unterlegscheibe DIN 125 A2"]
+    result = cbam.heuristic_supplier_competencies("A", history)
+
+    processes = [c["process"] for c in result["core_competencies"]]
+    materials = [m["material"] for m in result["material_expertise"]]
+    assert processes[0] == "cold_forming"
+    assert materials[0] == "stainless_steel"
+    assert result["specialization"]["primary_focus"] == "fasteners"
+
+
+def test_expired_deadline_is_not_memoized(monkeypatch):
+    monkeypatch.setenv("EVALUERA_GPT_CACHE_DISABLED", "1")
+    calls = []
+
+    def fake_rate(*args):
+        calls.append(args)
+        return {"rating": 5, "_error": True, "error": "timeout"}
+
+    monkeypatch.setattr(cbam, "gpt_rate_supplier", fake_rate)
+    before = deadline_stats().get("fallback_rate_supplier", 0)
+    args = ("Lieferant X", "Polen", 0.03, 20, 1.5, "Schraube M8 not-memoized")
+    with deadline_at(time.monotonic() - 1):
+        first = cache.cached_gpt_rate_supplier(*args)
+    with deadline_at(time.monotonic() - 1):
+        second = cache.cached_gpt_rate_supplier(*args)
+
+    assert first["_deadline_fallback"] and not first.get("_error")
+    assert first["country_risk"] == "low"
+    assert len(calls) == 2
+    assert second["_deadline_fallback"]
+    assert deadline_stats()["fallback_rate_supplier"] == before + 2
+
+
+def test_negotiation_falls_back_locally_after_deadline(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(engine, "OpenAI", object)
+    monkeypatch.setattr(engine, "get_openai_client", lambda key: object())
+
+    with deadline_at(time.monotonic() - 1):
+        tips = engine.gpt_negotiation_prep_enhanced(
+            "Lieferant X", article_name="Schraube", avg_price=1.0, target_price=0.8,
+            min_price=0.85, cost_result={"total_cost_eur": 0.5, "material_cost_eur": 0.2, "fab_cost_eur": 0.3},
+        )
+
+    assert tips["_deadline_fallback"] and not tips.get("_error")
+    assert len(tips["key_arguments"]) == 2
+    assert tips["objectives"]["minimum_acceptable_outcome"] == "0.9000€/Stk"
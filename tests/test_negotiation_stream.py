@@ -0,0 +1,42 @@
+"""Tests für die gestreamte Verhandlungsvorbereitung (src.negotiation.engine)."""
+
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.gpt.deadline import DeadlineExceeded, deadline_in
+from src.negotiation import engine
+
+
+class _SlowStream:
+    """Liefert jeden Chunk rechtzeitig, insgesamt aber länger als die Deadline."""
+
+    def __init__(self, chunks, delay):
+        self.chunks, self.delay, self.closed, self.sent = chunks, delay, False, 0
+
+    def __iter__(self):
+        for text in self.chunks:
+            if self.closed:
+                return
+            time.sleep(self.delay)
+            self.sent += 1
+            yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+    def close(self):
+        self.closed = True
+
+
+def test_stream_is_closed_when_total_deadline_expires():
+    stream = _SlowStream(['{"a": 1, '] * 50, delay=0.02)
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kw: stream)))
+
+    with deadline_in(0.1), pytest.raises(DeadlineExceeded):
+        engine._stream_completion(client, [], lambda key, value: None)
+
+    assert stream.closed
+    assert stream.sent < 50
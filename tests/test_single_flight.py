@@ -0,0 +1,65 @@
+"""Tests für das Single-Flight-Zusammenlegen im Disk-Cache (src.gpt.disk_cache)."""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.gpt import disk_cache
+from src.gpt.deadline import DeadlineExceeded
+
+
+def _start_leader(cache, key, compute):
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = disk_cache._single_flight(cache, key, "test", None, compute)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, outcome
+
+
+def test_follower_takes_over_when_leader_deadline_expires(tmp_path):
+    cache = disk_cache.DiskCache(str(tmp_path / "cache.sqlite3"))
+    started, release = threading.Event(), threading.Event()
+
+    def leader_compute():
+        started.set()
+        release.wait(2)
+        raise DeadlineExceeded("Leader: Zeitbudget aufgebraucht")
+
+    leader, outcome = _start_leader(cache, "k1", leader_compute)
+    started.wait(2)
+    threading.Timer(0.2, release.set).start()
+    result = disk_cache._single_flight(cache, "k1", "test", None, lambda: {"value": 42})
+    leader.join(2)
+
+    assert isinstance(outcome.get("error"), DeadlineExceeded)
+    assert result == {"value": 42}
+
+
+def test_follower_computes_itself_after_lease_timeout(tmp_path, monkeypatch):
+    monkeypatch.setattr(disk_cache, "_lease_seconds", lambda: 0.2)
+    cache = disk_cache.DiskCache(str(tmp_path / "cache.sqlite3"))
+    started, release = threading.Event(), threading.Event()
+
+    def leader_compute():
+        started.set()
+        release.wait(2)
+        return {"value": "leader"}
+
+    leader, _ = _start_leader(cache, "k2", leader_compute)
+    started.wait(2)
+    t0 = time.monotonic()
+    result = disk_cache._single_flight(cache, "k2", "test", None, lambda: {"value": "follower"})
+    release.set()
+    leader.join(2)
+
+    assert result == {"value": "follower"}
+    assert time.monotonic() - t0 < 1.5